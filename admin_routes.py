@@ -1,10 +1,24 @@
 # admin_routes.py - COMPLETE FIX (Type-safe version)
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import (Blueprint, Response, current_app, render_template, redirect, url_for, flash, request, jsonify,
+                   stream_with_context)
 from flask_login import login_required, current_user
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from sqlalchemy import select
 from models import db, ParkingArea, ParkingStatus
-from forms import ParkingAreaForm, ParkingStatusForm
+from cache import area_cache
+from fragments import fragment_cache, card_macro, CSRF_PLACEHOLDER
+from coalescer import coalescer
+from occupancy import adjust_occupancy, set_occupancy, OccupancyRejected
+from replicas import router
+import bulk
+import search
+import stats
+from forms import ParkingAreaForm, ParkingStatusForm, ImportForm
 from datetime import datetime
+import io
 from functools import wraps
+from werkzeug.exceptions import HTTPException
 
 admin_bp = Blueprint("admin", __name__, template_folder="templates")
 
@@ -24,34 +38,45 @@ def admin_required(func):
 @login_required
 @admin_required
 def dashboard():
-    """Admin dashboard showing all parking areas"""
+    """Admin dashboard showing one page of parking areas, ordered by name"""
+    cursor = request.args.get("cursor") or None
     try:
-        areas = ParkingArea.query.all()
-        
-        # Calculate statistics
-        total_capacity = 0
-        total_occupied = 0
-        total_available = 0
-        
-        for area in areas:
-            for status in area.statuses:
-                total_capacity += status.capacity
-                total_occupied += status.occupied
-            total_available += area.available_spots
+        page_size = current_app.config["ADMIN_PAGE_SIZE"]
+        try:
+            ids, next_cursor = search.search_page(sort="name", limit=page_size, cursor=cursor)
+        except ValueError:
+            cursor = None
+            ids, next_cursor = search.search_page(sort="name", limit=page_size)
+        # Only versions up front; areas whose cached card is current aren't loaded
+        versions = db.session.execute(
+            select(ParkingArea.id, ParkingArea.version).where(ParkingArea.id.in_(ids))
+            .order_by(ParkingArea.name, ParkingArea.id)
+        ).all() if ids else []
+        cards = fragment_cache.render_cards("admin_card", versions, _render_admin_cards)
+        cards = Markup(cards.replace(CSRF_PLACEHOLDER, generate_csrf()))
         
-        stats = {
-            'total_areas': len(areas),
-            'total_capacity': total_capacity,
-            'total_occupied': total_occupied,
-            'total_available': total_available
-        }
+        # Statistics come from aggregate queries, not the loaded areas
+        by_vehicle_type = stats.vehicle_type_totals()
+        totals = stats.dashboard_totals(by_vehicle_type)
         
-        return render_template("admin.html", areas=areas, stats=stats)
+        return render_template("admin.html", areas=versions, cards=cards, stats=totals,
+                               by_vehicle_type=by_vehicle_type,
+                               cursor=cursor, next_cursor=next_cursor)
     except Exception as e:
         flash(f"❌ Error loading dashboard: {str(e)}", "danger")
         return redirect(url_for("public.index"))
 
 
+def _render_admin_cards(area_ids):
+    """Render dashboard cards for ``area_ids``; delete forms get CSRF_PLACEHOLDER"""
+    macro = card_macro("admin_card")
+    summaries = stats.area_summaries(area_ids)
+    return {
+        area.id: (area.version, str(macro(area, summaries.get(area.id), CSRF_PLACEHOLDER)))
+        for area in ParkingArea.query.filter(ParkingArea.id.in_(area_ids))
+    }
+
+
 @admin_bp.route("/add-area", methods=["GET", "POST"])
 @login_required
 @admin_required
@@ -69,6 +94,8 @@ def add_area():
             new_area = ParkingArea(
                 name=form.name.data,
                 location=form.location.data,
+                latitude=form.latitude.data,
+                longitude=form.longitude.data,
                 last_updated=datetime.utcnow()
             )
             db.session.add(new_area)
@@ -103,6 +130,8 @@ def edit_area(area_id):
             
             area.name = form.name.data
             area.location = form.location.data
+            area.latitude = form.latitude.data
+            area.longitude = form.longitude.data
             area.last_updated = datetime.utcnow()
             db.session.commit()
             flash("✏️ Parking area updated successfully!", "info")
@@ -236,7 +265,6 @@ def delete_status(status_id):
 def update_status(status_id):
     """Quick update for occupied spots (AJAX endpoint)"""
     try:
-        status = ParkingStatus.query.get_or_404(status_id)
         occupied = request.form.get("occupied", type=int)
         
         if occupied is None:
@@ -245,18 +273,132 @@ def update_status(status_id):
         if occupied < 0:
             return jsonify({"success": False, "error": "Occupied cannot be negative"}), 400
         
-        if occupied > status.capacity:
-            return jsonify({"success": False, "error": "Occupied exceeds capacity"}), 400
-        
-        status.occupied = occupied
-        status.area.last_updated = datetime.utcnow()
-        db.session.commit()
+        if coalescer.enabled:
+            status = ParkingStatus.query.get_or_404(status_id)
+            if occupied > status.capacity:
+                return jsonify({"success": False, "error": "Occupied exceeds capacity"}), 400
+            # Written with other pending updates at the end of the window
+            coalescer.submit(status_id, occupied)
+            return jsonify({
+                "success": True,
+                "queued": True,
+                "available": max(0, status.capacity - occupied),
+                "occupied": occupied
+            })
         
+        # One conditional UPDATE; the capacity check happens in the database
+        result = set_occupancy(status_id, occupied)
         return jsonify({
             "success": True,
-            "available": status.available_spots(),
-            "occupied": status.occupied
+            "available": result["available"],
+            "occupied": result["occupied"]
         })
+    except OccupancyRejected as e:
+        return jsonify({"success": False, "error": str(e)}), 404 if e.reason == "unknown" else 400
+    except HTTPException:
+        raise
     except Exception as e:
         db.session.rollback()
-        return jsonify({"success": False, "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+@admin_bp.route("/adjust-status/<int:status_id>", methods=["POST"])
+@login_required
+@admin_required
+def adjust_status(status_id):
+    """Count vehicles in or out (AJAX endpoint): ``delta`` is +1 for an
+    entry, -1 for an exit, or any other non-zero step.
+
+    Applied atomically in the database, so parallel gates can't lose
+    updates. A full lot (or an exit from an empty one) is answered with
+    409 and the current count.
+    """
+    delta = request.form.get("delta", type=int)
+    if not delta:
+        return jsonify({"success": False, "error": "delta must be a non-zero integer"}), 400
+    try:
+        result = adjust_occupancy(status_id, delta)
+    except OccupancyRejected as e:
+        if e.reason == "unknown":
+            return jsonify({"success": False, "error": str(e)}), 404
+        return jsonify({
+            "success": False,
+            "error": "Parking is full" if e.reason == "full" else "No vehicles to count out",
+            "full": e.reason == "full",
+            "occupied": e.occupied,
+            "capacity": e.capacity,
+        }), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({
+        "success": True,
+        "available": result["available"],
+        "occupied": result["occupied"]
+    })
+
+
+@admin_bp.route("/import", methods=["GET", "POST"])
+@login_required
+@admin_required
+def import_areas():
+    """Bulk import areas and statuses from an uploaded CSV or NDJSON file"""
+    form = ImportForm()
+    report = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+            report = bulk.import_stream(stream, bulk.format_for(upload.filename),
+                                        current_app.config["IMPORT_CHUNK_SIZE"])
+        except (ValueError, UnicodeDecodeError) as e:
+            flash(f"❌ Import failed: {str(e)}", "danger")
+        except Exception as e:
+            db.session.rollback()
+            flash(f"❌ Import stopped by a database error: {str(e)}", "danger")
+        else:
+            if request.accept_mimetypes.best == "application/json":
+                return jsonify(report)
+            flash(f"✅ Imported {report['records'] - report['error_count']} of {report['records']} records", "success")
+    elif request.method == "POST" and request.accept_mimetypes.best == "application/json":
+        return jsonify({"error": "; ".join(e for errors in form.errors.values() for e in errors)}), 400
+
+    return render_template("admin_import.html", form=form, report=report)
+
+
+@admin_bp.route("/export")
+@login_required
+@admin_required
+def export_areas():
+    """Stream every area and status as CSV (default) or NDJSON"""
+    fmt = request.args.get("format", "csv")
+    if fmt not in bulk.FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(bulk.FORMATS)}"}), 400
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(bulk.export_lines(fmt, current_app.config["IMPORT_CHUNK_SIZE"])),
+                    mimetype=mimetype,
+                    headers={"Content-Disposition": f'attachment; filename="parking-areas.{fmt}"'})
+
+
+@admin_bp.route("/cache-stats")
+@login_required
+@admin_required
+def cache_stats():
+    """Hit/miss/eviction counters for the public availability cache"""
+    return jsonify(area_cache.stats())
+
+
+@admin_bp.route("/fragment-stats")
+@login_required
+@admin_required
+def fragment_stats():
+    """Hit/miss/stale counters for the rendered card cache"""
+    return jsonify(fragment_cache.stats())
+
+
+@admin_bp.route("/replica-stats")
+@login_required
+@admin_required
+def replica_stats():
+    """Health of the read replicas as seen by this worker"""
+    return jsonify(router.stats())
@@ -1,26 +1,49 @@
 # app.py - FIXED VERSION
 from flask import Flask, redirect, url_for
 from flask_login import LoginManager, current_user
-from dotenv import load_dotenv
 import os
 
-# Load environment variables
-load_dotenv()
+# Load environment variables from .env; deployments set them directly and
+# skip importing python-dotenv
+_DOTENV = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(_DOTENV):
+    from dotenv import load_dotenv
+    load_dotenv(_DOTENV)
 
 from config import Config
-from models import db, User
+from models import db
+import cache
+import commands
+import events
+import fragments
+import geo
+import identity
+import metrics
+import passwords
+import replicas
+from coalescer import coalescer
 from auth import auth_bp
 from admin_routes import admin_bp
 from public_routes import public_bp
+from ingest_routes import ingest_bp
 
 
-def create_app():
+def create_app(config_object=None):
     """Application factory pattern"""
     app = Flask(__name__, instance_relative_config=True)
-    app.config.from_object(Config)
+    app.config.from_object(config_object or Config)
 
     # Initialize extensions
     db.init_app(app)
+    replicas.init_app(app, db)
+    cache.init_app(app)
+    fragments.init_app(app)
+    events.init_app(app)
+    geo.init_app(app)
+    coalescer.init_app(app)
+    metrics.init_app(app)
+    passwords.init_app(app)
+    identity.init_app(app)
 
     # Setup Flask-Login
     login_manager = LoginManager()
@@ -29,62 +52,28 @@ def create_app():
     login_manager.login_message_category = "warning"
     login_manager.init_app(app)
 
-    @login_manager.user_loader
-    def load_user(user_id: str):
-        """Load user by ID for Flask-Login"""
-        try:
-            return User.query.get(int(user_id))
-        except (ValueError, TypeError):
-            return None
+    # Served from a short-lived per-worker cache instead of a query per request
+    login_manager.user_loader(identity.load_user)
 
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(admin_bp, url_prefix="/admin")
     app.register_blueprint(public_bp)  # Public uses root URLs
+    app.register_blueprint(ingest_bp, url_prefix="/api/ingest")
 
-    # Create tables if they don't exist
-    with app.app_context():
-        try:
-            db.create_all()
-            print("✅ Database tables created/verified")
-        except Exception as e:
-            print(f"⚠️ Database initialization error: {e}")
-            # Log error but don't crash - useful for first deployment
-
-    # CLI commands
-    @app.cli.command("seed")
-    def seed_command():
-        """Seed the database with sample data"""
-        from utils import seed_data
+    # Workers boot without touching the database; the schema is created by
+    # `flask init-db` at deploy time unless AUTO_CREATE_SCHEMA is set
+    if app.config.get("AUTO_CREATE_SCHEMA"):
+        from utils import init_database
         with app.app_context():
-            seed_data()
-
-    @app.cli.command("reset-db")
-    def reset_db_command():
-        """Reset the database (WARNING: Deletes all data)"""
-        from utils import reset_database
-        with app.app_context():
-            reset_database()
-
-    @app.cli.command("create-admin")
-    def create_admin_command():
-        """Create a new admin user"""
-        email = input("Enter admin email: ")
-        password = input("Enter admin password: ")
-        
-        with app.app_context():
-            existing = User.query.filter_by(email=email).first()
-            if existing:
-                print(f"❌ User with email {email} already exists!")
-                return
-            
-            admin = User()
-            admin.email = email
-            admin.is_admin = True
-            admin.set_password(password)
-            db.session.add(admin)
-            db.session.commit()
-            print(f"✅ Admin user created: {email}")
+            try:
+                init_database()
+            except Exception as e:
+                print(f"⚠️ Database initialization error: {e}")
+                # Log error but don't crash - useful for first deployment
+
+    # CLI commands (flask init-db, flask seed, ...)
+    commands.init_app(app)
 
     # Error handlers
     @app.errorhandler(404)
@@ -0,0 +1,310 @@
+# asgi.py
+"""Asyncio serving mode: async public read API in front of the Flask app.
+
+The hot public read endpoints (/api/status, /api/status/<id>,
+/api/search and the /api/stream SSE channel) are answered by async
+handlers on an async SQLAlchemy engine (psycopg on PostgreSQL, aiosqlite
+on SQLite), so a slow query or a long-lived stream holds a coroutine
+rather than a worker. Every other route, including the admin and auth
+blueprints, falls through to the unchanged Flask app on a thread pool.
+
+Both paths share the snapshot cache, the event hub and the ORM commit
+hooks, so admin writes still invalidate caches and reach SSE clients.
+Each configured read replica gets an async engine too; the async
+handlers pick one per request with the same health and read-your-writes
+rules as the Flask side (see replicas.py).
+
+Run with:
+    uvicorn asgi:create_asgi_app --factory --workers 2
+"""
+import contextlib
+
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import http_date, is_resource_modified
+
+from app import create_app
+from cache import area_cache
+from events import hub, AsyncSubscription
+import replicas
+import search
+import serializers
+import snapshots
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+psycopg",
+    "postgresql+psycopg": "postgresql+psycopg",
+}
+
+
+def async_database_uri(uri):
+    """The async-driver equivalent of a SQLAlchemy database URI"""
+    scheme, sep, rest = uri.partition("://")
+    if scheme not in _ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {scheme}")
+    return _ASYNC_DRIVERS[scheme] + sep + rest
+
+
+class _JSON(JSONResponse):
+    """Compact JSON with sorted keys, matching Flask's jsonify"""
+
+    def render(self, content):
+        return serializers.dumps(content)
+
+
+def _render(request, payload):
+    """``payload`` as JSON or, if the client asks for it, MessagePack"""
+    mimetype = serializers.negotiate(request.headers.get("accept"))
+    return Response(serializers.encode(payload, mimetype), media_type=mimetype, headers={"Vary": "Accept"})
+
+
+def _int_arg(request, name, default):
+    try:
+        return int(request.query_params.get(name, default))
+    except ValueError:
+        return default
+
+
+def _async_engine(uri, engine_options, config):
+    options = {} if uri.startswith("sqlite") else dict(engine_options)
+    options.update(config.get("ASYNC_ENGINE_OPTIONS", {}))
+    return create_async_engine(async_database_uri(uri), **options)
+
+
+class PublicReadAPI:
+    """Async handlers for the public read endpoints"""
+
+    def __init__(self, flask_app):
+        self.config = flask_app.config
+        self.engine = _async_engine(self.config["SQLALCHEMY_DATABASE_URI"],
+                                    self.config["SQLALCHEMY_ENGINE_OPTIONS"], self.config)
+        self.replica_engines = {}
+        for replica in replicas.router.replicas:
+            engine = _async_engine(replica.url, replica.engine_options, self.config)
+            event.listen(engine.sync_engine, "handle_error", replica._on_error)
+            self.replica_engines[replica.name] = engine
+
+    async def dispose(self):
+        await self.engine.dispose()
+        for engine in self.replica_engines.values():
+            await engine.dispose()
+
+    def _engine_for(self, request):
+        """The primary or a replica engine for this request's reads"""
+        replica = replicas.choose_for(request.cookies)
+        return self.engine if replica is None else self.replica_engines[replica.name]
+
+    # -- data --------------------------------------------------------------
+
+    async def _load_snapshots(self, engine, keys):
+        """Cache loader: build snapshots for ("area", id) keys in one query"""
+        ids = [area_id for _, area_id in keys]
+        async with engine.connect() as conn:
+            return snapshots.from_rows(await conn.execute(snapshots.rows_query(ids)))
+
+    async def _area_snapshots(self, request, ids):
+        keys = [("area", area_id) for area_id in ids]
+        engine = self._engine_for(request)
+        found = await area_cache.get_many_async(keys, lambda missing: self._load_snapshots(engine, missing))
+        return [found[key] for key in keys if key in found]
+
+    async def _search_backend(self, engine):
+        """Detect the search backend on first use instead of at startup"""
+        if not search.backend_detected():
+            async with engine.connect() as conn:
+                await conn.run_sync(search.detect_backend)
+
+    async def _search_page(self, engine, q, min_available, sort, vehicle_type, limit, cursor):
+        await self._search_backend(engine)
+        query, finish = search.page_query(q, min_available, sort, vehicle_type, limit, cursor)
+        if query is None:
+            return finish([])
+        async with engine.connect() as conn:
+            return finish((await conn.execute(query)).all())
+
+    async def _area_page(self, request, q="", min_available=0, sort=None, vehicle_type=None, limit=50, cursor=None):
+        engine = self._engine_for(request)
+        return await area_cache.get_or_load_async(
+            snapshots.page_key(q, min_available, sort, vehicle_type, limit, cursor),
+            lambda: self._search_page(engine, q, min_available, sort, vehicle_type, limit, cursor)
+        )
+
+    async def _autocomplete(self, engine, q, limit):
+        await self._search_backend(engine)
+        query = search.autocomplete_query(q, limit)
+        if query is None:
+            return []
+        async with engine.connect() as conn:
+            return [tuple(row) for row in await conn.execute(query)]
+
+    # -- HTTP helpers ------------------------------------------------------
+
+    def _page_size(self, request):
+        limit = _int_arg(request, "limit", self.config["SEARCH_PAGE_SIZE"])
+        return max(1, min(limit, self.config["SEARCH_MAX_PAGE_SIZE"]))
+
+    def _conditional(self, request, etag, last_modified, build):
+        """Answer 304 if the client's validators still match, else ``build()``"""
+        etag = serializers.variant_etag(etag, serializers.negotiate(request.headers.get("accept")))
+        environ = {"REQUEST_METHOD": request.method}
+        for header in ("if-none-match", "if-modified-since"):
+            if header in request.headers:
+                environ["HTTP_" + header.upper().replace("-", "_")] = request.headers[header]
+        if is_resource_modified(environ, etag=etag, last_modified=last_modified):
+            response = build()
+        else:
+            response = Response(status_code=304, headers={"Vary": "Accept"})
+        response.headers["ETag"] = f'"{etag}"'
+        if last_modified is not None:
+            response.headers["Last-Modified"] = http_date(last_modified)
+        response.headers["Cache-Control"] = self.config["PUBLIC_CACHE_CONTROL"]
+        return response
+
+    def _conditional_body(self, request, response):
+        """ETag a built response by its body and answer 304 if it matches"""
+        etag = snapshots.body_etag(response.body)
+        if not is_resource_modified({"REQUEST_METHOD": request.method, "HTTP_IF_NONE_MATCH":
+                                     request.headers.get("if-none-match", "")}, etag=etag):
+            response = Response(status_code=304, headers={"Vary": "Accept"})
+        response.headers["ETag"] = f'"{etag}"'
+        response.headers["Cache-Control"] = self.config["PUBLIC_CACHE_CONTROL"]
+        return response
+
+    # -- endpoints ---------------------------------------------------------
+
+    async def get_status(self, request):
+        """Parking status for one area"""
+        try:
+            found = await self._area_snapshots(request, [request.path_params["area_id"]])
+            if not found:
+                return _JSON({"error": "Parking area not found"}, status_code=404)
+            snapshot = found[0]
+            return self._conditional(request, snapshots.area_etag(snapshot),
+                                     snapshots.last_modified([snapshot]), lambda: _render(request, snapshot))
+        except Exception as e:
+            return _JSON({"error": str(e)}, status_code=500)
+
+    async def get_statuses(self, request):
+        """Parking status for many areas (``ids``) or one page of all areas"""
+        try:
+            params = request.query_params
+            ids_param = params.get("ids", "").strip()
+            if ids_param:
+                try:
+                    ids = list(dict.fromkeys(int(i) for i in ids_param.split(",") if i.strip()))
+                except ValueError:
+                    return _JSON({"error": "ids must be a comma-separated list of integers"}, status_code=400)
+                found = await self._area_snapshots(request, ids)
+                return self._conditional(request, snapshots.listing_etag(found), None,
+                                         lambda: _render(request, {"areas": found}))
+
+            try:
+                ids, next_cursor = await self._area_page(
+                    request,
+                    min_available=_int_arg(request, "min_available", 0),
+                    sort="name",
+                    vehicle_type=params.get("vehicle_type") or None,
+                    limit=self._page_size(request),
+                    cursor=params.get("cursor") or None,
+                )
+            except ValueError as e:
+                return _JSON({"error": str(e)}, status_code=400)
+            found = await self._area_snapshots(request, ids)
+            return self._conditional(request, snapshots.listing_etag(found, next_cursor), None,
+                                     lambda: _render(request, {"areas": found, "next": next_cursor}))
+        except Exception as e:
+            return _JSON({"error": str(e)}, status_code=500)
+
+    async def search_area(self, request):
+        """Ranked, paginated area search (see public_routes.search_area)"""
+        try:
+            params = request.query_params
+            q = params.get("q", "").strip()
+            limit = self._page_size(request)
+
+            if params.get("mode") == "autocomplete":
+                suggestions = await area_cache.get_or_load_async(
+                    ("search", "autocomplete", q.lower(), limit),
+                    lambda: self._autocomplete(self._engine_for(request), q, limit)
+                )
+                return self._conditional_body(
+                    request, _render(request, [{"id": area_id, "name": name} for area_id, name in suggestions]))
+
+            try:
+                ids, next_cursor = await self._area_page(
+                    request,
+                    q,
+                    min_available=_int_arg(request, "min_available", 0),
+                    sort=params.get("sort") or None,
+                    vehicle_type=params.get("vehicle_type") or None,
+                    limit=limit,
+                    cursor=params.get("cursor") or None,
+                )
+            except ValueError as e:
+                return _JSON({"error": str(e)}, status_code=400)
+            found = await self._area_snapshots(request, ids)
+
+            def build():
+                response = _render(request, [snapshots.search_result(s) for s in found])
+                if next_cursor:
+                    args = dict(params)
+                    args.update(cursor=next_cursor, limit=str(limit))
+                    url = request.url.replace_query_params(**args)
+                    response.headers["Link"] = f'<{url.path}?{url.query}>; rel="next"'
+                return response
+
+            return self._conditional(request, snapshots.listing_etag(found, next_cursor), None, build)
+        except Exception as e:
+            return _JSON({"error": str(e)}, status_code=500)
+
+    async def stream(self, request):
+        """Server-Sent Events stream of committed occupancy changes"""
+        if not self.config["LIVE_UPDATES_ENABLED"]:
+            return _JSON({"error": "Live updates are disabled"}, status_code=404)
+
+        last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+        subscription = hub.subscribe(last_event_id, factory=AsyncSubscription)
+        heartbeat = self.config["SSE_HEARTBEAT"]
+
+        async def generate():
+            try:
+                yield "retry: 3000\n\n"
+                async for message in subscription.messages(heartbeat):
+                    yield message
+            finally:
+                hub.unsubscribe(subscription)
+
+        return StreamingResponse(generate(), media_type="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+
+    def routes(self):
+        return [
+            Route("/api/status/{area_id:int}", self.get_status),
+            Route("/api/status", self.get_statuses),
+            Route("/api/search", self.search_area),
+            Route("/api/stream", self.stream),
+        ]
+
+
+def create_asgi_app(config_object=None):
+    """ASGI application factory: async public reads, Flask for the rest"""
+    flask_app = create_app(config_object)
+    api = PublicReadAPI(flask_app)
+    wsgi = WSGIMiddleware(flask_app, workers=flask_app.config["ASGI_WSGI_THREADS"])
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await api.dispose()
+
+    app = Starlette(routes=api.routes() + [Mount("/", app=wsgi)], lifespan=lifespan)
+    app.state.flask_app = flask_app
+    app.state.api = api
+    return app
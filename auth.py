@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User
 from forms import LoginForm, RegistrationForm
+from passwords import HasherBusy
 
 auth_bp = Blueprint("auth", __name__, template_folder="templates")
 
@@ -23,6 +24,10 @@ def login():
             user = User.query.filter_by(email=form.email.data.lower().strip()).first()
             
             if user and user.check_password(form.password.data):
+                if user.password_needs_rehash(form.password.data):
+                    # Hashing settings changed since this hash was made
+                    user.set_password(form.password.data)
+                    db.session.commit()
                 login_user(user, remember=form.remember.data)
                 flash("✅ Login successful! Welcome back.", "success")
                 
@@ -37,7 +42,12 @@ def login():
                 return redirect(url_for("public.index"))
             else:
                 flash("❌ Invalid email or password. Please try again.", "danger")
+        except HasherBusy:
+            db.session.rollback()
+            flash("⏳ Too many sign-ins right now. Please try again in a few seconds.", "warning")
+            return render_template("login.html", form=form), 503, {"Retry-After": "5"}
         except Exception as e:
+            db.session.rollback()
             flash(f"❌ Login error: {str(e)}", "danger")
     
     return render_template("login.html", form=form)
@@ -74,6 +84,10 @@ def register():
             flash("🎉 Registration successful! You can now login.", "success")
             return redirect(url_for("auth.login"))
             
+        except HasherBusy:
+            db.session.rollback()
+            flash("⏳ Too many sign-ins right now. Please try again in a few seconds.", "warning")
+            return render_template("register.html", form=form), 503, {"Retry-After": "5"}
         except Exception as e:
             db.session.rollback()
             flash(f"❌ Registration error: {str(e)}", "danger")
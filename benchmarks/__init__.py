@@ -0,0 +1,4 @@
+"""Benchmarks for the Parking Navigator hot paths.
+
+Run from the repository root, e.g. ``python -m benchmarks.status_batch``.
+"""
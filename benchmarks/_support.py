@@ -0,0 +1,101 @@
+# benchmarks/_support.py
+"""Shared helpers for the benchmark scripts"""
+import atexit
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import event, insert
+
+from app import create_app
+from config import Config
+from models import db, ParkingArea, ParkingStatus, refresh_area_totals
+
+VEHICLE_TYPES = ("car", "bike", "bus")
+
+
+def make_app(database_uri=None, **overrides):
+    """Create an app bound to a throwaway SQLite file (or the given URI).
+
+    The throwaway file lives in its own temporary directory, removed with
+    any journal files when the process exits. Keyword arguments override
+    config values, e.g. LIVE_UPDATES_ENABLED=True.
+    """
+    if database_uri is None:
+        directory = tempfile.mkdtemp(prefix="parking-bench-")
+        atexit.register(shutil.rmtree, directory, ignore_errors=True)
+        database_uri = "sqlite:///" + os.path.join(directory, "bench.db")
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_uri
+        SQLALCHEMY_ENGINE_OPTIONS = {} if database_uri.startswith("sqlite") else Config.SQLALCHEMY_ENGINE_OPTIONS
+        SQLALCHEMY_ECHO = False
+        WTF_CSRF_ENABLED = False
+        TESTING = True
+        AUTO_CREATE_SCHEMA = True
+
+    for key, value in overrides.items():
+        setattr(BenchConfig, key, value)
+    return create_app(BenchConfig)
+
+
+def seed_estate(n_areas, vehicle_types=VEHICLE_TYPES):
+    """Bulk-insert ``n_areas`` areas with one status row per vehicle type.
+
+    Must be called inside an app context on an empty database.
+    """
+    areas = [
+        {"id": i, "name": f"Area {i:06d}", "location": f"Block {i % 97}"}
+        for i in range(1, n_areas + 1)
+    ]
+    statuses = [
+        {
+            "area_id": i,
+            "vehicle_type": vehicle_type,
+            "capacity": 50,
+            "occupied": (i * 7 + offset) % 51,
+        }
+        for i in range(1, n_areas + 1)
+        for offset, vehicle_type in enumerate(vehicle_types)
+    ]
+    db.session.execute(insert(ParkingArea), areas)
+    db.session.execute(insert(ParkingStatus), statuses)
+    refresh_area_totals(db.session.connection())
+    db.session.commit()
+
+
+class QueryCounter:
+    """Context manager counting SQL statements sent to an engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def median_ms(func, repeat=5):
+    """Run ``func`` ``repeat`` times and return the median wall time in ms"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
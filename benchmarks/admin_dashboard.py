@@ -0,0 +1,59 @@
+# benchmarks/admin_dashboard.py
+"""Time the admin dashboard with a large estate.
+
+Logs in as an admin through the real login form and times full
+dashboard renders (first page and a deep page) plus each statistics
+query on its own.
+
+Usage: python -m benchmarks.admin_dashboard [AREAS]
+"""
+import re
+import sys
+
+import stats
+from benchmarks._support import make_app, seed_estate, QueryCounter, median_ms
+from models import db, User
+
+EMAIL = "bench-admin@example.com"
+PASSWORD = "bench-password"
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 10_000
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        seed_estate(n_areas)
+        admin = User(email=EMAIL, is_admin=True)
+        admin.set_password(PASSWORD)
+        db.session.add(admin)
+        db.session.commit()
+        engine = db.engine
+
+        print(f"{n_areas:,} areas")
+        print(f"{'vehicle_type_totals':>24}: {median_ms(stats.vehicle_type_totals):8.2f} ms")
+        print(f"{'dashboard_totals':>24}: {median_ms(stats.dashboard_totals):8.2f} ms")
+        page_ids = list(range(1, 26))
+        print(f"{'area_summaries (25)':>24}: {median_ms(lambda: stats.area_summaries(page_ids)):8.2f} ms")
+
+    response = client.post("/auth/login", data={"email": EMAIL, "password": PASSWORD})
+    assert response.status_code == 302, "admin login failed"
+
+    first = client.get("/admin/")
+    assert first.status_code == 200
+    deep_cursor = None
+    for _ in range(100):
+        match = re.search(rb'/admin/\?cursor=([\w-]+)', client.get(
+            "/admin/" + (f"?cursor={deep_cursor}" if deep_cursor else "")).data)
+        if not match:
+            break
+        deep_cursor = match.group(1).decode()
+
+    for label, url in (("GET /admin/", "/admin/"), ("GET /admin/ (page ~100)", f"/admin/?cursor={deep_cursor}")):
+        with QueryCounter(engine) as queries:
+            assert client.get(url).status_code == 200
+        print(f"{label:>24}: {median_ms(lambda: client.get(url)):8.2f} ms, {queries.count} queries")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,136 @@
+# benchmarks/asgi_concurrency.py
+"""Load-test the sync WSGI setup against the asyncio serving mode.
+
+Starts each server as a subprocess on a shared, pre-seeded SQLite file:
+    sync:  gunicorn -w WORKERS "app:create_app()"
+    async: uvicorn asgi:create_asgi_app --factory --workers WORKERS
+then opens STREAMS concurrent /api/stream connections and, while they
+are held open, sends REQUESTS status polls (100 at a time). Reports how
+many streams were accepted and the polls' success rate and latency.
+
+Usage: python -m benchmarks.asgi_concurrency [STREAMS] [REQUESTS] [WORKERS]
+"""
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks._support import make_app, seed_estate, percentile
+
+POLL_CONCURRENCY = 100
+CONNECT_TIMEOUT = 10.0
+REQUEST_TIMEOUT = 10.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, workers, database_uri):
+    env = dict(os.environ, DATABASE_URL=database_uri, LIVE_UPDATES_ENABLED="1", SECRET_KEY="bench")
+    if mode == "sync":
+        command = ["gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning",
+                   "app:create_app()"]
+    else:
+        command = ["uvicorn", "asgi:create_asgi_app", "--factory", "--workers", str(workers),
+                   "--port", str(port), "--log-level", "warning", "--backlog", "4096"]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def open_stream(port):
+    """An open SSE connection, or None if the server did not answer in time"""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), CONNECT_TIMEOUT)
+        writer.write("GET /api/stream HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n".encode())
+        data = b""
+        while b"retry:" not in data:
+            chunk = await asyncio.wait_for(reader.read(4096), CONNECT_TIMEOUT)
+            if not chunk:
+                return None
+            data += chunk
+        return writer
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+
+async def poll(port, path):
+    """Latency in seconds of one GET, or None on failure"""
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), REQUEST_TIMEOUT)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode())
+        response = await asyncio.wait_for(reader.read(), REQUEST_TIMEOUT)
+        writer.close()
+        if not response.startswith(b"HTTP/1.1 200"):
+            return None
+        return time.perf_counter() - started
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+
+async def run_load(port, streams, requests):
+    held = []
+    for start in range(0, streams, 500):
+        batch = await asyncio.gather(*(open_stream(port) for _ in range(min(500, streams - start))))
+        held.extend(writer for writer in batch if writer)
+
+    semaphore = asyncio.Semaphore(POLL_CONCURRENCY)
+    path = "/api/status?ids=" + ",".join(str(i) for i in range(1, 21))
+
+    async def limited():
+        async with semaphore:
+            return await poll(port, path)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(limited() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    for writer in held:
+        writer.close()
+    return len(held), [r for r in results if r is not None], elapsed
+
+
+def main(argv):
+    streams = int(argv[0]) if argv else 2000
+    requests = int(argv[1]) if len(argv) > 1 else 1000
+    workers = int(argv[2]) if len(argv) > 2 else 2
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, streams * 2 + 1024)), hard))
+
+    app = make_app()
+    database_uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    with app.app_context():
+        seed_estate(1000)
+
+    print(f"{streams} held SSE streams, {requests} status polls ({POLL_CONCURRENCY} concurrent), {workers} workers")
+    print(f"{'mode':>6} | {'streams open':>12} | {'polls ok':>8} | {'req/s':>7} | {'p50 ms':>7} | {'p99 ms':>7}")
+    for mode in ("sync", "async"):
+        port = free_port()
+        server = start_server(mode, port, workers, database_uri)
+        try:
+            opened, latencies, elapsed = asyncio.run(run_load(port, streams, requests))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+        ok = len(latencies)
+        p50 = percentile(latencies, 50) * 1000 if latencies else float("nan")
+        p99 = percentile(latencies, 99) * 1000 if latencies else float("nan")
+        print(f"{mode:>6} | {opened:>12} | {ok:>8} | {ok / elapsed:>7.0f} | {p50:>7.1f} | {p99:>7.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+# benchmarks/bulk_import.py
+"""Time bulk import and streaming export of a large estate.
+
+Writes an AREAS-area CSV (3 status rows per area) to a temp file, then
+times a fresh import, a re-import of the same file (every row matched
+and compared, nothing changed), an import with every occupancy changed,
+and CSV/NDJSON exports, reporting rows/second and the process's peak
+resident memory after each step (it only grows, so a streaming step that
+leaves it flat used no more than the steps before it).
+
+Usage: python -m benchmarks.bulk_import [AREAS] [CHUNK_SIZE]
+"""
+import csv
+import io
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import bulk
+from benchmarks._support import make_app, VEHICLE_TYPES
+
+
+def write_csv(path, n_areas, shift=0):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(bulk.FIELDS)
+        for i in range(1, n_areas + 1):
+            for offset, vehicle_type in enumerate(VEHICLE_TYPES):
+                writer.writerow([f"Area {i:06d}", f"Block {i % 97}", f"{51.0 + i / 1e6:.6f}",
+                                 f"{-0.1 - i / 1e6:.6f}", vehicle_type, 50, (i * 7 + offset + shift) % 51])
+
+
+def measure(label, rows, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(f"{label:>20} | {elapsed:>8.2f} | {rows / elapsed:>10,.0f} | {peak:>11.1f}")
+    return result
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 100_000
+    chunk_size = int(argv[1]) if len(argv) > 1 else 1000
+    app = make_app()
+    with tempfile.TemporaryDirectory(prefix="parking-bulk-") as tmp:
+        run(app, tmp, n_areas, chunk_size)
+
+
+def run(app, tmp, n_areas, chunk_size):
+    rows = n_areas * len(VEHICLE_TYPES)
+    original, changed = os.path.join(tmp, "areas.csv"), os.path.join(tmp, "changed.csv")
+    write_csv(original, n_areas)
+    write_csv(changed, n_areas, shift=1)
+
+    def run_import(path):
+        def fn():
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                return bulk.import_stream(f, "csv", chunk_size)
+        return fn
+
+    def run_export(fmt):
+        def fn():
+            out = io.StringIO()
+            for chunk in bulk.export_lines(fmt, chunk_size):
+                out.write(chunk)
+            return out.tell()
+        return fn
+
+    print(f"{n_areas:,} areas, {rows:,} rows, chunks of {chunk_size}")
+    print(f"{'step':>20} | {'seconds':>8} | {'rows/s':>10} | {'max RSS MiB':>11}")
+    with app.app_context():
+        report = measure("import (new)", rows, run_import(original))
+        assert report["areas_created"] == n_areas and report["error_count"] == 0, report
+        report = measure("re-import (same)", rows, run_import(original))
+        assert report["areas_updated"] == report["statuses_updated"] == 0, report
+        report = measure("import (changed)", rows, run_import(changed))
+        assert report["statuses_updated"] == rows, report
+        measure("export csv", rows, run_export("csv"))
+        measure("export ndjson", rows, run_export("ndjson"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,46 @@
+# benchmarks/conditional_get.py
+"""Compare full responses with 304 revalidations for unchanged polls.
+
+Usage: python -m benchmarks.conditional_get [AREAS]
+"""
+import sys
+
+from benchmarks._support import make_app, seed_estate, median_ms
+
+POLLS = 200
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 1000
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        seed_estate(n_areas)
+
+    ids = ",".join(str(i) for i in range(1, min(n_areas, 100) + 1))
+    urls = (
+        ("GET /api/status/1", "/api/status/1"),
+        ("GET /api/status?ids=(100)", f"/api/status?ids={ids}"),
+        ("GET /api/status page", "/api/status?limit=50"),
+        ("GET /api/search", "/api/search?q=Area&limit=50"),
+    )
+    print(f"{n_areas:,} areas, {POLLS} polls each, warm cache")
+    print(f"{'endpoint':>26} | {'200 ms':>7} | {'304 ms':>7} | {'200 bytes':>9}")
+    for label, url in urls:
+        first = client.get(url)
+        etag = first.headers["ETag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+        def full():
+            for _ in range(POLLS):
+                client.get(url)
+
+        def revalidate():
+            for _ in range(POLLS):
+                client.get(url, headers={"If-None-Match": etag})
+
+        print(f"{label:>26} | {median_ms(full) / POLLS:>7.3f} | {median_ms(revalidate) / POLLS:>7.3f} | {len(first.data):>9}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,127 @@
+# benchmarks/counter_race.py
+"""Hammer a few small lots with parallel enter/exit events and check
+that no count drifts.
+
+WRITERS threads each send EVENTS random +1/-1 changes to STATUSES status
+rows of capacity 20, so lots fill up and empty out constantly. Every
+accepted change is tallied on the client side; afterwards each row must
+equal its starting count plus its accepted deltas, stay within
+0..capacity, and its area's totals must match its statuses.
+
+Runs twice: once with the previous read-check-assign ORM update (to show
+the lost updates it allows) and once with occupancy.adjust_occupancy.
+Exits non-zero if the atomic path drifts.
+
+Usage: python -m benchmarks.counter_race [WRITERS] [EVENTS] [STATUSES]
+"""
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import func, select
+
+from benchmarks._support import make_app, seed_estate
+from models import db, ParkingArea, ParkingStatus, refresh_area_totals
+from occupancy import OccupancyRejected, adjust_occupancy
+
+CAPACITY = 20
+
+
+def read_modify_write(status_id, delta):
+    """The old admin update: load the row, check in Python, assign, commit"""
+    status = db.session.get(ParkingStatus, status_id)
+    occupied = status.occupied + delta
+    if not 0 <= occupied <= status.capacity:
+        db.session.rollback()
+        raise OccupancyRejected("full" if delta > 0 else "empty")
+    time.sleep(0)  # let another writer in between the read and the write, as a request would
+    status.occupied = occupied
+    db.session.commit()
+
+
+def run(app, writer, n_writers, n_events, status_ids, seed):
+    deltas, outcomes = Counter(), Counter()
+    lock = threading.Lock()
+
+    def work(index):
+        rng = random.Random(seed + index)
+        for _ in range(n_events):
+            status_id = rng.choice(status_ids)
+            delta = rng.choice((1, -1))
+            with app.app_context():
+                try:
+                    writer(status_id, delta)
+                    outcome = "accepted"
+                except OccupancyRejected:
+                    outcome, delta = "rejected", 0
+                except Exception:
+                    db.session.rollback()
+                    outcome, delta = "errors", 0
+            with lock:
+                outcomes[outcome] += 1
+                deltas[status_id] += delta
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(n_writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return deltas, outcomes, time.perf_counter() - started
+
+
+def check(app, start, deltas):
+    """Returns (rows whose count drifted, rows out of bounds, areas with wrong totals)"""
+    with app.app_context():
+        rows = {r.id: r for r in db.session.execute(
+            select(ParkingStatus.id, ParkingStatus.area_id, ParkingStatus.capacity, ParkingStatus.occupied)
+            .where(ParkingStatus.id.in_(start))
+        )}
+        drifted = sum(1 for sid, row in rows.items() if row.occupied != start[sid] + deltas[sid])
+        out_of_bounds = sum(1 for row in rows.values() if not 0 <= row.occupied <= row.capacity)
+        statuses = ParkingStatus.__table__
+        sums = dict(db.session.execute(
+            select(statuses.c.area_id, func.sum(statuses.c.occupied)).group_by(statuses.c.area_id)
+        ).all())
+        areas = {row.area_id for row in rows.values()}
+        wrong_totals = sum(1 for area in db.session.execute(
+            select(ParkingArea.id, ParkingArea.total_occupied).where(ParkingArea.id.in_(areas))
+        ) if area.total_occupied != sums.get(area.id, 0))
+    return drifted, out_of_bounds, wrong_totals
+
+
+def main(argv):
+    n_writers = int(argv[0]) if argv else 16
+    n_events = int(argv[1]) if len(argv) > 1 else 200
+    n_statuses = int(argv[2]) if len(argv) > 2 else 4
+    print(f"{n_writers} writers x {n_events} events over {n_statuses} statuses (capacity {CAPACITY})")
+    print(f"{'writer':>18} | {'accepted':>8} | {'rejected':>8} | {'errors':>6} | {'ev/s':>6} | "
+          f"{'drifted':>7} | {'bounds':>6} | {'totals':>6}")
+
+    failed = False
+    for label, writer in (("read-modify-write", read_modify_write), ("adjust_occupancy", adjust_occupancy)):
+        app = make_app()
+        with app.app_context():
+            seed_estate(n_statuses, vehicle_types=("car",))
+            db.session.execute(ParkingStatus.__table__.update().values(capacity=CAPACITY, occupied=CAPACITY // 2))
+            db.session.commit()
+            refresh_area_totals(db.session.connection())
+            db.session.commit()
+            start = dict(db.session.execute(select(ParkingStatus.id, ParkingStatus.occupied)).all())
+        deltas, outcomes, elapsed = run(app, writer, n_writers, n_events, list(start), seed=1)
+        drifted, out_of_bounds, wrong_totals = check(app, start, deltas)
+        print(f"{label:>18} | {outcomes['accepted']:>8} | {outcomes['rejected']:>8} | {outcomes['errors']:>6} | "
+              f"{n_writers * n_events / elapsed:>6.0f} | {drifted:>7} | {out_of_bounds:>6} | {wrong_totals:>6}")
+        if writer is adjust_occupancy and (drifted or out_of_bounds or wrong_totals):
+            failed = True
+
+    if failed:
+        print("❌ atomic counters drifted")
+        sys.exit(1)
+    print("✅ atomic counters: no drift")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
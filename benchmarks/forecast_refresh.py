@@ -0,0 +1,120 @@
+# benchmarks/forecast_refresh.py
+"""Forecast model refresh time, worker load time and /api/forecast latency.
+
+Seeds AREAS areas with one car status each and DAYS days of synthetic
+15-minute rollups (a weekday rush-hour shape, a flatter weekend,
+per-area scale and AR(1) noise), then times:
+
+- the first, full fit (flask refresh-forecasts on a fresh database);
+- an incremental refresh after one more bucket per series, as when the
+  command runs after each rollup-history;
+- a worker loading every fitted series, and /api/forecast requests.
+
+It also compares the 30-minute forecast error over one held-out day
+against assuming occupancy stays as it is now.
+
+Usage: python -m benchmarks.forecast_refresh [AREAS] [DAYS]
+"""
+import statistics
+import sys
+import time
+
+import numpy as np
+from sqlalchemy import insert
+
+from benchmarks._support import make_app, seed_estate
+from history import DAY, QUARTER_HOUR
+from models import db, OccupancyRollup
+import forecast
+
+CAPACITY = 50
+SAMPLES = 3
+CHUNK = 20000
+REQUESTS = 500
+START = 1_700_006_400  # a Wednesday, 00:00 UTC
+
+
+def occupancy(n_areas, buckets, rng):
+    """Occupied counts, shape (areas, buckets)"""
+    local = (buckets % DAY) / 3600
+    weekday = (buckets // DAY + 3) % 7 < 5
+    peak = np.exp(-((local - 9) ** 2) / 4) + 0.8 * np.exp(-((local - 17.5) ** 2) / 5)
+    shape = np.where(weekday, 0.15 + 0.75 * peak, 0.1 + 0.3 * np.exp(-((local - 13) ** 2) / 8))
+    scale = rng.uniform(0.6, 1.1, size=(n_areas, 1))
+    noise = np.zeros((n_areas, len(buckets)))
+    shocks = rng.normal(0, 0.06, size=noise.shape)
+    for t in range(1, len(buckets)):
+        noise[:, t] = 0.85 * noise[:, t - 1] + shocks[:, t]
+    return np.clip(np.rint((shape * scale + noise) * CAPACITY), 0, CAPACITY).astype(int)
+
+
+def insert_rollups(occupied, buckets):
+    n_areas = occupied.shape[0]
+    rows = [
+        {"resolution": QUARTER_HOUR, "area_id": a + 1, "bucket": int(b), "vehicle_type": "car",
+         "samples": SAMPLES, "occupied_sum": int(occupied[a, t]) * SAMPLES,
+         "occupied_min": int(occupied[a, t]), "occupied_max": int(occupied[a, t]), "capacity": CAPACITY}
+        for t, b in enumerate(buckets) for a in range(n_areas)
+    ]
+    for i in range(0, len(rows), CHUNK):
+        db.session.execute(insert(OccupancyRollup), rows[i:i + CHUNK])
+    db.session.commit()
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 10000
+    n_days = int(argv[1]) if len(argv) > 1 else 28
+    rng = np.random.default_rng(1)
+    n_buckets = n_days * DAY // QUARTER_HOUR
+    buckets = START + QUARTER_HOUR * np.arange(n_buckets + DAY // QUARTER_HOUR + 1)
+    occupied = occupancy(n_areas, buckets, rng)
+    held_out = n_buckets + 1  # the extra bucket for the incremental refresh, then one day to score
+
+    app = make_app(FORECAST_HISTORY_DAYS=n_days, FORECAST_RELOAD_INTERVAL=0)
+    with app.app_context():
+        seed_estate(n_areas, vehicle_types=("car",))
+        db.session.commit()
+        _, seconds = timed(lambda: insert_rollups(occupied[:, :n_buckets], buckets[:n_buckets]))
+        print(f"{n_areas} series, {n_days} days of 15-minute rollups "
+              f"({n_areas * n_buckets} rows, inserted in {seconds:.1f}s)")
+
+        report, seconds = timed(lambda: forecast.refresh(full=True))
+        print(f"full refresh:        {seconds * 1000:>8.0f}ms  ({report['series']} series, {report['rows']} rows read)")
+        insert_rollups(occupied[:, n_buckets:held_out], buckets[n_buckets:held_out])
+        report, seconds = timed(forecast.refresh)
+        print(f"incremental refresh: {seconds * 1000:>8.0f}ms  ({report['series']} series, {report['rows']} rows read)")
+
+        worker = forecast.Forecaster(app.config)
+        _, seconds = timed(worker.sync)
+        print(f"worker load:         {seconds * 1000:>8.0f}ms  ({len(worker._model[0])} series)")
+
+        # 30 minutes ahead over the held-out day, against "stays as it is now"
+        errors = {"profile": [], "current": []}
+        for t in range(held_out - 1, len(buckets) - 2):
+            now = int(buckets[t])
+            for a in rng.choice(n_areas, 20, replace=False):
+                status = {"vehicle_type": "car", "capacity": CAPACITY, "occupied": int(occupied[a, t])}
+                predicted = worker.forecast(int(a) + 1, [status], 30, now)[0]["expected_occupied"]
+                errors["profile"].append(abs(predicted - occupied[a, t + 2]))
+                errors["current"].append(abs(occupied[a, t] - occupied[a, t + 2]))
+        print(f"30-minute MAE (spaces): model {statistics.mean(errors['profile']):.2f}, "
+              f"occupancy unchanged {statistics.mean(errors['current']):.2f}")
+
+    client = app.test_client()
+    timings = []
+    for i in range(REQUESTS):
+        started = time.perf_counter()
+        response = client.get(f"/api/forecast/{i % n_areas + 1}?horizon=30")
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    print(f"GET /api/forecast:   {statistics.median(timings) * 1000:>8.2f}ms p50")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,68 @@
+# benchmarks/fragment_render.py
+"""Time a 5,000-card home page and admin dashboard with and without the
+fragment cache.
+
+Both pages are served with a page size of AREAS, so every area gets a
+card. For each page this times a request with the fragment cache
+disabled (every card rendered through Jinja), a cold cache, a warm
+cache, and a warm cache after 1% of the areas changed.
+
+Usage: python -m benchmarks.fragment_render [AREAS]
+"""
+import statistics
+import sys
+
+from sqlalchemy import select
+
+from benchmarks._support import make_app, seed_estate, median_ms
+from fragments import fragment_cache
+from models import db, User, ParkingStatus
+
+EMAIL = "bench-admin@example.com"
+PASSWORD = "bench-password"
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 5000
+    app = make_app(INDEX_PAGE_SIZE=n_areas, ADMIN_PAGE_SIZE=n_areas, SESSION_COOKIE_SECURE=False)
+    client = app.test_client()
+    with app.app_context():
+        seed_estate(n_areas)
+        admin = User(email=EMAIL, is_admin=True)
+        admin.set_password(PASSWORD)
+        db.session.add(admin)
+        db.session.commit()
+        status_ids = db.session.execute(select(ParkingStatus.id).where(ParkingStatus.vehicle_type == "car")
+                                        .order_by(ParkingStatus.id)).scalars().all()
+    response = client.post("/auth/login", data={"email": EMAIL, "password": PASSWORD})
+    assert response.status_code == 302, "admin login failed"
+    size = fragment_cache.max_entries
+
+    def change_one_percent(round_):
+        for status_id in status_ids[round_ % 100::100]:
+            client.post(f"/admin/update-status/{status_id}", data={"occupied": round_ % 10})
+
+    print(f"{n_areas:,} cards per page (ms per request)")
+    print(f"{'page':>10} | {'no cache':>9} | {'cold':>9} | {'warm':>9} | {'1% changed':>10}")
+    for label, url in (("index", "/"), ("admin", "/admin/")):
+        client.get(url)  # warm the snapshot cache and the template
+        fragment_cache.max_entries = 0
+        uncached = median_ms(lambda: client.get(url))
+        fragment_cache.max_entries = size
+
+        def cold():
+            fragment_cache.clear()
+            client.get(url)
+        cold_ms = median_ms(cold)
+        warm = median_ms(lambda: client.get(url))
+
+        timings = []
+        for round_ in range(5):
+            change_one_percent(round_)
+            timings.append(median_ms(lambda: client.get(url), repeat=1))
+        changed_ms = statistics.median(timings)
+        print(f"{label:>10} | {uncached:>9.1f} | {cold_ms:>9.1f} | {warm:>9.1f} | {changed_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
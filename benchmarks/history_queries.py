@@ -0,0 +1,85 @@
+# benchmarks/history_queries.py
+"""Insert a year of occupancy samples, roll them up and time history queries.
+
+Usage: python -m benchmarks.history_queries [SAMPLES] [AREAS]
+(defaults: 10,000,000 samples over 300 areas; expect several minutes on SQLite)
+"""
+import random
+import sys
+import time
+
+from sqlalchemy import insert
+
+import history
+from benchmarks._support import make_app, median_ms, VEHICLE_TYPES
+from models import db, OccupancySample
+
+CHUNK = 100_000
+YEAR = 365 * history.DAY
+
+# (label, range in seconds, resolution)
+QUERIES = (
+    ("1 hour raw", history.HOUR, "raw"),
+    ("1 day @ 1m", history.DAY, "1m"),
+    ("1 week @ 15m", 7 * history.DAY, "15m"),
+    ("1 month @ 1h", 30 * history.DAY, "1h"),
+    ("1 year @ 1d", YEAR, "1d"),
+    ("1 year auto", YEAR, "auto"),
+)
+
+
+def insert_samples(n_samples, n_areas, now):
+    """Spread ``n_samples`` evenly over the last year, in timestamp order"""
+    rng = random.Random(7)
+    series = [(area_id, vehicle_type) for area_id in range(1, n_areas + 1) for vehicle_type in VEHICLE_TYPES]
+    start = now - YEAR
+    step = YEAR / n_samples
+    table = OccupancySample.__table__
+    for offset in range(0, n_samples, CHUNK):
+        rows = []
+        for i in range(offset, min(offset + CHUNK, n_samples)):
+            area_id, vehicle_type = series[i % len(series)]
+            rows.append({
+                "area_id": area_id,
+                "status_id": i % len(series) + 1,
+                "vehicle_type": vehicle_type,
+                "occupied": rng.randint(0, 50),
+                "capacity": 50,
+                "ts": int(start + i * step),
+            })
+        db.session.execute(insert(table), rows)
+        db.session.commit()
+
+
+def main(argv):
+    n_samples = int(argv[0]) if argv else 10_000_000
+    n_areas = int(argv[1]) if len(argv) > 1 else 300
+    now = int(time.time())
+
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        started = time.perf_counter()
+        insert_samples(n_samples, n_areas, now)
+        elapsed = time.perf_counter() - started
+        print(f"inserted {n_samples:,} samples in {elapsed:.1f}s ({n_samples / elapsed:,.0f}/s)")
+
+        started = time.perf_counter()
+        written = history.rollup(now)
+        print(f"rollup in {time.perf_counter() - started:.1f}s: {written}")
+
+    rng = random.Random(11)
+    print(f"{'query':>14} | {'points':>6} | {'median ms':>9}")
+    for label, span, resolution in QUERIES:
+        urls = [
+            f"/api/history/{rng.randint(1, n_areas)}?from={now - span}&to={now}&resolution={resolution}"
+            for _ in range(5)
+        ]
+        response = client.get(urls[0]).get_json()
+        points = sum(len(points) for points in response["series"].values())
+        ms = median_ms(lambda: [client.get(url) for url in urls], repeat=3) / len(urls)
+        print(f"{label:>14} | {points:>6} | {ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,49 @@
+# benchmarks/ingest_throughput.py
+"""Measure sensor ingestion throughput for different batch sizes.
+
+Usage: python -m benchmarks.ingest_throughput [AREAS] [EVENTS]
+"""
+import random
+import sys
+import time
+
+from benchmarks._support import make_app, seed_estate, QueryCounter, VEHICLE_TYPES
+from models import db
+
+TOKEN = "bench-token"
+BATCH_SIZES = (1, 10, 100, 1000)
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 1000
+    n_events = int(argv[1]) if len(argv) > 1 else 20000
+    n_statuses = n_areas * len(VEHICLE_TYPES)
+
+    app = make_app(INGEST_API_TOKENS=[TOKEN])
+    with app.app_context():
+        seed_estate(n_areas)
+        engine = db.engine
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {TOKEN}"}
+    rng = random.Random(42)
+
+    print(f"{'batch':>6} | {'events/s':>9} | {'queries/batch':>13} | {'rejected':>8}")
+    for batch_size in BATCH_SIZES:
+        batches = max(1, n_events // batch_size)
+        rejected = 0
+        with QueryCounter(engine) as queries:
+            started = time.perf_counter()
+            for _ in range(batches):
+                events = [
+                    {"status_id": rng.randint(1, n_statuses), "event": rng.choice(("enter", "exit"))}
+                    for _ in range(batch_size)
+                ]
+                response = client.post("/api/ingest/events", json={"events": events}, headers=headers)
+                rejected += response.get_json()["rejected"]
+            elapsed = time.perf_counter() - started
+        print(f"{batch_size:>6} | {batches * batch_size / elapsed:>9.0f} | "
+              f"{queries.count / batches:>13.1f} | {rejected:>8}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
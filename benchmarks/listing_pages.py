@@ -0,0 +1,93 @@
+# benchmarks/listing_pages.py
+"""Show per-page latency and memory staying flat deep into a large listing.
+
+Walks the keyset cursors of the home page, /api/status and /api/search
+(plus the admin dashboard's area page) and times the first, 10th, 100th
+... page, with the response cache disabled so every page hits the
+database. Peak Python memory is measured with tracemalloc.
+
+Usage: python -m benchmarks.listing_pages [AREAS]
+"""
+import sys
+import tracemalloc
+
+import search
+from benchmarks._support import make_app, seed_estate, median_ms
+from models import db
+
+PAGE_SIZE = 50
+
+
+def peak_kb(func):
+    """Peak memory allocated while running ``func`` once, in KiB"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def cursors(n_areas, checkpoints):
+    """Cursor for each page number in ``checkpoints`` (None for page 1)"""
+    found, cursor, page = {}, None, 1
+    last = max(checkpoints)
+    while page <= last:
+        if page in checkpoints:
+            found[page] = cursor
+        _, cursor = search.search_page(sort="name", limit=PAGE_SIZE, cursor=cursor)
+        if cursor is None:
+            break
+        page += 1
+    return found
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 50_000
+    app = make_app(AREA_CACHE_MAX_ENTRIES=0, INDEX_PAGE_SIZE=PAGE_SIZE)
+    client = app.test_client()
+    with app.app_context():
+        seed_estate(n_areas)
+        last_page = n_areas // PAGE_SIZE
+        checkpoints = sorted({1, 10, 100, last_page // 2, last_page} - {0})
+        pages = cursors(n_areas, set(checkpoints))
+
+    def url_for_page(path, cursor, extra=""):
+        query = f"limit={PAGE_SIZE}{extra}" + (f"&cursor={cursor}" if cursor else "")
+        return f"{path}?{query}"
+
+    endpoints = (
+        ("GET /", "/", ""),
+        ("GET /api/status", "/api/status", ""),
+        ("GET /api/search", "/api/search", "&sort=name"),
+        ("  vehicle_type=bus", "/api/status", "&vehicle_type=bus&min_available=10"),
+    )
+    print(f"{n_areas:,} areas, {PAGE_SIZE} per page")
+    print(f"{'endpoint':>20} | {'page':>6} | {'ms':>7} | {'peak KiB':>8}")
+    for label, path, extra in endpoints:
+        for page in checkpoints:
+            if page not in pages:
+                continue
+            url = url_for_page(path, pages[page], extra)
+            assert client.get(url).status_code == 200, url
+            ms = median_ms(lambda: client.get(url))
+            kb = peak_kb(lambda: client.get(url))
+            print(f"{label:>20} | {page:>6} | {ms:>7.2f} | {kb:>8.0f}")
+
+    # The dashboard's own area page, without the admin login round trip
+    with app.app_context():
+        from models import ParkingArea
+        for page in checkpoints:
+            if page not in pages:
+                continue
+
+            def dashboard_page():
+                ids, _ = search.search_page(sort="name", limit=25, cursor=pages[page])
+                ParkingArea.query.filter(ParkingArea.id.in_(ids)).all()
+                db.session.expunge_all()
+
+            print(f"{'admin area page':>20} | {page:>6} | {median_ms(dashboard_page):>7.2f} | {peak_kb(dashboard_page):>8.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
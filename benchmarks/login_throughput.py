@@ -0,0 +1,112 @@
+# benchmarks/login_throughput.py
+"""Login storm vs. kiosk latency under different password-hashing setups.
+
+For each setup, serves the app from a threaded local HTTP server, has
+LOGINS client threads sign in as different users as fast as they can for
+SECONDS seconds, and meanwhile polls /api/status/<id> from one kiosk
+thread. Reports logins/second and kiosk p50/p95/p99 latency, plus a
+kiosk-only baseline with no logins.
+
+Setups: Werkzeug's default pbkdf2 hashed inline on the request thread
+(the previous behaviour), bcrypt at 10 rounds inline, and bcrypt on
+the bounded hashing pool.
+
+Usage: python -m benchmarks.login_throughput [LOGINS] [SECONDS]
+"""
+import sys
+import threading
+import time
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from benchmarks._support import make_app, seed_estate, percentile
+from models import db, User
+from passwords import hasher
+
+PASSWORD = "bench-password"
+SETUPS = (
+    ("pbkdf2, inline", {"PASSWORD_HASH_METHOD": "pbkdf2:sha256:600000", "PASSWORD_HASH_WORKERS": 0}),
+    ("bcrypt 10, inline", {"PASSWORD_HASH_METHOD": "bcrypt", "PASSWORD_BCRYPT_ROUNDS": 10,
+                           "PASSWORD_HASH_WORKERS": 0}),
+    ("bcrypt 10, pool", {"PASSWORD_HASH_METHOD": "bcrypt", "PASSWORD_BCRYPT_ROUNDS": 10,
+                         "PASSWORD_HASH_WORKERS": 1, "PASSWORD_HASH_QUEUE": 64}),
+)
+
+
+class _Handler(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def serve(overrides, n_users):
+    app = make_app(SESSION_COOKIE_SECURE=False, **overrides)
+    with app.app_context():
+        seed_estate(100)
+        password_hash = hasher.hash(PASSWORD)  # one hash for everyone keeps setup quick
+        db.session.add_all(User(email=f"user{i}@example.com", password_hash=password_hash)
+                           for i in range(n_users))
+        db.session.commit()
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.port}", server
+
+
+def storm(base_url, n_logins, seconds):
+    """Returns (logins completed, rejected as busy, kiosk latencies)"""
+    stop = time.perf_counter() + seconds
+    counts = {"ok": 0, "busy": 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def login(index):
+        session = requests.Session()
+        while time.perf_counter() < stop:
+            response = session.post(f"{base_url}/auth/login", allow_redirects=False,
+                                    data={"email": f"user{index}@example.com", "password": PASSWORD})
+            session.cookies.clear()
+            with lock:
+                if response.status_code == 302:
+                    counts["ok"] += 1
+                elif response.status_code == 503:
+                    counts["busy"] += 1
+
+    def kiosk():
+        session = requests.Session()
+        area = 0
+        while time.perf_counter() < stop:
+            area = area % 100 + 1
+            started = time.perf_counter()
+            session.get(f"{base_url}/api/status/{area}")
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login, args=(i,)) for i in range(n_logins)]
+    threads.append(threading.Thread(target=kiosk))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts["ok"], counts["busy"], latencies
+
+
+def main(argv):
+    n_logins = int(argv[0]) if argv else 16
+    seconds = float(argv[1]) if len(argv) > 1 else 10
+    print(f"{n_logins} login threads + 1 kiosk thread, {seconds:.0f}s per setup")
+    print(f"{'setup':>18} | {'logins/s':>8} | {'busy':>5} | {'kiosk p50':>9} | {'p95':>7} | {'p99':>7}")
+    runs = [("kiosk only", SETUPS[-1][1], 0)] + [(label, overrides, n_logins) for label, overrides in SETUPS]
+    for label, overrides, logins in runs:
+        base_url, server = serve(overrides, max(logins, 1))
+        try:
+            ok, busy, latencies = storm(base_url, logins, seconds)
+        finally:
+            server.shutdown()
+        ms = [percentile(latencies, pct) * 1000 for pct in (50, 95, 99)]
+        print(f"{label:>18} | {ok / seconds:>8.1f} | {busy:>5} | {ms[0]:>7.1f}ms | {ms[1]:>5.1f}ms | {ms[2]:>5.1f}ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
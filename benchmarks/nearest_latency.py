@@ -0,0 +1,80 @@
+# benchmarks/nearest_latency.py
+"""Time nearest-available lookups on the grid index against a brute-force scan.
+
+Spreads N areas over a ~20 km square, checks that the grid returns the
+same areas as a full scan, then times both.
+
+Usage: python -m benchmarks.nearest_latency [AREAS]
+"""
+import random
+import sys
+
+from sqlalchemy import update
+
+import geo
+from benchmarks._support import make_app, seed_estate, median_ms
+from models import db, ParkingArea
+
+CENTER = (30.77, 76.57)
+SPREAD_DEG = 0.1
+
+
+def place_areas(n_areas):
+    rng = random.Random(9)
+    areas = ParkingArea.__table__
+    rows = [
+        {"id": i, "latitude": CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG),
+         "longitude": CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG)}
+        for i in range(1, n_areas + 1)
+    ]
+    db.session.connection().execute(
+        update(areas).where(areas.c.id == db.bindparam("area_id"))
+        .values(latitude=db.bindparam("lat"), longitude=db.bindparam("lon")),
+        [{"area_id": r["id"], "lat": r["latitude"], "lon": r["longitude"]} for r in rows],
+    )
+    db.session.commit()
+
+
+def brute_force(lat, lon, k, vehicle_type):
+    entries = [e for e in geo.geo_index._areas.values() if e.available_for(vehicle_type) > 0]
+    scored = sorted((geo.distance_m(lat, lon, e.latitude, e.longitude), e.id) for e in entries)
+    return [area_id for _, area_id in scored[:k]]
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 50_000
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        seed_estate(n_areas)
+        place_areas(n_areas)
+        geo.geo_index.ensure_fresh()
+
+        rng = random.Random(1)
+        points = [
+            (CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG), CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG))
+            for _ in range(200)
+        ]
+        for lat, lon in points:
+            got = [e.id for _, e in geo.geo_index.nearest(lat, lon, 5, "car")]
+            assert got == brute_force(lat, lon, 5, "car"), (lat, lon)
+        print(f"{n_areas:,} areas, {len(points)} lookups match a full scan")
+
+        def grid():
+            for lat, lon in points:
+                geo.geo_index.nearest(lat, lon, 5, "car")
+
+        def scan():
+            for lat, lon in points:
+                brute_force(lat, lon, 5, "car")
+
+        per_lookup = len(points)
+        print(f"{'grid index, k=5':>24}: {median_ms(grid) / per_lookup:8.3f} ms/lookup")
+        print(f"{'in-memory full scan':>24}: {median_ms(scan, repeat=1) / per_lookup:8.3f} ms/lookup")
+
+    url = f"/api/nearest?lat={CENTER[0]}&lon={CENTER[1]}&vehicle_type=car&k=5"
+    print(f"{'GET /api/nearest':>24}: {median_ms(lambda: client.get(url)):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
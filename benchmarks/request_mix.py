@@ -0,0 +1,278 @@
+# benchmarks/request_mix.py
+"""Replay a weighted mix of kiosk, search and admin traffic against a server.
+
+Seeds a synthetic estate (AREAS areas x 3 vehicle types plus an admin
+user) in a throwaway SQLite file, serves the app from a threaded local
+HTTP server and sends REQUESTS requests from CONCURRENCY client threads,
+each picking an endpoint by weight:
+
+    status           GET  /api/status/<id>            kiosk poll of one area
+    status_batch     GET  /api/status?ids=...         kiosk poll of 20 areas
+    search           GET  /api/search?q=...           search box
+    index            GET  /                           home page
+    admin_dashboard  GET  /admin/                     admin dashboard
+    admin_update     POST /admin/update-status/<id>   admin occupancy edit
+
+Reports p50/p95/p99 latency, throughput and SQL queries per request for
+each endpoint, and saves the results as JSON (by default to
+benchmarks/results/request_mix-<commit>.json) so runs can be compared
+across commits with --compare.
+
+Usage:
+    python -m benchmarks.request_mix [--areas 5000] [--requests 5000] [--concurrency 8]
+        [--mix status=40,search=15,...] [--output FILE] [--compare FILE]
+        [--url http://host:port --email admin@... --password ...]
+
+With --url the mix is sent to an already running server (which must
+hold areas and an admin login); queries per request are then not known.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+from flask import g, has_request_context
+from sqlalchemy import event, func, select
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from benchmarks._support import make_app, seed_estate, percentile
+from models import db, User, ParkingStatus
+
+MIX = {
+    "status": 40,
+    "status_batch": 15,
+    "search": 15,
+    "index": 10,
+    "admin_dashboard": 5,
+    "admin_update": 15,
+}
+ADMIN_EMAIL = "bench-admin@example.com"
+ADMIN_PASSWORD = "bench-password"
+SEARCH_TERMS = ("Area", "Area 00", "Block", "Area 0001", "zzz")
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class _Handler(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real front end
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def count_queries(app):
+    """Send each response's SQL statement count in an X-Query-Count header"""
+
+    @event.listens_for(db.engine, "before_cursor_execute")
+    def _count(*args, **kwargs):
+        if has_request_context():
+            g.bench_queries = g.get("bench_queries", 0) + 1
+
+    @app.after_request
+    def _report(response):
+        response.headers["X-Query-Count"] = str(g.get("bench_queries", 0))
+        return response
+
+
+def local_server(n_areas):
+    """Seed a fresh estate and serve it; returns (base_url, server, (areas, statuses))"""
+    app = make_app(SESSION_COOKIE_SECURE=False)
+    with app.app_context():
+        seed_estate(n_areas)
+        admin = User(email=ADMIN_EMAIL, is_admin=True)
+        admin.set_password(ADMIN_PASSWORD)
+        db.session.add(admin)
+        db.session.commit()
+        count_queries(app)
+        n_statuses = db.session.execute(select(func.max(ParkingStatus.id))).scalar()
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.port}", server, (n_areas, n_statuses)
+
+
+def login(base_url, email, password):
+    session = requests.Session()
+    response = session.post(f"{base_url}/auth/login", data={"email": email, "password": password},
+                            allow_redirects=False)
+    if response.status_code != 302 or "/admin" not in response.headers.get("Location", ""):
+        raise RuntimeError(f"Admin login as {email} failed")
+    return session
+
+
+def make_request(kind, rng, kiosk, admin, base_url, n_areas, n_statuses):
+    """Send one request of ``kind``; returns the response"""
+    if kind == "status":
+        return kiosk.get(f"{base_url}/api/status/{rng.randint(1, n_areas)}")
+    if kind == "status_batch":
+        start = rng.randint(1, max(1, n_areas - 20))
+        ids = ",".join(str(i) for i in range(start, min(n_areas, start + 19) + 1))
+        return kiosk.get(f"{base_url}/api/status", params={"ids": ids})
+    if kind == "search":
+        return kiosk.get(f"{base_url}/api/search", params={"q": rng.choice(SEARCH_TERMS), "limit": 20})
+    if kind == "index":
+        return kiosk.get(f"{base_url}/")
+    if kind == "admin_dashboard":
+        return admin.get(f"{base_url}/admin/")
+    if kind == "admin_update":
+        return admin.post(f"{base_url}/admin/update-status/{rng.randint(1, n_statuses)}",
+                          data={"occupied": rng.randint(0, 50)})
+    raise ValueError(f"Unknown request kind {kind}")
+
+
+def run_mix(base_url, login_as, n_areas, n_statuses, n_requests, concurrency, mix, seed):
+    """Send the mix; returns ({kind: [(seconds, ok, queries)]}, elapsed seconds)"""
+    plan = random.Random(seed).choices(list(mix), weights=list(mix.values()), k=n_requests)
+    results = {kind: [] for kind in mix}
+    position = iter(range(n_requests))
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(seed + index + 1)
+        kiosk = requests.Session()
+        admin = login_as()
+        while True:
+            with lock:
+                i = next(position, None)
+            if i is None:
+                return
+            kind = plan[i]
+            started = time.perf_counter()
+            try:
+                response = make_request(kind, rng, kiosk, admin, base_url, n_areas, n_statuses)
+                ok = response.status_code < 400
+                queries = response.headers.get("X-Query-Count")
+            except requests.RequestException:
+                ok, queries = False, None
+            elapsed = time.perf_counter() - started
+            with lock:
+                results[kind].append((elapsed, ok, int(queries) if queries is not None else None))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """Latency percentiles, throughput and queries/request for one endpoint"""
+    latencies = [s for s, ok, _ in samples if ok]
+    queries = [q for _, ok, q in samples if ok and q is not None]
+    summary = {
+        "requests": len(samples),
+        "errors": len(samples) - len(latencies),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else None,
+    }
+    for pct in (50, 95, 99):
+        summary[f"p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 2) if latencies else None
+    summary["queries_per_request"] = round(sum(queries) / len(queries), 2) if queries else None
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    print(f"{'endpoint':>16} | {'reqs':>6} | {'err':>4} | {'req/s':>7} | {'p50 ms':>7} | {'p95 ms':>7} | "
+          f"{'p99 ms':>7} | {'q/req':>5}")
+    rows = dict(report["endpoints"], total=report["total"])
+    for kind, s in rows.items():
+        def fmt(key, width, digits=1):
+            value = s[key]
+            return f"{'-':>{width}}" if value is None else f"{value:>{width}.{digits}f}"
+        print(f"{kind:>16} | {s['requests']:>6} | {s['errors']:>4} | {fmt('throughput_rps', 7, 0)} | "
+              f"{fmt('p50_ms', 7)} | {fmt('p95_ms', 7)} | {fmt('p99_ms', 7)} | {fmt('queries_per_request', 5)}")
+        old = baseline and (baseline["total"] if kind == "total" else baseline["endpoints"].get(kind))
+        if old:
+            deltas = []
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+                if old.get(key) and s.get(key) is not None:
+                    deltas.append(f"{key} {(s[key] - old[key]) / old[key] * 100:+.0f}%")
+            print(f"{'':>16}   vs {baseline['commit'] or 'baseline'}: {', '.join(deltas)}")
+
+
+def parse_mix(text):
+    mix = dict(MIX)
+    if text:
+        mix = {}
+        for part in text.split(","):
+            kind, _, weight = part.partition("=")
+            if kind.strip() not in MIX:
+                raise SystemExit(f"Unknown endpoint {kind!r}; choose from {', '.join(MIX)}")
+            mix[kind.strip()] = float(weight or 1)
+    return {kind: weight for kind, weight in mix.items() if weight > 0}
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--areas", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", help="comma-separated endpoint=weight pairs (default: %s)" %
+                        ",".join(f"{k}={v}" for k, v in MIX.items()))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="where to save the JSON results")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    parser.add_argument("--url", help="send the mix to this running server instead")
+    parser.add_argument("--email", default=ADMIN_EMAIL)
+    parser.add_argument("--password", default=ADMIN_PASSWORD)
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    server = None
+    if args.url:
+        base_url, n_areas, n_statuses = args.url.rstrip("/"), args.areas, args.areas * 3
+    else:
+        print(f"Seeding {args.areas:,} areas...")
+        base_url, server, (n_areas, n_statuses) = local_server(args.areas)
+
+    try:
+        login_as = lambda: login(base_url, args.email, args.password)  # noqa: E731
+        login_as()  # fail early on bad credentials
+        print(f"{args.requests:,} requests, {args.concurrency} client threads against {base_url}")
+        results, elapsed = run_mix(base_url, login_as, n_areas, n_statuses, args.requests,
+                                   args.concurrency, mix, args.seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    report = {
+        "benchmark": "request_mix",
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "server": args.url or "local werkzeug (threaded, SQLite)",
+        "params": {"areas": n_areas, "requests": args.requests, "concurrency": args.concurrency,
+                   "mix": mix, "seed": args.seed},
+        "elapsed_s": round(elapsed, 3),
+        "total": summarize([s for samples in results.values() for s in samples], elapsed),
+        "endpoints": {kind: summarize(samples, elapsed) for kind, samples in results.items()},
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"request_mix-{report['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,68 @@
+# benchmarks/search_latency.py
+"""Time ranked search and prefix autocomplete against a leading-wildcard ILIKE scan.
+
+Usage: python -m benchmarks.search_latency [AREAS]
+"""
+import random
+import sys
+
+from sqlalchemy import insert, or_, select
+
+import search
+from benchmarks._support import make_app, median_ms
+from models import db, ParkingArea
+
+WORDS = (
+    "north", "south", "east", "west", "central", "library", "stadium", "medical",
+    "science", "arts", "hostel", "gate", "plaza", "tower", "annex", "garden",
+    "lake", "hill", "market", "station", "faculty", "research", "sports", "visitor",
+)
+
+
+def seed_names(n_areas):
+    rng = random.Random(3)
+    rows = [
+        {
+            "id": i,
+            "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}",
+            "location": f"Near {rng.choice(WORDS).title()} - Block {i % 500}",
+        }
+        for i in range(1, n_areas + 1)
+    ]
+    db.session.execute(insert(ParkingArea), rows)
+    db.session.commit()
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 100_000
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        seed_names(n_areas)
+        print(f"{n_areas:,} areas, search backend: {search.backend()}")
+
+        def ilike_scan():
+            pattern = "%stad%"
+            db.session.execute(
+                select(ParkingArea.id)
+                .where(or_(ParkingArea.name.ilike(pattern), ParkingArea.location.ilike(pattern)))
+                .order_by(ParkingArea.name).limit(50)
+            ).all()
+
+        print(f"{'ILIKE %q% scan (50 rows)':>28}: {median_ms(ilike_scan):8.2f} ms")
+        print(f"{'search_page (50 rows)':>28}: {median_ms(lambda: search.search_page('stad', limit=50)):8.2f} ms")
+        print(f"{'autocomplete (10 rows)':>28}: {median_ms(lambda: search.autocomplete('sta', 10)):8.2f} ms")
+
+    # Through the HTTP layer, with the cache disabled so every call hits the index
+    app.config["AREA_CACHE_MAX_ENTRIES"] = 0
+    from cache import init_app
+    init_app(app)
+    for label, url in (
+        ("GET /api/search", "/api/search?q=medical+gate"),
+        ("GET /api/search autocomplete", "/api/search?q=res&mode=autocomplete&limit=10"),
+    ):
+        print(f"{label:>28}: {median_ms(lambda: client.get(url)):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,94 @@
+# benchmarks/serialization.py
+"""Compare response encoders and snapshot builders for the status APIs.
+
+1. Building snapshots for 200 areas from ORM objects (the previous
+   loader) vs. straight from row tuples (snapshots.from_rows).
+2. Encoding a 200-area /api/status page with Flask's jsonify provider,
+   the stdlib fallback, orjson and MessagePack.
+3. Requests/second and response bytes through the test client, with the
+   stdlib fallback (what jsonify did), orjson and MessagePack.
+
+Usage: python -m benchmarks.serialization [AREAS]
+"""
+import sys
+
+import serializers
+import snapshots
+from benchmarks._support import make_app, seed_estate, median_ms
+from models import db, ParkingArea
+
+REPEAT = 200
+PAGE = 200
+
+
+def main(argv):
+    n_areas = int(argv[0]) if argv else 1000
+    app = make_app()
+    client = app.test_client()
+    with app.app_context():
+        seed_estate(n_areas)
+        ids = list(range(1, min(n_areas, PAGE) + 1))
+
+        def orm_build():
+            for _ in range(20):
+                db.session.expunge_all()
+                areas = ParkingArea.query.filter(ParkingArea.id.in_(ids)).all()
+                {("area", a.id): snapshots.area_status(a) for a in areas}
+
+        def row_build():
+            for _ in range(20):
+                snapshots.from_rows(db.session.execute(snapshots.rows_query(ids)))
+
+        print(f"Snapshot build, {len(ids)} areas (ms per load)")
+        print(f"{'ORM objects':>16} | {median_ms(orm_build) / 20:>7.2f}")
+        print(f"{'row tuples':>16} | {median_ms(row_build) / 20:>7.2f}")
+
+        payload = {"areas": list(snapshots.from_rows(db.session.execute(snapshots.rows_query(ids))).values()),
+                   "next": "x" * 24}
+        fast = serializers.orjson
+        encoders = [("jsonify", lambda: app.json.response(payload).get_data())]
+        serializers.orjson = None
+        encoders.append(("stdlib json", lambda: serializers.dumps(payload)))
+        if fast is not None:
+            encoders.append(("orjson", lambda: fast.dumps(payload, option=fast.OPT_SORT_KEYS)))
+        if serializers.msgpack is not None:
+            encoders.append(("msgpack", lambda: serializers.encode(payload, serializers.MSGPACK)))
+
+        print(f"\nEncoding a {len(ids)}-area page")
+        print(f"{'encoder':>16} | {'us/encode':>9} | {'bytes':>7}")
+        for label, encode in encoders:
+            def run():
+                for _ in range(REPEAT):
+                    encode()
+            print(f"{label:>16} | {median_ms(run) / REPEAT * 1000:>9.1f} | {len(encode()):>7}")
+        serializers.orjson = fast
+
+    urls = (
+        ("/api/status?ids=(100)", "/api/status?ids=" + ",".join(str(i) for i in ids[:100])),
+        (f"/api/status?limit={PAGE}", f"/api/status?limit={PAGE}"),
+        (f"/api/search?limit={PAGE}", f"/api/search?q=Area&limit={PAGE}"),
+    )
+    variants = [("stdlib json", None, {})]
+    if fast is not None:
+        variants.append(("orjson", fast, {}))
+    if serializers.msgpack is not None:
+        variants.append(("msgpack", fast, {"Accept": serializers.MSGPACK}))
+
+    print(f"\nEnd to end, warm cache ({REPEAT} requests each)")
+    print(f"{'endpoint':>24} | {'format':>11} | {'req/s':>7} | {'bytes':>7}")
+    for label, url in urls:
+        for name, module, headers in variants:
+            serializers.orjson = module
+            size = len(client.get(url, headers=headers).data)
+
+            def run():
+                for _ in range(REPEAT):
+                    client.get(url, headers=headers)
+
+            rate = REPEAT / (median_ms(run) / 1000)
+            print(f"{label:>24} | {name:>11} | {rate:>7.0f} | {size:>7}")
+    serializers.orjson = fast
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,110 @@
+# benchmarks/sse_fanout.py
+"""Hold many concurrent /api/stream subscribers and time update delivery.
+
+Starts the app on a local threaded server, opens SUBSCRIBERS raw SSE
+connections, commits occupancy changes through the ORM (the same path the
+admin handlers use) and measures how long each change takes to reach
+every subscriber.
+
+Usage: python -m benchmarks.sse_fanout [SUBSCRIBERS] [UPDATES]
+"""
+import logging
+import resource
+import selectors
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+from benchmarks._support import make_app, seed_estate, percentile
+from models import db, ParkingStatus
+
+CONNECT_BATCH = 100
+
+
+def open_streams(port, count):
+    """Open ``count`` SSE connections and wait for their response headers"""
+    request = f"GET /api/stream HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    streams = []
+    for start in range(0, count, CONNECT_BATCH):
+        batch = []
+        for _ in range(min(CONNECT_BATCH, count - start)):
+            sock = socket.create_connection(("127.0.0.1", port))
+            sock.sendall(request)
+            batch.append(sock)
+        for sock in batch:
+            data = b""
+            while b"retry:" not in data:
+                data += sock.recv(4096)
+            sock.setblocking(False)
+        streams.extend(batch)
+    return streams
+
+
+def wait_for_event(streams, marker, timeout=30):
+    """Return the delivery time (s since call) of ``marker`` on each stream"""
+    started = time.perf_counter()
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for sock in streams:
+        selector.register(sock, selectors.EVENT_READ)
+        buffers[sock] = b""
+    latencies = []
+    try:
+        while len(latencies) < len(streams) and time.perf_counter() - started < timeout:
+            for key, _ in selector.select(timeout=1):
+                sock = key.fileobj
+                buffers[sock] += sock.recv(65536)
+                if marker in buffers[sock]:
+                    latencies.append(time.perf_counter() - started)
+                    selector.unregister(sock)
+    finally:
+        selector.close()
+    return latencies
+
+
+def main(argv):
+    subscribers = int(argv[0]) if argv else 1000
+    updates = int(argv[1]) if len(argv) > 1 else 5
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, subscribers * 2 + 256)), hard))
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    app = make_app(LIVE_UPDATES_ENABLED=True, SSE_HEARTBEAT=60)
+    with app.app_context():
+        seed_estate(10)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    opened = time.perf_counter()
+    streams = open_streams(server.server_port, subscribers)
+    print(f"Opened {len(streams)} subscribers in {time.perf_counter() - opened:.2f}s")
+
+    all_latencies = []
+    for n in range(updates):
+        occupied = 10 + n % 40  # never the seeded value, never repeats back to back
+        with app.app_context():
+            status = db.session.get(ParkingStatus, 1)
+            status.occupied = occupied
+            db.session.commit()
+        latencies = wait_for_event(streams, f'"occupied":{occupied},'.encode())
+        all_latencies.extend(latencies)
+        print(f"update {n + 1}: delivered to {len(latencies)}/{len(streams)} "
+              f"(p50 {percentile(latencies, 50) * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms)")
+
+    print(f"overall: p50 {percentile(all_latencies, 50) * 1000:.1f} ms, "
+          f"p99 {percentile(all_latencies, 99) * 1000:.1f} ms, "
+          f"max {max(all_latencies) * 1000:.1f} ms")
+    print(f"peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+    for sock in streams:
+        sock.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+# benchmarks/startup_time.py
+"""Cold-start cost of a worker: import, create_app() and first requests.
+
+Each run is a fresh interpreter (as a new gunicorn worker would be)
+against an already initialised SQLite database with AREAS areas. It
+reports the median over RUNS of: `import app`, `create_app()`, the SQL
+statements issued while booting, and the latency of the first
+GET /api/status/1 and GET / served by the new app. LATENCY_MS is added
+to every statement to stand in for the round trip to a networked
+PostgreSQL server (local SQLite has none).
+
+Compared: the old boot, which created the schema and search index in
+every worker (AUTO_CREATE_SCHEMA=1), and the default boot, which leaves
+that to `flask init-db`.
+
+Usage: python -m benchmarks.startup_time [RUNS] [AREAS] [LATENCY_MS]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks._support import make_app, seed_estate
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, os, time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+latency = float(os.environ["BENCH_SQL_LATENCY_MS"]) / 1000
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _round_trip(*args):
+    statements.append(1)
+    time.sleep(latency)
+
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+booted = time.perf_counter()
+boot_sql = len(statements)
+client = flask_app.test_client()
+client.get("/api/status/1")
+first_api = time.perf_counter()
+client.get("/")
+first_page = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": booted - imported, "boot_sql": boot_sql,
+                  "first_api": first_api - booted, "first_page": first_page - first_api}))
+"""
+
+MODES = (
+    ("create schema on boot", "1"),
+    ("init-db at deploy", ""),
+)
+
+
+def boot(database_uri, auto_create, latency_ms):
+    env = dict(os.environ, DATABASE_URL=database_uri, AUTO_CREATE_SCHEMA=auto_create, FLASK_ENV="production",
+               BENCH_SQL_LATENCY_MS=str(latency_ms))
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=REPO, env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv):
+    runs = int(argv[0]) if argv else 10
+    n_areas = int(argv[1]) if len(argv) > 1 else 1000
+    latency_ms = float(argv[2]) if len(argv) > 2 else 0
+    fd, path = tempfile.mkstemp(prefix="parking-bench-", suffix=".db")
+    os.close(fd)
+    database_uri = "sqlite:///" + path
+    with make_app(database_uri).app_context():
+        seed_estate(n_areas)
+
+    # Alternate the modes so drift in machine load hits both alike
+    samples = {label: [] for label, _ in MODES}
+    for _ in range(runs):
+        for label, auto_create in MODES:
+            samples[label].append(boot(database_uri, auto_create, latency_ms))
+
+    print(f"{runs} cold starts per mode, {n_areas} areas, +{latency_ms:g} ms per statement")
+    print(f"{'boot':>22} | {'import':>8} | {'create_app':>10} | {'boot SQL':>8} | "
+          f"{'1st /api/status':>15} | {'1st /':>8} | {'total':>8}")
+    for label, _ in MODES:
+        mode_samples = samples[label]
+        ms = {key: statistics.median(s[key] for s in mode_samples) * 1000
+              for key in ("import", "create_app", "first_api", "first_page")}
+        total = statistics.median(s["import"] + s["create_app"] + s["first_api"] for s in mode_samples) * 1000
+        print(f"{label:>22} | {ms['import']:>6.1f}ms | {ms['create_app']:>8.1f}ms | "
+              f"{mode_samples[0]['boot_sql']:>8} | {ms['first_api']:>13.1f}ms | {ms['first_page']:>6.1f}ms | {total:>6.1f}ms")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,60 @@
+# benchmarks/status_batch.py
+"""Compare the per-card status fan-out with the batch status endpoint.
+
+The availability cache is turned off so every request reaches the
+database, as on a cold cache; otherwise the warm-up would leave nothing
+for either strategy to query.
+
+Usage: python -m benchmarks.status_batch [SIZE ...]
+"""
+import sys
+
+from benchmarks._support import make_app, seed_estate, QueryCounter, median_ms
+from models import db
+
+DEFAULT_SIZES = (10, 100, 1000)
+
+
+def run(n_areas):
+    """Return (fan-out queries, fan-out ms, batch queries, batch ms)"""
+    app = make_app(AREA_CACHE_MAX_ENTRIES=0)
+    with app.app_context():
+        seed_estate(n_areas)
+        engine = db.engine
+
+    client = app.test_client()
+    ids = list(range(1, n_areas + 1))
+    batch_url = "/api/status?ids=" + ",".join(map(str, ids))
+
+    def fan_out():
+        for area_id in ids:
+            assert client.get(f"/api/status/{area_id}").status_code == 200
+
+    def batch():
+        assert client.get(batch_url).status_code == 200
+
+    # Warm up pools and template/JSON machinery before measuring
+    fan_out()
+    batch()
+
+    with QueryCounter(engine) as fan_out_queries:
+        fan_out()
+    with QueryCounter(engine) as batch_queries:
+        batch()
+
+    return (
+        fan_out_queries.count, median_ms(fan_out, repeat=3),
+        batch_queries.count, median_ms(batch),
+    )
+
+
+def main(argv):
+    sizes = [int(a) for a in argv] or DEFAULT_SIZES
+    print(f"{'areas':>6} | {'fan-out queries':>15} | {'fan-out ms':>10} | {'batch queries':>13} | {'batch ms':>8}")
+    for n in sizes:
+        fq, fms, bq, bms = run(n)
+        print(f"{n:>6} | {fq:>15} | {fms:>10.1f} | {bq:>13} | {bms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
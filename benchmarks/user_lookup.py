@@ -0,0 +1,72 @@
+# benchmarks/user_lookup.py
+"""SQL statements and latency per logged-in request, with and without the
+identity cache.
+
+Logs in as an admin and replays REQUESTS of each of: the admin AJAX
+occupancy update (POST /admin/update-status/<id>), the admin dashboard
+and the home page, counting the statements each request sends. With
+USER_CACHE_TTL=0 every request loads the user from the database, as
+before the cache existed.
+
+Usage: python -m benchmarks.user_lookup [REQUESTS] [AREAS]
+"""
+import statistics
+import sys
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmarks._support import make_app, seed_estate
+from identity import user_cache
+from models import db, User
+
+PASSWORD = "bench-password"
+SETUPS = (
+    ("no identity cache", {"USER_CACHE_TTL": 0}),
+    ("identity cache", {}),
+)
+
+
+REQUESTS = (
+    ("POST update-status", lambda client, i: client.post(f"/admin/update-status/{i % 50 + 1}",
+                                                         data={"occupied": i % 10})),
+    ("GET /admin/", lambda client, i: client.get("/admin/")),
+    ("GET /", lambda client, i: client.get("/")),
+)
+
+
+def main(argv):
+    n_requests = int(argv[0]) if argv else 500
+    n_areas = int(argv[1]) if len(argv) > 1 else 50
+    statements = []
+    event.listen(Engine, "before_cursor_execute", lambda *args: statements.append(1))
+
+    print(f"{n_requests} requests per endpoint as a logged-in admin, {n_areas} areas")
+    print(f"{'setup':>18} | {'request':>18} | {'SQL/request':>11} | {'p50':>7} | {'user hits':>9}")
+    for label, overrides in SETUPS:
+        app = make_app(SESSION_COOKIE_SECURE=False, PASSWORD_HASH_WORKERS=0, **overrides)
+        with app.app_context():
+            seed_estate(n_areas)
+            admin = User(email="admin@example.com", is_admin=True)
+            admin.set_password(PASSWORD)
+            db.session.add(admin)
+            db.session.commit()
+        client = app.test_client()
+        client.post("/auth/login", data={"email": "admin@example.com", "password": PASSWORD})
+        for name, send in REQUESTS:
+            hits = user_cache.hits
+            counts, timings = [], []
+            for i in range(n_requests):
+                before = len(statements)
+                started = time.perf_counter()
+                response = send(client, i)
+                timings.append(time.perf_counter() - started)
+                counts.append(len(statements) - before)
+                assert response.status_code == 200, (name, response.status_code)
+            print(f"{label:>18} | {name:>18} | {statistics.mean(counts):>11.2f} | "
+                  f"{statistics.median(timings) * 1000:>5.2f}ms | {user_cache.hits - hits:>9}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
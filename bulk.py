@@ -0,0 +1,342 @@
+# bulk.py
+"""Streaming bulk import and export of parking areas and their statuses.
+
+Files hold one record per status row::
+
+    name,location,latitude,longitude,vehicle_type,capacity,occupied
+
+with an empty vehicle_type for an area without statuses. NDJSON files
+use the same keys, or nest an area's statuses in one line:
+``{"name": ..., "location": ..., "statuses": [{"vehicle_type": "car",
+"capacity": 40, "occupied": 3}]}``.
+
+The importer validates records as they are read and writes them
+``chunk_size`` at a time, one transaction per chunk: areas are matched
+by name and statuses by (area, vehicle type), changed rows are updated
+and new ones inserted with executemany statements, and the area totals
+are refreshed in a single UPDATE. Invalid records are skipped and
+reported by line number. The exporter pages through areas by id, so
+neither direction holds the whole table in memory.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from sqlalchemy import bindparam, insert, select, update
+from changes import track_area, status_values
+from forms import VEHICLE_TYPES
+from models import db, ParkingArea, ParkingStatus, refresh_area_totals
+
+FIELDS = ("name", "location", "latitude", "longitude", "vehicle_type", "capacity", "occupied")
+FORMATS = ("csv", "ndjson")
+MAX_REPORTED_ERRORS = 100
+
+_VEHICLE_TYPES = {value for value, _ in VEHICLE_TYPES}
+_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+def format_for(filename):
+    """The import format implied by a file name, or None"""
+    for extension, fmt in _EXTENSIONS.items():
+        if filename and filename.lower().endswith(extension):
+            return fmt
+    return None
+
+
+# -- reading ---------------------------------------------------------------
+
+def read_records(stream, fmt):
+    """Yield ``(line_number, record)`` from a text stream.
+
+    ``record`` is a flat dict with FIELDS keys, or a ValueError for a
+    line that could not be parsed.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        missing = {"name", "location"} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"CSV header is missing {', '.join(sorted(missing))}")
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "ndjson":
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"Invalid JSON: {e}")
+                continue
+            if not isinstance(item, dict):
+                yield line_number, ValueError("Each line must be a JSON object")
+            elif "statuses" in item:
+                nested = item.pop("statuses") or []
+                if not isinstance(nested, list):
+                    yield line_number, ValueError("statuses must be a list")
+                    continue
+                for status in nested or [{}]:
+                    yield line_number, dict(item, **status) if isinstance(status, dict) else \
+                        ValueError("Each status must be an object")
+            else:
+                yield line_number, item
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+
+
+def _text(record, field, max_length, required=True):
+    value = record.get(field)
+    value = "" if value is None else str(value).strip()
+    if not value:
+        if required:
+            raise ValueError(f"{field} is required")
+        return None
+    if len(value) > max_length:
+        raise ValueError(f"{field} is longer than {max_length} characters")
+    return value
+
+
+def _number(record, field, cast, low, high, required=True):
+    value = record.get(field)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if required:
+            raise ValueError(f"{field} is required")
+        return None
+    try:
+        if isinstance(value, bool) or (cast is int and isinstance(value, float) and not value.is_integer()):
+            raise ValueError
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a{'n integer' if cast is int else ' number'}")
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise ValueError(f"{field} must be between {low} and {high}")
+    return value
+
+
+def validate(record):
+    """``(area, status)`` values for one record; status is None when the
+    record carries no vehicle type. Raises ValueError."""
+    area = {
+        "name": _text(record, "name", 100),
+        "location": _text(record, "location", 150),
+        "latitude": _number(record, "latitude", float, -90, 90, required=False),
+        "longitude": _number(record, "longitude", float, -180, 180, required=False),
+    }
+    vehicle_type = _text(record, "vehicle_type", 50, required=False)
+    if vehicle_type is None:
+        return area, None
+    vehicle_type = vehicle_type.lower()
+    if vehicle_type not in _VEHICLE_TYPES:
+        raise ValueError(f"vehicle_type must be one of {', '.join(sorted(_VEHICLE_TYPES))}")
+    capacity = _number(record, "capacity", int, 1, None)
+    occupied = _number(record, "occupied", int, 0, capacity, required=False) or 0
+    return area, {"vehicle_type": vehicle_type, "capacity": capacity, "occupied": occupied}
+
+
+# -- writing ---------------------------------------------------------------
+
+class _Chunk:
+    """Validated records waiting to be written, deduplicated by key"""
+
+    def __init__(self):
+        self.areas = {}     # name -> area values (last record wins)
+        self.statuses = {}  # (name, vehicle_type) -> (capacity, occupied)
+        self.records = 0
+
+    def add(self, area, status):
+        self.areas[area["name"]] = area
+        if status is not None:
+            self.statuses[(area["name"], status["vehicle_type"])] = (status["capacity"], status["occupied"])
+        self.records += 1
+
+
+def _write_chunk(chunk, report):
+    """Upsert one chunk in one transaction"""
+    areas, statuses = ParkingArea.__table__, ParkingStatus.__table__
+    now = datetime.utcnow()
+    session = db.session
+    try:
+        existing = {
+            row.name: row for row in session.execute(
+                select(areas.c.id, areas.c.name, areas.c.location, areas.c.latitude, areas.c.longitude)
+                .where(areas.c.name.in_(list(chunk.areas)))
+            )
+        }
+        new_areas, changed_areas = [], []
+        for name, values in chunk.areas.items():
+            row = existing.get(name)
+            if row is None:
+                new_areas.append(dict(values, last_updated=now, created_at=now))
+            elif (row.location, row.latitude, row.longitude) != \
+                    (values["location"], values["latitude"], values["longitude"]):
+                changed_areas.append({"_id": row.id, "_location": values["location"], "_latitude": values["latitude"],
+                                      "_longitude": values["longitude"], "_now": now})
+        if new_areas:
+            session.execute(insert(areas), new_areas)
+        if changed_areas:
+            session.execute(
+                update(areas).where(areas.c.id == bindparam("_id")).values(
+                    location=bindparam("_location"), latitude=bindparam("_latitude"),
+                    longitude=bindparam("_longitude"), last_updated=bindparam("_now")),
+                changed_areas,
+            )
+
+        ids = {row.name: row.id for row in existing.values()}
+        if new_areas:
+            ids.update(session.execute(
+                select(areas.c.name, areas.c.id).where(areas.c.name.in_([a["name"] for a in new_areas]))
+            ).all())
+        structural = {ids[a["name"]] for a in new_areas} | {a["_id"] for a in changed_areas}
+
+        status_areas = list({ids[name] for name, _ in chunk.statuses})
+        current = {}
+        if status_areas:
+            for row in session.execute(
+                select(statuses.c.id, statuses.c.area_id, statuses.c.vehicle_type,
+                       statuses.c.capacity, statuses.c.occupied)
+                .where(statuses.c.area_id.in_(status_areas))
+                .order_by(statuses.c.id.desc())  # the oldest row wins if a type is duplicated
+            ):
+                current[(row.area_id, row.vehicle_type)] = row
+
+        new_statuses, changed_statuses, written = [], [], set()
+        for (name, vehicle_type), (capacity, occupied) in chunk.statuses.items():
+            area_id = ids[name]
+            row = current.get((area_id, vehicle_type))
+            if row is None:
+                new_statuses.append({"area_id": area_id, "vehicle_type": vehicle_type, "capacity": capacity,
+                                     "occupied": occupied, "created_at": now})
+            elif (row.capacity, row.occupied or 0) != (capacity, occupied):
+                changed_statuses.append({"_id": row.id, "_capacity": capacity, "_occupied": occupied})
+            else:
+                continue
+            written.add((area_id, vehicle_type))
+        if new_statuses:
+            session.execute(insert(statuses), new_statuses)
+        if changed_statuses:
+            session.execute(
+                update(statuses).where(statuses.c.id == bindparam("_id"))
+                .values(capacity=bindparam("_capacity"), occupied=bindparam("_occupied")),
+                changed_statuses,
+            )
+
+        status_changes = {}
+        if written:
+            counted = {area_id for area_id, _ in written}
+            if counted - structural:
+                session.execute(
+                    update(areas).where(areas.c.id.in_(list(counted - structural))).values(last_updated=now)
+                )
+            for row in session.execute(
+                select(statuses.c.id, statuses.c.area_id, statuses.c.vehicle_type,
+                       statuses.c.capacity, statuses.c.occupied)
+                .where(statuses.c.area_id.in_(list(counted)))
+            ):
+                if (row.area_id, row.vehicle_type) in written:
+                    status_changes.setdefault(row.area_id, []).append(
+                        status_values(row.id, row.vehicle_type, row.capacity, row.occupied))
+
+        touched = structural | set(status_changes)
+        refresh_area_totals(session.connection(), touched)
+        for area_id in touched:
+            track_area(session, area_id, structural=area_id in structural, statuses=status_changes.get(area_id, ()))
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    report["areas_created"] += len(new_areas)
+    report["areas_updated"] += len(changed_areas)
+    report["statuses_created"] += len(new_statuses)
+    report["statuses_updated"] += len(changed_statuses)
+
+
+def import_records(records, chunk_size=1000):
+    """Validate and write ``(line_number, record)`` pairs; returns a report.
+
+    Chunks written before a database error stay committed; the error is
+    raised.
+    """
+    report = {"records": 0, "areas_created": 0, "areas_updated": 0, "statuses_created": 0,
+              "statuses_updated": 0, "error_count": 0, "errors": []}
+    chunk = _Chunk()
+    for line_number, record in records:
+        report["records"] += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            area, status = validate(record)
+        except ValueError as e:
+            report["error_count"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"line": line_number, "error": str(e)})
+            continue
+        chunk.add(area, status)
+        if chunk.records >= chunk_size:
+            _write_chunk(chunk, report)
+            chunk = _Chunk()
+    if chunk.records:
+        _write_chunk(chunk, report)
+    return report
+
+
+def import_stream(stream, fmt, chunk_size=1000):
+    """Import a CSV or NDJSON text stream"""
+    return import_records(read_records(stream, fmt), chunk_size)
+
+
+# -- export ----------------------------------------------------------------
+
+def _export_batches(batch_size):
+    """Yield lists of (area row, [status rows]) in id order"""
+    areas, statuses = ParkingArea.__table__, ParkingStatus.__table__
+    last_id = 0
+    while True:
+        area_rows = db.session.execute(
+            select(areas.c.id, areas.c.name, areas.c.location, areas.c.latitude, areas.c.longitude)
+            .where(areas.c.id > last_id).order_by(areas.c.id).limit(batch_size)
+        ).all()
+        if not area_rows:
+            return
+        grouped = {row.id: [] for row in area_rows}
+        for row in db.session.execute(
+            select(statuses.c.area_id, statuses.c.vehicle_type, statuses.c.capacity, statuses.c.occupied)
+            .where(statuses.c.area_id.in_(list(grouped)))
+            .order_by(statuses.c.area_id, statuses.c.vehicle_type, statuses.c.id)
+        ):
+            grouped[row.area_id].append(row)
+        yield [(row, grouped[row.id]) for row in area_rows]
+        last_id = area_rows[-1].id
+
+
+def export_lines(fmt, batch_size=1000):
+    """Yield the export as text, one chunk per batch of areas"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(FIELDS)
+        yield buffer.getvalue()
+    for batch in _export_batches(batch_size):
+        if fmt == "csv":
+            buffer.seek(0)
+            buffer.truncate()
+            for area, rows in batch:
+                head = (area.name, area.location, area.latitude, area.longitude)
+                if not rows:
+                    writer.writerow(head + (None, None, None))
+                for row in rows:
+                    writer.writerow(head + (row.vehicle_type, row.capacity, row.occupied or 0))
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps({
+                    "name": area.name,
+                    "location": area.location,
+                    "latitude": area.latitude,
+                    "longitude": area.longitude,
+                    "statuses": [{"vehicle_type": row.vehicle_type, "capacity": row.capacity,
+                                  "occupied": row.occupied or 0} for row in rows],
+                }, separators=(",", ":")) + "\n"
+                for area, rows in batch
+            )
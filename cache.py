@@ -0,0 +1,322 @@
+# cache.py
+"""In-process read-through cache for public availability snapshots.
+
+Entries are plain dicts built from SQL rows (snapshots.py), so a cache
+hit never touches the database. Writes invalidate the affected entries
+through the ``changes.area_changed`` signal once their transaction
+commits; a load that was already running when its key was invalidated
+returns its value but does not store it, since it may have read the old
+row.
+
+With read replicas, a reload right after an invalidation may still see
+the old row on a replica that has not caught up. For ``settle`` seconds
+after invalidating a key the cache only stores a reloaded value whose
+``version`` is newer than the one it dropped, and it does not store
+reloaded entries of an invalidated kind (listings carry no version) at
+all; they are read again, from a replica, until the window has passed.
+Each gunicorn worker has its own cache, so the TTL bounds how long
+another worker may serve a value that was changed elsewhere.
+"""
+import threading
+import time
+from collections import OrderedDict
+from changes import area_changed
+
+# Key kinds that hold lists of area ids rather than a single area.
+# Listings change when areas are added, renamed or removed; availability
+# listings also change whenever any count does.
+LISTING_KINDS = ("index", "search", "availability")
+AVAILABILITY_KINDS = ("availability",)
+
+_MISSING = object()
+
+
+class SnapshotCache:
+    """Thread-safe LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries=10000, ttl=30.0, version=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = version  # value -> comparable version, or None if it has none
+        self.settle = 0.0       # replica lag to allow for after an invalidation
+        self._settling = {}     # key -> (until, lowest acceptable version or None)
+        self._settling_kinds = {}  # kind -> until
+        self._entries = OrderedDict()
+        self._by_kind = {}  # key[0] -> keys, so invalidate_kinds skips other entries
+        self._lock = threading.Lock()
+        # Invalidations are numbered; while loads run, the number of each
+        # key's (and kind's) latest invalidation is kept so a load that
+        # overlapped one can tell
+        self._tick = 0
+        self._loading = {}  # tick a load started at -> loads running
+        self._marks = {}
+        self._kind_marks = {}
+        self._cleared = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def _lookup(self, key, now):
+        """Return the cached value or _MISSING; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= now:
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _store(self, key, value, now):
+        """Insert a value, evicting the least recently used; caller holds the lock"""
+        self._entries[key] = (now + self.ttl, value)
+        self._entries.move_to_end(key)
+        self._by_kind.setdefault(key[0], set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        """Drop an entry if present; caller holds the lock"""
+        if self._entries.pop(key, _MISSING) is _MISSING:
+            return False
+        keys = self._by_kind.get(key[0])
+        keys.discard(key)
+        if not keys:
+            del self._by_kind[key[0]]
+        return True
+
+    def _begin_load(self):
+        """Note a load starting and return its start tick; caller holds the lock"""
+        start = self._tick
+        self._loading[start] = self._loading.get(start, 0) + 1
+        return start
+
+    def _invalidated_since(self, key, start):
+        """True if ``key`` was invalidated after tick ``start``; caller holds the lock"""
+        return (self._cleared > start or self._marks.get(key, -1) > start
+                or self._kind_marks.get(key[0], -1) > start)
+
+    def _complete_load(self, start, loaded):
+        """Store the ``{key: value}`` a load produced unless invalidated
+        meanwhile, and forget marks no running load needs; caller holds the lock"""
+        now = time.monotonic()
+        for key, value in loaded.items():
+            if not self._invalidated_since(key, start) and self._settled(key, value, now):
+                self._store(key, value, now)
+        left = self._loading.pop(start) - 1
+        if left:
+            self._loading[start] = left
+        if not self._loading:
+            self._marks.clear()
+            self._kind_marks.clear()
+        elif len(self._marks) > self.max_entries:
+            oldest = min(self._loading)
+            self._marks = {key: tick for key, tick in self._marks.items() if tick > oldest}
+
+    def _settled(self, key, value, now):
+        """False if ``value`` may predate a recent invalidation of its key
+        or kind (see the module docstring); caller holds the lock"""
+        settling = self._settling.get(key)
+        if settling is not None:
+            until, floor = settling
+            if until > now:
+                version = self.version(value) if self.version and floor is not None else None
+                if version is None or version < floor:
+                    return False
+            del self._settling[key]
+        return self._settling_kinds.get(key[0], 0.0) <= now
+
+    def _start_settling(self, key, now):
+        """Note an invalidation of ``key``; caller holds the lock"""
+        entry = self._entries.get(key)
+        version = self.version(entry[1]) if self.version and entry is not None else None
+        floor = None if version is None else version + 1
+        previous = self._settling.get(key)
+        if previous is not None and previous[1] is not None and (floor is None or previous[1] > floor):
+            floor = previous[1]
+        self._settling[key] = (now + self.settle, floor)
+        if len(self._settling) > self.max_entries:
+            self._settling = {k: v for k, v in self._settling.items() if v[0] > now}
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for ``key``, calling ``loader()`` on a miss"""
+        if not self.enabled:
+            return loader()
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is _MISSING:
+                start = self._begin_load()
+        if value is _MISSING:
+            loaded = {}
+            try:
+                loaded[key] = value = loader()
+            finally:
+                with self._lock:
+                    self._complete_load(start, loaded)
+        return value
+
+    def get_many(self, keys, loader):
+        """Return ``{key: value}`` for ``keys``.
+
+        ``loader(missing_keys)`` is called once with every key that was not
+        cached and must return a dict for the keys it could resolve.
+        """
+        if not self.enabled:
+            return loader(list(keys))
+        found, missing = self._lookup_many(keys)
+        if missing:
+            loaded = {}
+            with self._lock:
+                start = self._begin_load()
+            try:
+                loaded = loader(missing)
+            finally:
+                with self._lock:
+                    self._complete_load(start, loaded)
+            found.update(loaded)
+        return found
+
+    def _lookup_many(self, keys):
+        """``(found, missing)`` for ``keys``: a dict of cached values and a list of the rest"""
+        found, missing = {}, []
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                value = self._lookup(key, now)
+                if value is _MISSING:
+                    missing.append(key)
+                else:
+                    found[key] = value
+        return found, missing
+
+    async def get_or_load_async(self, key, loader):
+        """get_or_load() for the async read path; ``loader()`` is awaited"""
+        if not self.enabled:
+            return await loader()
+        with self._lock:
+            value = self._lookup(key, time.monotonic())
+            if value is _MISSING:
+                start = self._begin_load()
+        if value is _MISSING:
+            loaded = {}
+            try:
+                loaded[key] = value = await loader()
+            finally:
+                with self._lock:
+                    self._complete_load(start, loaded)
+        return value
+
+    async def get_many_async(self, keys, loader):
+        """get_many() for the async read path; ``loader(missing_keys)`` is awaited"""
+        if not self.enabled:
+            return await loader(list(keys))
+        found, missing = self._lookup_many(keys)
+        if missing:
+            loaded = {}
+            with self._lock:
+                start = self._begin_load()
+            try:
+                loaded = await loader(missing)
+            finally:
+                with self._lock:
+                    self._complete_load(start, loaded)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, key):
+        """Drop a single entry"""
+        with self._lock:
+            if self._loading:
+                self._tick += 1
+                self._marks[key] = self._tick
+            if self.settle > 0:
+                self._start_settling(key, time.monotonic())
+            if self._remove(key):
+                self.invalidations += 1
+
+    def invalidate_kinds(self, kinds):
+        """Drop every entry whose key starts with one of ``kinds``"""
+        with self._lock:
+            if self._loading:
+                self._tick += 1
+                for kind in kinds:
+                    self._kind_marks[kind] = self._tick
+            if self.settle > 0:
+                until = time.monotonic() + self.settle
+                for kind in kinds:
+                    self._settling_kinds[kind] = until
+            stale = [key for kind in kinds for key in self._by_kind.get(kind, ())]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._tick += 1
+            self._cleared = self._tick
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._by_kind.clear()
+            self._settling.clear()
+            self._settling_kinds.clear()
+
+    def stats(self) -> dict:
+        """Counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def snapshot_version(value):
+    """The ``version`` of an area snapshot; listings have none"""
+    return value.get("version") if isinstance(value, dict) else None
+
+
+def replica_lag(app):
+    """How long reads may trail local commits: the read-your-writes window
+    when replicas are configured, else 0"""
+    if not app.config.get("SQLALCHEMY_REPLICAS"):
+        return 0.0
+    return float(app.config.get("REPLICA_STICKY_SECONDS", 5))
+
+
+area_cache = SnapshotCache(version=snapshot_version)
+
+
+def init_app(app):
+    """Size the shared cache from the app config"""
+    area_cache.max_entries = app.config.get("AREA_CACHE_MAX_ENTRIES", area_cache.max_entries)
+    area_cache.ttl = app.config.get("AREA_CACHE_TTL", area_cache.ttl)
+    area_cache.settle = replica_lag(app)
+    area_cache.clear()
+
+
+@area_changed.connect
+def _invalidate_changed_area(area_id, structural=False, **extra):
+    """Drop the snapshot of a changed area and any listings it may affect"""
+    area_cache.invalidate(("area", area_id))
+    area_cache.invalidate_kinds(LISTING_KINDS if structural else AVAILABILITY_KINDS)
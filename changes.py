@@ -0,0 +1,108 @@
+# changes.py
+"""Track which parking areas a transaction touched and announce them after commit"""
+from blinker import Namespace
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from models import ParkingArea, ParkingStatus
+
+_signals = Namespace()
+
+# Sent once per touched area after a successful commit.
+# sender: the area id. structural: True when the area row itself was
+# added, renamed, moved or deleted, so listings and search results that
+# do not mention the area may have changed too. statuses: the final
+# values of the status rows written ({"id": ..., "removed": True} for
+# deleted ones), keyed by status id.
+area_changed = _signals.signal("area-changed")
+
+_PENDING_KEY = "changed_areas"
+_STRUCTURAL_FIELDS = ("name", "location", "latitude", "longitude")
+
+
+class _AreaChange:
+    """What one transaction did to one area"""
+    __slots__ = ("structural", "statuses")
+
+    def __init__(self):
+        self.structural = False
+        self.statuses = {}
+
+
+def status_values(status_id, vehicle_type, capacity, occupied):
+    """The status delta shape carried by area_changed"""
+    occupied = occupied or 0
+    return {
+        "id": status_id,
+        "vehicle_type": vehicle_type,
+        "capacity": capacity,
+        "occupied": occupied,
+        "available": max(0, capacity - occupied),
+    }
+
+
+def track_area(session, area_id, structural=False, statuses=()):
+    """Record that the current transaction changed ``area_id``.
+
+    ORM changes are picked up automatically at flush time; bulk
+    statements that bypass the ORM must call this before committing,
+    passing the new status values (see status_values()).
+    """
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    change = pending.get(area_id)
+    if change is None:
+        change = pending[area_id] = _AreaChange()
+    change.structural = change.structural or structural
+    for values in statuses:
+        change.statuses[values["id"]] = values
+
+
+def pending_changes(session):
+    """``{area_id: change}`` recorded so far in the current transaction"""
+    return session.info.get(_PENDING_KEY, {})
+
+
+def _status_values(status):
+    return status_values(status.id, status.vehicle_type, status.capacity, status.occupied)
+
+
+def _area_is_structural(area):
+    state = inspect(area)
+    return any(state.attrs[field].history.has_changes() for field in _STRUCTURAL_FIELDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_areas(session, flush_context):
+    """Note every area whose row or status rows were written in this flush"""
+    for obj in session.new:
+        if isinstance(obj, ParkingArea):
+            track_area(session, obj.id, structural=True)
+        elif isinstance(obj, ParkingStatus):
+            track_area(session, obj.area_id, statuses=[_status_values(obj)])
+
+    for obj in session.dirty:
+        if not session.is_modified(obj):
+            continue
+        if isinstance(obj, ParkingArea):
+            track_area(session, obj.id, structural=_area_is_structural(obj))
+        elif isinstance(obj, ParkingStatus):
+            track_area(session, obj.area_id, statuses=[_status_values(obj)])
+
+    for obj in session.deleted:
+        if isinstance(obj, ParkingArea):
+            track_area(session, obj.id, structural=True)
+        elif isinstance(obj, ParkingStatus):
+            track_area(session, obj.area_id, statuses=[{"id": obj.id, "removed": True}])
+
+
+@event.listens_for(Session, "after_commit")
+def _announce_changed_areas(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for area_id, change in pending.items():
+        area_changed.send(area_id, structural=change.structural, statuses=list(change.statuses.values()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_areas(session):
+    session.info.pop(_PENDING_KEY, None)
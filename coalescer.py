@@ -0,0 +1,85 @@
+# coalescer.py
+"""Optional write-coalescing stage for bursty occupancy updates.
+
+When enabled, status updates are held for a short window and collapsed
+per status id, so a row that changes dozens of times a second is written
+once per window. Each flush goes through occupancy.apply_occupancy_batch(),
+which writes every pending row with a single UPDATE and touches each
+area's last_updated once. The latest submitted value always wins.
+"""
+import atexit
+import threading
+from occupancy import apply_occupancy_batch
+
+
+class WriteCoalescer:
+    """Collapses pending occupied counts per status id and flushes them periodically"""
+
+    def __init__(self):
+        self.app = None
+        self.window = 0.0
+        self._pending = {}
+        self._lock = threading.Lock()        # guards _pending
+        self._flush_lock = threading.Lock()  # keeps flushes in submission order
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.window = app.config.get("STATUS_COALESCE_WINDOW_MS", 0) / 1000
+        app.extensions["status_coalescer"] = self
+        if self.enabled:
+            atexit.register(self.shutdown)
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def submit(self, status_id, occupied):
+        """Queue an absolute occupied count; replaces any pending value for the row"""
+        with self._lock:
+            self._pending[status_id] = occupied
+            if self._thread is None or not self._thread.is_alive():
+                # Started lazily so it exists in each forked worker
+                self._thread = threading.Thread(target=self._run, name="status-coalescer", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """Write everything pending now; returns the per-row results"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return []
+            with self.app.app_context():
+                results = apply_occupancy_batch(
+                    [{"status_id": sid, "occupied": occupied} for sid, occupied in batch.items()]
+                )
+            for result in results:
+                if not result["ok"]:
+                    self.app.logger.warning(
+                        "Coalesced update for status %s rejected: %s", result["status_id"], result["error"]
+                    )
+            return results
+
+    def _run(self):
+        while not self._wakeup.wait(self.window):
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Coalesced status flush failed")
+
+    def shutdown(self):
+        """Stop the background thread and force a final flush"""
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+        self._wakeup.clear()
+
+
+coalescer = WriteCoalescer()
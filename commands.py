@@ -0,0 +1,153 @@
+# commands.py
+"""Flask CLI commands (flask init-db, flask seed, ...).
+
+Kept out of app.py so serving workers only pay for registering them;
+the modules each command needs are imported when it runs.
+"""
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from models import db, User
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the tables and the search index (run once per deploy)"""
+    from utils import init_database
+    init_database()
+
+
+@click.command("seed")
+@click.option("--areas", type=int, default=0, help="Also generate this many synthetic areas")
+@click.option("--types", default="car,bike,bus", help="Vehicle types for synthetic areas (comma-separated)")
+@click.option("--seed", type=int, help="Random seed for synthetic areas (same seed, same estate)")
+@click.option("--batch-size", type=int, help="Synthetic areas per transaction")
+@with_appcontext
+def seed_command(areas, types, seed, batch_size):
+    """Seed the database with sample data (and optionally a synthetic estate)"""
+    from forms import VEHICLE_TYPES
+    from utils import init_database, seed_data
+    vehicle_types = [t.strip().lower() for t in types.split(",") if t.strip()]
+    unknown = set(vehicle_types) - {value for value, _ in VEHICLE_TYPES}
+    if unknown or not vehicle_types:
+        raise click.BadParameter(f"choose from {', '.join(v for v, _ in VEHICLE_TYPES)}", param_hint="--types")
+    init_database()  # so a fresh checkout can start with `flask seed`
+    seed_data(areas, vehicle_types, seed, batch_size)
+
+
+@click.command("reset-db")
+@with_appcontext
+def reset_db_command():
+    """Reset the database (WARNING: Deletes all data)"""
+    from utils import reset_database
+    reset_database()
+
+
+@click.command("backfill-totals")
+@with_appcontext
+def backfill_totals_command():
+    """Add and populate the denormalized parking area totals"""
+    from utils import backfill_area_totals
+    backfill_area_totals()
+
+
+@click.command("add-coordinates")
+@with_appcontext
+def add_coordinates_command():
+    """Add the latitude/longitude columns used by /api/nearest"""
+    from utils import add_area_coordinates
+    add_area_coordinates()
+
+
+@click.command("import-areas")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), help="Default: from the file extension")
+@click.option("--chunk-size", type=int, help="Records per transaction (default IMPORT_CHUNK_SIZE)")
+@with_appcontext
+def import_areas_command(path, fmt, chunk_size):
+    """Import parking areas and statuses from a CSV or NDJSON file"""
+    import bulk
+    fmt = fmt or bulk.format_for(path)
+    if fmt is None:
+        raise click.UsageError("Cannot tell the format from the file name; pass --format")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        report = bulk.import_stream(f, fmt, chunk_size or current_app.config["IMPORT_CHUNK_SIZE"])
+    print(f"✅ Records read: {report['records']}")
+    print(f"   Areas created/updated: {report['areas_created']}/{report['areas_updated']}")
+    print(f"   Statuses created/updated: {report['statuses_created']}/{report['statuses_updated']}")
+    if report["error_count"]:
+        print(f"⚠️ Records skipped: {report['error_count']}")
+        for error in report["errors"]:
+            print(f"   line {error['line']}: {error['error']}")
+
+
+@click.command("export-areas")
+@click.argument("path", default="-", type=click.Path(dir_okay=False, allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), help="Default: from the file extension, else csv")
+@with_appcontext
+def export_areas_command(path, fmt):
+    """Export parking areas and statuses as CSV or NDJSON (- for stdout)"""
+    import bulk
+    fmt = fmt or bulk.format_for(path) or "csv"
+    with click.open_file(path, "w", encoding="utf-8", lazy=False) as f:
+        for chunk in bulk.export_lines(fmt, current_app.config["IMPORT_CHUNK_SIZE"]):
+            f.write(chunk)
+
+
+@click.command("rollup-history")
+@with_appcontext
+def rollup_history_command():
+    """Downsample occupancy history and apply retention (run from cron)"""
+    import history
+    written = history.rollup()
+    deleted = history.apply_retention(current_app.config["HISTORY_RETENTION_DAYS"])
+    print(f"✅ Rollup rows written: {written}")
+    print(f"🗑️ Rows deleted by retention: {deleted}")
+
+
+@click.command("refresh-forecasts")
+@click.option("--full", is_flag=True, help="Refit every series from FORECAST_HISTORY_DAYS of history")
+@with_appcontext
+def refresh_forecasts_command(full):
+    """Fold new history rollups into the forecast models (run after rollup-history)"""
+    import time
+    import forecast
+    started = time.perf_counter()
+    report = forecast.refresh(full=full)
+    print(f"✅ Forecast series refreshed: {report['series']} "
+          f"({report['rows']} rollup rows, {time.perf_counter() - started:.1f}s)")
+
+
+@click.command("create-admin")
+@with_appcontext
+def create_admin_command():
+    """Create a new admin user"""
+    email = input("Enter admin email: ")
+    password = input("Enter admin password: ")
+
+    existing = User.query.filter_by(email=email).first()
+    if existing:
+        print(f"❌ User with email {email} already exists!")
+        return
+
+    admin = User()
+    admin.email = email
+    admin.is_admin = True
+    admin.set_password(password)
+    db.session.add(admin)
+    db.session.commit()
+    print(f"✅ Admin user created: {email}")
+
+
+COMMANDS = (
+    init_db_command, seed_command, reset_db_command, backfill_totals_command, add_coordinates_command,
+    import_areas_command, export_areas_command, rollup_history_command, refresh_forecasts_command,
+    create_admin_command,
+)
+
+
+def init_app(app):
+    """Register the CLI commands on ``app``"""
+    for command in COMMANDS:
+        app.cli.add_command(command)
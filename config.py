@@ -8,6 +8,17 @@ INSTANCE_DIR = os.path.join(BASE_DIR, "instance")
 os.makedirs(INSTANCE_DIR, exist_ok=True)
 
 
+def _psycopg_uri(uri):
+    """Point PostgreSQL URLs at the psycopg3 driver"""
+    if uri and uri.startswith('postgres://'):
+        # Render provides postgres://, convert to postgresql+psycopg://
+        return uri.replace('postgres://', 'postgresql+psycopg://', 1)
+    if uri and uri.startswith('postgresql://'):
+        # Convert postgresql:// to postgresql+psycopg:// for psycopg3
+        return uri.replace('postgresql://', 'postgresql+psycopg://', 1)
+    return uri
+
+
 class Config:
     """Application configuration"""
     
@@ -16,25 +27,9 @@ class Config:
     DEBUG = os.environ.get("FLASK_ENV") == "development"
     
     # Database
-    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or \
+    SQLALCHEMY_DATABASE_URI = _psycopg_uri(os.environ.get("DATABASE_URL")) or \
         "sqlite:///" + os.path.join(INSTANCE_DIR, "parking.db")
     
-    # Fix for different PostgreSQL drivers (using psycopg3)
-    if SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI.startswith('postgres://'):
-        # Render provides postgres://, convert to postgresql+psycopg://
-        SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace(
-            'postgres://', 
-            'postgresql+psycopg://', 
-            1
-        )
-    elif SQLALCHEMY_DATABASE_URI and SQLALCHEMY_DATABASE_URI.startswith('postgresql://'):
-        # Convert postgresql:// to postgresql+psycopg:// for psycopg3
-        SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace(
-            'postgresql://', 
-            'postgresql+psycopg://', 
-            1
-        )
-    
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = DEBUG  # Log SQL queries in debug mode
     
@@ -48,6 +43,117 @@ class Config:
             'connect_timeout': 10,  # Connection timeout in seconds
         }
     }
+    if SQLALCHEMY_DATABASE_URI.startswith('sqlite'):
+        # sqlite3.connect() rejects connect_timeout
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
+    
+    # Schema creation is a deploy step (`flask init-db`), not part of worker
+    # boot, so create_app() does no database I/O. Set AUTO_CREATE_SCHEMA to
+    # have create_app() create missing tables itself (on by default in
+    # development, where `python app.py` is the only process).
+    AUTO_CREATE_SCHEMA = os.environ.get("AUTO_CREATE_SCHEMA", "1" if DEBUG else "").lower() in ("1", "true", "yes")
+    
+    # Read replicas for public GET requests (see replicas.py). Each entry
+    # is {"url": ..., "engine_options": {...}}; its engine_options are
+    # merged over REPLICA_ENGINE_OPTIONS, so pools can be sized per node.
+    # DATABASE_REPLICA_URLS is a comma-separated shortcut.
+    SQLALCHEMY_REPLICAS = [
+        {"url": _psycopg_uri(url.strip())}
+        for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    REPLICA_ENGINE_OPTIONS = dict(SQLALCHEMY_ENGINE_OPTIONS)
+    REPLICA_STICKY_SECONDS = float(os.environ.get("REPLICA_STICKY_SECONDS", 5))  # read-your-writes window
+    REPLICA_HEALTH_INTERVAL = float(os.environ.get("REPLICA_HEALTH_INTERVAL", 10))  # seconds between checks
+    
+    # Public availability cache (per worker); 0 disables it
+    AREA_CACHE_MAX_ENTRIES = int(os.environ.get("AREA_CACHE_MAX_ENTRIES", 10000))
+    AREA_CACHE_TTL = float(os.environ.get("AREA_CACHE_TTL", 30))  # seconds
+    
+    # Logged-in users (id, email, is_admin) per worker, so requests skip the
+    # user query. A user demoted or deleted in another worker keeps their
+    # old rights there for up to USER_CACHE_TTL seconds. 0 disables it
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", 10000))
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 10))  # seconds
+    
+    # Rendered area cards for the home page and admin dashboard (per worker);
+    # reused while the area version is unchanged. 0 disables it
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get("FRAGMENT_CACHE_MAX_ENTRIES", 20000))
+    FRAGMENT_CACHE_TTL = float(os.environ.get("FRAGMENT_CACHE_TTL", 600))  # seconds
+    
+    # Live updates over Server-Sent Events (/api/stream). Each open stream
+    # holds a worker thread, so only enable this with a threaded or async
+    # worker class, e.g. gunicorn -k gthread --threads 200
+    LIVE_UPDATES_ENABLED = os.environ.get("LIVE_UPDATES_ENABLED", "").lower() in ("1", "true", "yes")
+    SSE_HEARTBEAT = 15      # seconds between keep-alive comments
+    SSE_HISTORY = 1000      # events kept for Last-Event-ID replay
+    SSE_QUEUE_SIZE = 256    # per-client backlog before it is disconnected
+    # The stream only carries changes committed by the worker a client is
+    # connected to, so pages keep revalidating /api/status this often
+    # (seconds; an unchanged poll is a 304) to see other workers' commits
+    SSE_RESYNC_INTERVAL = int(os.environ.get("SSE_RESYNC_INTERVAL", 30))
+    
+    # Sensor ingestion API (/api/ingest/events); comma-separated bearer tokens
+    INGEST_API_TOKENS = [t.strip() for t in os.environ.get("INGEST_API_TOKENS", "").split(",") if t.strip()]
+    INGEST_MAX_BATCH = int(os.environ.get("INGEST_MAX_BATCH", 5000))
+    
+    # Collapse admin status updates per row within this window (ms); 0 writes immediately
+    STATUS_COALESCE_WINDOW_MS = int(os.environ.get("STATUS_COALESCE_WINDOW_MS", 0))
+    
+    # Occupancy history: days kept per resolution in seconds (0 = raw samples, None = forever)
+    HISTORY_RETENTION_DAYS = {0: 7, 60: 30, 900: 400, 3600: None}
+    HISTORY_MAX_POINTS = 10000  # per series in one /api/history response (raw: samples in all)
+    
+    # Occupancy forecasts (/api/forecast): weekday/weekend profiles per area
+    # and vehicle type, fitted from the 15-minute rollups by
+    # `flask refresh-forecasts` (schedule it after rollup-history). Workers
+    # load refreshed series every FORECAST_RELOAD_INTERVAL seconds.
+    FORECAST_TIMEZONE = os.environ.get("FORECAST_TIMEZONE", "UTC")  # local time that defines days and weekends
+    FORECAST_HISTORY_DAYS = 28    # history read by the first (or a --full) refresh
+    FORECAST_HALF_LIFE_DAYS = 14  # older data counts half as much per half-life
+    FORECAST_RELOAD_INTERVAL = 60  # seconds
+    FORECAST_MAX_HORIZON = 24 * 60  # minutes
+    
+    # Bulk import/export (flask import-areas, /admin/import): records per transaction
+    IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", 1000))
+    
+    # Page sizes: /api/search and /api/status listings, home page, admin dashboard
+    SEARCH_PAGE_SIZE = 50
+    SEARCH_MAX_PAGE_SIZE = 200
+    INDEX_PAGE_SIZE = 60
+    ADMIN_PAGE_SIZE = 25
+    
+    # /api/nearest: in-memory grid of area coordinates, rebuilt in full after
+    # GEO_INDEX_MAX_AGE seconds to pick up changes committed by other workers
+    GEO_GRID_CELL_DEG = 0.005   # ~500 m cells
+    GEO_INDEX_MAX_AGE = 300
+    NEAREST_MAX_K = 50
+    
+    # Cache-Control on public JSON: shared caches may store responses but
+    # must revalidate them (ETag / Last-Modified) before reuse
+    PUBLIC_CACHE_CONTROL = "public, no-cache"
+    
+    # Asyncio serving mode (uvicorn asgi:create_asgi_app --factory)
+    ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 10))  # threads for Flask routes
+    ASYNC_ENGINE_OPTIONS = {}  # extra options for the async engine, e.g. {"pool_size": 20}
+    
+    # Per-endpoint request metrics at /metrics (Prometheus text format).
+    # When disabled no hooks are installed. METRICS_DIR merges the numbers
+    # of all gunicorn workers; METRICS_TOKEN requires a bearer token.
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+    METRICS_QUERY_BUDGET = int(os.environ.get("METRICS_QUERY_BUDGET", 20))  # statements/request before it is flagged
+    METRICS_DIR = os.environ.get("METRICS_DIR", "")
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+    
+    # Password hashing: "bcrypt" or a Werkzeug method such as "scrypt".
+    # Stored hashes are upgraded at the next successful login whenever the
+    # method or cost changes. Hashing runs on PASSWORD_HASH_WORKERS threads
+    # per process (0 = inline) so a login burst can't take every core;
+    # callers past PASSWORD_HASH_QUEUE waiters get a 503 after the timeout.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "bcrypt")
+    PASSWORD_BCRYPT_ROUNDS = int(os.environ.get("PASSWORD_BCRYPT_ROUNDS", 10))  # ~80 ms per check; +1 doubles it
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+    PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 32))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 5))  # seconds
     
     # WTForms
     WTF_CSRF_ENABLED = True
@@ -79,6 +185,8 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLALCHEMY_REPLICAS = []
     WTF_CSRF_ENABLED = False
 
 
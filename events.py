@@ -0,0 +1,206 @@
+# events.py
+"""Local pub/sub hub that fans committed occupancy changes out to SSE clients.
+
+Every committed change becomes one ``area`` event holding a compact delta
+(the status rows that changed). Events are formatted as Server-Sent Events
+text once, when published, and pushed onto each subscriber's queue.
+
+The hub lives in the worker process, so a client only sees changes
+committed by the worker it is connected to; with several workers the
+page also revalidates /api/status every SSE_RESYNC_INTERVAL seconds to
+pick up the others' commits. Event ids carry a per-process
+prefix: a client that resumes against a different process, or asks for an
+id that has fallen out of the replay buffer, receives a ``reset`` event
+telling it to reload the full state instead.
+"""
+import asyncio
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from changes import area_changed
+
+_CLOSED = None
+
+
+def _format(event_id, event, data):
+    payload = json.dumps(data, separators=(",", ":"))
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    """One connected client's queue of pre-formatted SSE messages"""
+
+    def __init__(self, hub, queue_size):
+        self.hub = hub
+        self.queue = queue.Queue(maxsize=queue_size)
+
+    def push(self, message):
+        """Queue a message; a client too slow to keep up is disconnected"""
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.hub.unsubscribe(self)
+            self.close()
+
+    def close(self):
+        # Make room for the sentinel so the stream loop always wakes up
+        while True:
+            try:
+                self.queue.put_nowait(_CLOSED)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def messages(self, heartbeat):
+        """Yield queued messages, with a keep-alive comment when idle"""
+        while True:
+            try:
+                message = self.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if message is _CLOSED:
+                return
+            yield message
+
+
+class AsyncSubscription:
+    """A Subscription consumed from an asyncio event loop.
+
+    Publishers may run on any thread; messages are handed to the loop
+    with call_soon_threadsafe, so no thread waits on the client.
+    """
+
+    def __init__(self, hub, queue_size):
+        self.hub = hub
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # The loop has shut down
+            self.hub.unsubscribe(self)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.hub.unsubscribe(self)
+            self._close()
+
+    def close(self):
+        try:
+            self.loop.call_soon_threadsafe(self._close)
+        except RuntimeError:
+            pass
+
+    def _close(self):
+        while True:
+            try:
+                self.queue.put_nowait(_CLOSED)
+                return
+            except asyncio.QueueFull:
+                self.queue.get_nowait()
+
+    async def messages(self, heartbeat):
+        """Yield queued messages, with a keep-alive comment when idle"""
+        while True:
+            try:
+                message = await asyncio.wait_for(self.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if message is _CLOSED:
+                return
+            yield message
+
+
+class EventHub:
+    """Thread-safe fan-out of events to every subscriber, with replay"""
+
+    def __init__(self, history=1000, queue_size=256):
+        self.prefix = f"{os.getpid():x}{int(time.time()):x}"
+        self.queue_size = queue_size
+        self._counter = itertools.count(1)
+        self._history = deque(maxlen=history)  # (seq, message)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def configure(self, history, queue_size):
+        with self._lock:
+            self._history = deque(self._history, maxlen=history)
+            self.queue_size = queue_size
+
+    def publish(self, event, data):
+        """Send an event to every subscriber and keep it for replay"""
+        with self._lock:
+            seq = next(self._counter)
+            message = _format(f"{self.prefix}-{seq}", event, data)
+            self._history.append((seq, message))
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(message)
+        return seq
+
+    def subscribe(self, last_event_id=None, factory=Subscription):
+        """Register a client, replaying anything it missed since ``last_event_id``.
+
+        Pass ``factory=AsyncSubscription`` from inside an event loop.
+        """
+        subscription = factory(self, self.queue_size)
+        with self._lock:
+            if last_event_id:
+                missed = self._missed_since(last_event_id)
+                if missed is None:
+                    missed = [_format(f"{self.prefix}-0", "reset", {})]
+                for message in missed[-self.queue_size:]:
+                    subscription.queue.put_nowait(message)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _missed_since(self, last_event_id):
+        """Messages after ``last_event_id``, or None if they can't be replayed"""
+        prefix, _, seq = last_event_id.rpartition("-")
+        if prefix != self.prefix or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if self._history and seq < self._history[0][0] - 1:
+            return None
+        return [message for s, message in self._history if s > seq]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+hub = EventHub()
+
+
+def init_app(app):
+    """Size the hub from the app config"""
+    hub.configure(app.config.get("SSE_HISTORY", 1000), app.config.get("SSE_QUEUE_SIZE", 256))
+
+
+@area_changed.connect
+def _publish_area_change(area_id, structural=False, statuses=(), **extra):
+    """Broadcast a committed change as a compact delta"""
+    hub.publish("area", {
+        "areaId": area_id,
+        "structural": structural,
+        "statuses": [s for s in statuses if not s.get("removed")],
+        "removed": [s["id"] for s in statuses if s.get("removed")],
+        "ts": time.time(),
+    })
@@ -0,0 +1,475 @@
+# forecast.py
+"""Occupancy forecasts from seasonal models fitted to the history rollups.
+
+Every area and vehicle type gets its own model, fitted from the
+15-minute rollups in history.py, which every status writer already
+feeds:
+
+- a profile of the mean occupancy ratio (occupied / capacity) for each
+  15-minute slot of a weekday and of a weekend day, in
+  FORECAST_TIMEZONE, with older data weighted down by half every
+  FORECAST_HALF_LIFE_DAYS;
+- an AR(1) model of the deviation from that profile: ``phi``, how much
+  of it is left after 15 minutes, and the spread of the deviations.
+
+A forecast ``h`` minutes ahead is the profile at that time plus the
+current deviation shrunk by ``phi ** (h / 15)``; the spread gives the
+chance that a space will be free.
+
+refresh() (``flask refresh-forecasts``, run after rollup-history) folds
+the rollups added since its last run into the stored models, for all
+series at once with NumPy, and rewrites only the series that changed.
+The first run fits FORECAST_HISTORY_DAYS of history, mostly aggregated
+in SQL. Workers keep the fitted profiles in arrays and load changed
+series every FORECAST_RELOAD_INTERVAL seconds, so a forecast request
+does no database work beyond the area snapshot.
+"""
+import math
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import numpy as np
+from flask import current_app
+from sqlalchemy import Float, case, cast, delete, func, insert, select, tuple_
+from models import db, ForecastProfile, OccupancyRollup, ParkingStatus
+from history import DAY, QUARTER_HOUR
+
+SLOT = QUARTER_HOUR
+SLOTS_PER_DAY = DAY // SLOT
+N_SLOTS = 2 * SLOTS_PER_DAY  # weekday slots, then weekend slots
+
+DEFAULT_PHI = 0.9     # per 15 minutes, until a series has MIN_AR_PAIRS pairs of consecutive buckets
+DEFAULT_SIGMA = 0.1   # deviation spread as a share of capacity, until fitted
+MIN_AR_PAIRS = 8
+MAX_PHI = 0.98
+MIN_SIGMA = 0.01
+REBASE_HALF_LIVES = 60  # move a series' weight epoch forward before its weights reach 2**60
+RECENT_DAYS = 1         # a full fit reads the newest day row by row, for the AR(1) terms
+CHUNK = 500             # keys per IN (...) when loading or replacing stored models
+
+
+def utc_offset(tz_name, ts):
+    """Seconds to add to Unix time ``ts`` for local time in ``tz_name``"""
+    return int(datetime.fromtimestamp(ts, ZoneInfo(tz_name)).utcoffset().total_seconds())
+
+
+def offset_segments(tz_name, start, end):
+    """``[(from, offset), ...]``: the UTC offsets in force over [start, end),
+    checked every 15 minutes, each with the time it takes effect"""
+    segments = []
+    for ts in range(start - start % SLOT, max(end, start + 1), SLOT):
+        offset = utc_offset(tz_name, ts)
+        if not segments or segments[-1][1] != offset:
+            segments.append((ts, offset))
+    return segments
+
+
+def local_offsets(tz_name, buckets):
+    """UTC offset of each Unix time in ``buckets`` (an array), so profile
+    slots stay in local time across daylight saving changes"""
+    if not len(buckets):
+        return np.zeros(0, dtype=np.int64)
+    segments = offset_segments(tz_name, int(buckets.min()), int(buckets.max()) + 1)
+    starts = np.array([ts for ts, _ in segments], dtype=np.int64)
+    offsets = np.array([offset for _, offset in segments], dtype=np.int64)
+    return offsets[np.searchsorted(starts, buckets, side="right") - 1]
+
+
+def slot_of(ts, offset):
+    """Profile slot of Unix time ``ts`` (an int or an array): 0-95 on
+    weekdays, 96-191 at weekends"""
+    local = ts + offset
+    weekend = (local // DAY + 3) % 7 >= 5  # 1970-01-01 was a Thursday
+    return weekend * SLOTS_PER_DAY + (local % DAY) // SLOT
+
+
+def profiles(sums, weights):
+    """Mean ratio per slot for each series (rows of ``sums``/``weights``).
+
+    A slot without data takes the value of the slot before it, as a
+    missing rollup means nothing changed; a day type without any data
+    borrows the other's. Series without any data are all NaN.
+    """
+    n = len(sums)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        p = np.where(weights > 0, sums / weights, np.nan).reshape(n, 2, SLOTS_PER_DAY)
+    doubled = np.concatenate([p, p], axis=2)  # so the fill wraps around midnight
+    positions = np.where(np.isnan(doubled), -1, np.arange(2 * SLOTS_PER_DAY))
+    np.maximum.accumulate(positions, axis=2, out=positions)
+    filled = np.take_along_axis(doubled, np.maximum(positions, 0), axis=2)
+    filled[positions < 0] = np.nan
+    p = filled[:, :, SLOTS_PER_DAY:].copy()
+    empty = np.isnan(p).all(axis=2)
+    p[empty[:, 0], 0] = p[empty[:, 0], 1]
+    p[empty[:, 1], 1] = p[empty[:, 1], 0]
+    return p.reshape(n, N_SLOTS)
+
+
+class _Models:
+    """Accumulators for many series as parallel arrays (one row per series).
+
+    Weights are ``2 ** ((bucket - epoch) / half_life)``, so folding in
+    newer data never rescales what is already stored.
+    """
+
+    def __init__(self, keys, epoch):
+        n = len(keys)
+        self.keys = list(keys)
+        self.epoch = np.full(n, epoch, dtype=np.int64)
+        self.sums = np.zeros((n, N_SLOTS))
+        self.weights = np.zeros((n, N_SLOTS))
+        self.resid_sq = np.zeros(n)
+        self.resid_weight = np.zeros(n)
+        self.ar_num = np.zeros(n)
+        self.ar_den = np.zeros(n)
+        self.ar_pairs = np.zeros(n, dtype=np.int64)
+        self.last_bucket = np.full(n, -1, dtype=np.int64)
+        self.last_resid = np.zeros(n)
+
+    @classmethod
+    def from_rows(cls, rows, keys=None, epoch=0):
+        """Models for ``keys`` (default: those of ``rows``), filled from
+        stored ForecastProfile rows; keys without a row start empty"""
+        if keys is None:
+            keys = [(row.area_id, row.vehicle_type) for row in rows]
+        models = cls(keys, epoch)
+        position = {key: i for i, key in enumerate(models.keys)}
+        for row in rows:
+            i = position.get((row.area_id, row.vehicle_type))
+            if i is None:
+                continue
+            models.epoch[i] = row.epoch
+            models.sums[i] = np.frombuffer(row.slot_sums)
+            models.weights[i] = np.frombuffer(row.slot_weights)
+            models.resid_sq[i] = row.resid_sq
+            models.resid_weight[i] = row.resid_weight
+            models.ar_num[i] = row.ar_num
+            models.ar_den[i] = row.ar_den
+            models.ar_pairs[i] = row.ar_pairs
+            models.last_bucket[i] = -1 if row.last_bucket is None else row.last_bucket
+            models.last_resid[i] = row.last_resid or 0.0
+        return models
+
+    def rows(self, indices, fitted_to):
+        """ForecastProfile rows for the series at ``indices``"""
+        return [
+            {
+                "area_id": self.keys[i][0],
+                "vehicle_type": self.keys[i][1],
+                "epoch": int(self.epoch[i]),
+                "slot_sums": self.sums[i].tobytes(),
+                "slot_weights": self.weights[i].tobytes(),
+                "resid_sq": float(self.resid_sq[i]),
+                "resid_weight": float(self.resid_weight[i]),
+                "ar_num": float(self.ar_num[i]),
+                "ar_den": float(self.ar_den[i]),
+                "ar_pairs": int(self.ar_pairs[i]),
+                "last_bucket": int(self.last_bucket[i]) if self.last_bucket[i] >= 0 else None,
+                "last_resid": float(self.last_resid[i]),
+                "fitted_to": fitted_to,
+            }
+            for i in indices
+        ]
+
+    def parameters(self):
+        """``(profiles, phi, sigma)`` arrays for forecasting"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            phi = np.where((self.ar_pairs >= MIN_AR_PAIRS) & (self.ar_den > 0),
+                           np.clip(self.ar_num / self.ar_den, 0.0, MAX_PHI), DEFAULT_PHI)
+            sigma = np.where(self.resid_weight > 0, np.sqrt(self.resid_sq / self.resid_weight), DEFAULT_SIGMA)
+        return profiles(self.sums, self.weights), phi, np.maximum(sigma, MIN_SIGMA)
+
+    def add_slot_means(self, idx, slot, count, ratio_sum, ratio_sq_sum, weight):
+        """Fold per-slot aggregates (count, sum and sum of squares of the
+        bucket ratios) in, all at the same ``weight``"""
+        n = len(self.keys)
+        w = np.full(len(idx), weight)
+        flat = idx * N_SLOTS + slot
+        self.sums += np.bincount(flat, w * ratio_sum, minlength=n * N_SLOTS).reshape(n, N_SLOTS)
+        self.weights += np.bincount(flat, w * count, minlength=n * N_SLOTS).reshape(n, N_SLOTS)
+        # Spread around each slot's own mean
+        self.resid_sq += np.bincount(idx, w * np.maximum(ratio_sq_sum - ratio_sum ** 2 / count, 0.0), minlength=n)
+        self.resid_weight += np.bincount(idx, w * count, minlength=n)
+
+    def add_buckets(self, idx, bucket, ratio, offset, half_life):
+        """Fold individual bucket ratios in, updating the profiles and the
+        AR(1) terms; ``offset`` holds each bucket's UTC offset. Returns the
+        indices of the series touched"""
+        n = len(self.keys)
+        order = np.lexsort((bucket, idx))
+        idx, bucket, ratio, offset = idx[order], bucket[order], ratio[order], offset[order]
+        first = np.r_[True, idx[1:] != idx[:-1]]
+        last = np.r_[idx[1:] != idx[:-1], True]
+        touched, newest = idx[last], bucket[last]
+
+        rebase = (newest - self.epoch[touched]) / half_life > REBASE_HALF_LIVES
+        if rebase.any():
+            series = touched[rebase]
+            factor = 2.0 ** ((self.epoch[series] - newest[rebase]) / half_life)
+            self.sums[series] *= factor[:, None]
+            self.weights[series] *= factor[:, None]
+            for name in ("resid_sq", "resid_weight", "ar_num", "ar_den"):
+                getattr(self, name)[series] *= factor
+            self.epoch[series] = newest[rebase]
+
+        w = 2.0 ** ((bucket - self.epoch[idx]) / half_life)
+        slot = slot_of(bucket, offset)
+        flat = idx * N_SLOTS + slot
+        self.sums += np.bincount(flat, w * ratio, minlength=n * N_SLOTS).reshape(n, N_SLOTS)
+        self.weights += np.bincount(flat, w, minlength=n * N_SLOTS).reshape(n, N_SLOTS)
+
+        resid = ratio - profiles(self.sums[touched], self.weights[touched])[np.searchsorted(touched, idx), slot]
+        self.resid_sq += np.bincount(idx, w * resid ** 2, minlength=n)
+        self.resid_weight += np.bincount(idx, w, minlength=n)
+
+        # Pair each bucket with the one 15 minutes before it, which may be
+        # the newest bucket folded in by an earlier refresh
+        prev_bucket = np.r_[-1, bucket[:-1]]
+        prev_resid = np.r_[0.0, resid[:-1]]
+        prev_bucket[first] = self.last_bucket[idx[first]]
+        prev_resid[first] = self.last_resid[idx[first]]
+        pair = bucket - prev_bucket == SLOT
+        self.ar_num += np.bincount(idx[pair], (w * resid * prev_resid)[pair], minlength=n)
+        self.ar_den += np.bincount(idx[pair], (w * prev_resid ** 2)[pair], minlength=n)
+        self.ar_pairs += np.bincount(idx[pair], minlength=n)
+        self.last_bucket[touched] = newest
+        self.last_resid[touched] = resid[last]
+        return touched
+
+
+def _rollups_end():
+    """End of the newest 15-minute rollup bucket, or None"""
+    rollups = OccupancyRollup.__table__
+    last = db.session.execute(select(func.max(rollups.c.bucket)).where(rollups.c.resolution == SLOT)).scalar()
+    return None if last is None else last + SLOT
+
+
+def _series_index(index, area_ids, vehicle_types, add=True):
+    """Row positions for (area_id, vehicle_type) pairs, -1 for unknown ones"""
+    if add:
+        return np.fromiter((index.setdefault(key, len(index)) for key in zip(area_ids, vehicle_types)),
+                           dtype=np.int64, count=len(area_ids))
+    return np.fromiter((index.get(key, -1) for key in zip(area_ids, vehicle_types)),
+                       dtype=np.int64, count=len(area_ids))
+
+
+def _bucket_rows(start, end):
+    """``(area_ids, vehicle_types, buckets, ratios)`` of the 15-minute rollups in [start, end)"""
+    rollups = OccupancyRollup.__table__
+    rows = db.session.execute(
+        select(rollups.c.area_id, rollups.c.vehicle_type, rollups.c.bucket,
+               cast(rollups.c.occupied_sum, Float) / (rollups.c.samples * rollups.c.capacity))
+        .where(rollups.c.resolution == SLOT, rollups.c.bucket >= start, rollups.c.bucket < end,
+               rollups.c.capacity > 0, rollups.c.samples > 0)
+    ).all()
+    if not rows:
+        return (), (), np.empty(0, dtype=np.int64), np.empty(0)
+    area_ids, vehicle_types, buckets, ratios = zip(*rows)
+    return area_ids, vehicle_types, np.array(buckets, dtype=np.int64), np.clip(np.array(ratios, dtype=float), 0, 1)
+
+
+def _slot_mean_rows(start, end, offset):
+    """Per series and slot: bucket count, sum and sum of squares of the
+    bucket ratios of the 15-minute rollups in [start, end), grouped in SQL"""
+    rollups = OccupancyRollup.__table__
+    local = rollups.c.bucket + offset
+    slot = (case(((local // DAY + 3) % 7 >= 5, SLOTS_PER_DAY), else_=0) + (local % DAY) // SLOT).label("slot")
+    ratio = cast(rollups.c.occupied_sum, Float) / (rollups.c.samples * rollups.c.capacity)
+    return db.session.execute(
+        select(rollups.c.area_id, rollups.c.vehicle_type, slot,
+               func.count(), func.sum(ratio), func.sum(ratio * ratio))
+        .where(rollups.c.resolution == SLOT, rollups.c.bucket >= start, rollups.c.bucket < end,
+               rollups.c.capacity > 0, rollups.c.samples > 0)
+        .group_by(rollups.c.area_id, rollups.c.vehicle_type, slot)
+    ).all()
+
+
+def _fit_history(end, tz_name, half_life, history_days):
+    """Models of every current status series from the last ``history_days``"""
+    start = end - history_days * DAY
+    recent = max(start, end - RECENT_DAYS * DAY)
+    statuses = ParkingStatus.__table__
+    keys = db.session.execute(select(statuses.c.area_id, statuses.c.vehicle_type).distinct()).all()
+    index = {tuple(key): i for i, key in enumerate(keys)}
+    models = _Models(index, epoch=recent)
+
+    rows = []
+    if recent > start:
+        # One GROUP BY per stretch of constant UTC offset (split at DST changes)
+        segments = offset_segments(tz_name, start, recent)
+        bounds = [max(start, ts) for ts, _ in segments[1:]] + [recent]
+        for (ts, offset), until in zip(segments, bounds):
+            rows += _slot_mean_rows(max(start, ts), until, offset)
+    if rows:
+        area_ids, vehicle_types, slot, count, ratio_sum, ratio_sq_sum = zip(*rows)
+        idx = _series_index(index, area_ids, vehicle_types, add=False)
+        known = idx >= 0
+        # The aggregated days count as if they were all from the middle of their range
+        weight = 2.0 ** (((start + recent) / 2 - recent) / half_life)
+        models.add_slot_means(idx[known], np.array(slot, dtype=np.int64)[known], np.array(count, dtype=float)[known],
+                              np.array(ratio_sum, dtype=float)[known], np.array(ratio_sq_sum, dtype=float)[known],
+                              weight)
+
+    area_ids, vehicle_types, buckets, ratios = _bucket_rows(recent, end)
+    idx = _series_index(index, area_ids, vehicle_types, add=False)
+    known = idx >= 0
+    if known.any():
+        models.add_buckets(idx[known], buckets[known], ratios[known],
+                           local_offsets(tz_name, buckets[known]), half_life)
+    return models, len(rows) + len(buckets)
+
+
+def _load_models(keys, epoch):
+    """Stored models for ``keys``, with empty ones for keys not stored yet"""
+    profiles_table = ForecastProfile.__table__
+    rows = []
+    for i in range(0, len(keys), CHUNK):
+        chunk = keys[i:i + CHUNK]
+        rows += db.session.execute(
+            select(profiles_table).where(
+                tuple_(profiles_table.c.area_id, profiles_table.c.vehicle_type).in_(chunk))
+        ).all()
+    return _Models.from_rows(rows, keys, epoch)
+
+
+def _replace_models(models, indices, fitted_to):
+    profiles_table = ForecastProfile.__table__
+    keys = [models.keys[i] for i in indices]
+    for i in range(0, len(keys), CHUNK):
+        db.session.execute(delete(profiles_table).where(
+            tuple_(profiles_table.c.area_id, profiles_table.c.vehicle_type).in_(keys[i:i + CHUNK])))
+    for i in range(0, len(indices), CHUNK * 10):
+        db.session.execute(insert(profiles_table), models.rows(indices[i:i + CHUNK * 10], fitted_to))
+
+
+def refresh(full=False):
+    """Fold the 15-minute rollups added since the last refresh into the
+    stored models and commit. ``full`` refits every series from
+    FORECAST_HISTORY_DAYS of history, as the first refresh does.
+
+    Returns ``{"series": models written, "rows": rollup rows read, "fitted_to": ...}``.
+    """
+    config = current_app.config
+    half_life = config["FORECAST_HALF_LIFE_DAYS"] * DAY
+    end = _rollups_end()
+    if end is None:
+        return {"series": 0, "rows": 0, "fitted_to": None}
+    tz_name = config["FORECAST_TIMEZONE"]
+    fitted_to = None if full else db.session.execute(select(func.max(ForecastProfile.fitted_to))).scalar()
+
+    try:
+        if fitted_to is None:
+            models, n_rows = _fit_history(end, tz_name, half_life, config["FORECAST_HISTORY_DAYS"])
+            written = np.arange(len(models.keys))
+            db.session.execute(delete(ForecastProfile.__table__))
+        elif fitted_to >= end:
+            return {"series": 0, "rows": 0, "fitted_to": fitted_to}
+        else:
+            area_ids, vehicle_types, buckets, ratios = _bucket_rows(fitted_to, end)
+            index = {}
+            idx = _series_index(index, area_ids, vehicle_types)
+            models = _load_models(list(index), epoch=fitted_to)
+            written = (models.add_buckets(idx, buckets, ratios, local_offsets(tz_name, buckets), half_life)
+                       if len(idx) else idx)
+            n_rows = len(buckets)
+        _replace_models(models, written, end)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"series": len(written), "rows": n_rows, "fitted_to": end}
+
+
+class Forecaster:
+    """A worker's copy of the fitted models, and the forecasts made from them"""
+
+    def __init__(self, config):
+        self.timezone = config.get("FORECAST_TIMEZONE", "UTC")
+        self.reload_interval = config.get("FORECAST_RELOAD_INTERVAL", 60)
+        self.fitted_to = None
+        # (index, profiles, phi, sigma), replaced as a whole so readers never see a partial update
+        self._model = ({}, np.empty((0, N_SLOTS)), np.empty(0), np.empty(0))
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """Load the series refreshed since the last check, at most once per
+        interval; ``fitted_to`` is current afterwards"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.reload_interval:
+                return
+            profiles_table = ForecastProfile.__table__
+            query = select(profiles_table)
+            if self.fitted_to is not None:
+                query = query.where(profiles_table.c.fitted_to > self.fitted_to)
+            rows = db.session.execute(query).all()
+            if rows:
+                self._merge(rows)
+            self._checked_at = now
+
+    def _merge(self, rows):
+        models = _Models.from_rows(rows)
+        new_profiles, new_phi, new_sigma = models.parameters()
+        index, old_profiles, old_phi, old_sigma = self._model
+        if any(key not in index for key in models.keys):
+            index = dict(index)
+        positions = _series_index(index, [k[0] for k in models.keys], [k[1] for k in models.keys])
+        size = len(index)
+        profiles_, phi, sigma = (np.resize(old_profiles, (size, N_SLOTS)), np.resize(old_phi, size),
+                                 np.resize(old_sigma, size))
+        profiles_[positions], phi[positions], sigma[positions] = new_profiles, new_phi, new_sigma
+        self._model = (index, profiles_, phi, sigma)
+        self.fitted_to = max(self.fitted_to or 0, max(row.fitted_to for row in rows))
+
+    def forecast(self, area_id, statuses, horizon, now=None):
+        """Forecast for each status of ``area_id`` (dicts with vehicle_type,
+        capacity and occupied, as in the area snapshot) ``horizon`` minutes ahead"""
+        self.sync()
+        index, profiles_, phi, sigma = self._model
+        now = int(time.time() if now is None else now)
+        target = now + horizon * 60
+        slot_now = slot_of(now, utc_offset(self.timezone, now))
+        slot_target = slot_of(target, utc_offset(self.timezone, target))
+        steps = horizon * 60 / SLOT
+
+        result = []
+        for status in statuses:
+            capacity, occupied = status["capacity"], status["occupied"] or 0
+            current = occupied / capacity if capacity else 0.0
+            i = index.get((area_id, status["vehicle_type"]))
+            if i is not None and not math.isnan(profiles_[i, slot_target]):
+                series_phi, series_sigma = float(phi[i]), float(sigma[i])
+                expected = profiles_[i, slot_target] + (current - profiles_[i, slot_now]) * series_phi ** steps
+                model = "profile"
+            else:
+                series_phi, series_sigma = DEFAULT_PHI, DEFAULT_SIGMA
+                expected = current
+                model = "current"
+            expected = min(1.0, max(0.0, float(expected)))
+            # Spread of an AR(1) forecast grows towards the full spread with the horizon
+            spread = max(series_sigma * math.sqrt(1 - series_phi ** (2 * steps)), 1e-6)
+            free_below = (capacity - 0.5) / capacity if capacity else 0.0
+            chance = 0.5 * (1 + math.erf((free_below - expected) / (spread * math.sqrt(2)))) if capacity else 0.0
+            expected_occupied = round(expected * capacity)
+            result.append({
+                "vehicle_type": status["vehicle_type"],
+                "capacity": capacity,
+                "occupied": occupied,
+                "expected_occupied": expected_occupied,
+                "expected_available": capacity - expected_occupied,
+                "chance_of_space": round(chance, 3),
+                "model": model,
+            })
+        return result
+
+
+def forecaster():
+    """This app's Forecaster, created on first use (numpy loads with it)"""
+    found = current_app.extensions.get("forecaster")
+    if found is None:
+        found = current_app.extensions.setdefault("forecaster", Forecaster(current_app.config))
+    return found
@@ -1,6 +1,20 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, IntegerField, SelectField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange
+from flask_wtf.file import FileField, FileRequired, FileAllowed
+from wtforms import StringField, PasswordField, BooleanField, SubmitField, IntegerField, FloatField, SelectField
+from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, Optional, ValidationError
+
+# bcrypt only uses the first 72 bytes of a password. Checked when a password
+# is chosen, not at login: hashes made by other methods take any length
+PASSWORD_MAX_BYTES = 72
+
+
+def password_bytes(form, field):
+    """Reject new passwords bcrypt would truncate (counted in UTF-8 bytes)"""
+    if field.data and len(field.data.encode("utf-8")) > PASSWORD_MAX_BYTES:
+        raise ValidationError(f"Password must be at most {PASSWORD_MAX_BYTES} bytes.")
+
+
+VEHICLE_TYPES = [("car", "Car"), ("bike", "Bike"), ("bus", "Bus")]
 
 
 # ----------------------
@@ -18,7 +32,7 @@ class LoginForm(FlaskForm):
 # ----------------------
 class RegistrationForm(FlaskForm):
     email = StringField("Email", validators=[DataRequired(), Email()])
-    password = PasswordField("Password", validators=[DataRequired(), Length(min=6)])
+    password = PasswordField("Password", validators=[DataRequired(), Length(min=6), password_bytes])
     confirm_password = PasswordField(
         "Confirm Password",
         validators=[DataRequired(), EqualTo("password", message="Passwords must match.")]
@@ -32,6 +46,8 @@ class RegistrationForm(FlaskForm):
 class ParkingAreaForm(FlaskForm):
     name = StringField("Area Name", validators=[DataRequired(), Length(max=100)])
     location = StringField("Location", validators=[DataRequired(), Length(max=150)])
+    latitude = FloatField("Latitude", validators=[Optional(), NumberRange(min=-90, max=90)])
+    longitude = FloatField("Longitude", validators=[Optional(), NumberRange(min=-180, max=180)])
     submit = SubmitField("Save")
 
 
@@ -41,9 +57,19 @@ class ParkingAreaForm(FlaskForm):
 class ParkingStatusForm(FlaskForm):
     vehicle_type = SelectField(
         "Vehicle Type",
-        choices=[("car", "Car"), ("bike", "Bike"), ("bus", "Bus")],
+        choices=VEHICLE_TYPES,
         validators=[DataRequired()]
     )
     capacity = IntegerField("Capacity", validators=[DataRequired(), NumberRange(min=1)])
     occupied = IntegerField("Occupied", validators=[DataRequired(), NumberRange(min=0)])
-    submit = SubmitField("Save")
\ No newline at end of file
+    submit = SubmitField("Save")
+
+
+# ----------------------
+# Bulk Import
+# ----------------------
+class ImportForm(FlaskForm):
+    file = FileField("CSV or NDJSON file", validators=[
+        FileRequired(), FileAllowed(["csv", "ndjson", "jsonl"], "Upload a .csv, .ndjson or .jsonl file")
+    ])
+    submit = SubmitField("Import")
@@ -0,0 +1,87 @@
+# fragments.py
+"""Cache of rendered per-area HTML cards for the home page and dashboard.
+
+Each entry is keyed by ``(kind, area_id)`` and remembers the area
+``version`` it was rendered from; a card is reused only while the
+version still matches, so a change made through another worker is
+picked up as soon as the page sees the new version. Changes committed
+in this worker also drop the cards through ``changes.area_changed``.
+
+Cards must not contain anything that varies per user or per request.
+The dashboard's delete forms carry ``CSRF_PLACEHOLDER`` instead of a
+token, and the view swaps in the real token once for the whole page.
+"""
+import time
+from flask import current_app
+from cache import SnapshotCache
+from changes import area_changed
+
+CARD_KINDS = ("index_card", "admin_card")
+CSRF_PLACEHOLDER = "__csrf_token__"
+
+
+class FragmentCache(SnapshotCache):
+    """SnapshotCache of ``(version, html)`` pairs"""
+
+    def __init__(self, max_entries=20000, ttl=600.0):
+        super().__init__(max_entries, ttl)
+        self.stale = 0
+
+    def render_cards(self, kind, versions, render):
+        """Concatenated HTML (a plain str) for ``versions``, a list of ``(area_id, version)``.
+
+        ``render(area_ids)`` is called once with every area whose card is
+        missing or out of date and returns ``{area_id: (version, html)}``;
+        areas it leaves out are skipped.
+        """
+        found, missing = {}, []
+        if self.enabled:
+            with self._lock:
+                now = time.monotonic()
+                for area_id, version in versions:
+                    entry = self._entries.get((kind, area_id))
+                    if entry is not None and entry[0] > now and entry[1][0] == version:
+                        self._entries.move_to_end((kind, area_id))
+                        self.hits += 1
+                        found[area_id] = entry[1][1]
+                    else:
+                        self.misses += 1
+                        self.stale += entry is not None
+                        missing.append(area_id)
+        else:
+            missing = [area_id for area_id, _ in versions]
+        if missing:
+            rendered = render(missing)
+            if self.enabled:
+                with self._lock:
+                    now = time.monotonic()
+                    for area_id, value in rendered.items():
+                        self._store((kind, area_id), value, now)
+            found.update((area_id, html) for area_id, (_, html) in rendered.items())
+        return "".join(found[area_id] for area_id, _ in versions if area_id in found)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["stale"] = self.stale
+        return stats
+
+
+fragment_cache = FragmentCache()
+
+
+def card_macro(name):
+    """A macro from templates/_area_cards.html, for rendering cards one at a time"""
+    return getattr(current_app.jinja_env.get_template("_area_cards.html").module, name)
+
+
+def init_app(app):
+    """Size the fragment cache from the app config"""
+    fragment_cache.max_entries = app.config.get("FRAGMENT_CACHE_MAX_ENTRIES", fragment_cache.max_entries)
+    fragment_cache.ttl = app.config.get("FRAGMENT_CACHE_TTL", fragment_cache.ttl)
+    fragment_cache.clear()
+
+
+@area_changed.connect
+def _invalidate_changed_cards(area_id, **extra):
+    for kind in CARD_KINDS:
+        fragment_cache.invalidate((kind, area_id))
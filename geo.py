@@ -0,0 +1,298 @@
+# geo.py
+"""In-memory grid index of parking area coordinates for nearest-area queries.
+
+Areas with a latitude and longitude are bucketed into square cells of
+``cell_deg`` degrees. A query walks rings of cells outwards from the
+query point and stops once no unvisited cell can hold anything closer
+than the k-th match, so it only looks at areas near the point. Where the
+walk would cross mostly empty cells (a sparse or far-flung grid, or a
+vehicle type few areas offer), it gives up after visiting as many cells
+as hold areas and checks the occupied cells directly instead, so a
+lookup never costs much more than a scan.
+
+The index is loaded from the database on first use. Committed changes
+arrive through ``changes.area_changed``: status deltas update the stored
+availability in place, while added, moved, renamed or deleted areas are
+re-read (together, in one query) before the next lookup. Like the
+snapshot cache, each worker has its own index; a full reload every
+``max_age`` seconds picks up changes committed by other workers.
+"""
+import heapq
+import math
+import threading
+import time
+from sqlalchemy import select
+from changes import area_changed
+from models import db, ParkingArea, ParkingStatus
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    """Great-circle (haversine) distance in metres"""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+
+class _Entry:
+    """One indexed area"""
+    __slots__ = ("id", "name", "location", "latitude", "longitude", "cell", "statuses", "available")
+
+    def __init__(self, row, cell):
+        self.id = row.id
+        self.name = row.name
+        self.location = row.location
+        self.latitude = row.latitude
+        self.longitude = row.longitude
+        self.cell = cell
+        self.statuses = {}   # status id -> (vehicle_type, available)
+        self.available = {}  # vehicle type -> available spots
+
+    def set_status(self, status_id, vehicle_type, available):
+        self.statuses[status_id] = (vehicle_type, available)
+
+    def remove_status(self, status_id):
+        self.statuses.pop(status_id, None)
+
+    def recount(self):
+        available = {}
+        for vehicle_type, spots in self.statuses.values():
+            available[vehicle_type] = available.get(vehicle_type, 0) + spots
+        self.available = available
+
+    def available_for(self, vehicle_type):
+        if vehicle_type is None:
+            return sum(self.available.values())
+        return self.available.get(vehicle_type, 0)
+
+
+class GridIndex:
+    """Thread-safe uniform grid over area coordinates"""
+
+    def __init__(self, cell_deg=0.005, max_age=300.0):
+        self.cell_deg = cell_deg
+        self.max_age = max_age
+        self._areas = {}   # area id -> _Entry
+        self._cells = {}   # (row, col) -> set of area ids
+        self._bounds = None  # (min row, max row, min col, max col)
+        self._dirty = set()
+        self._loaded_at = None
+        self._loading = False
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def configure(self, cell_deg, max_age):
+        """Resize the grid; the next lookup reloads it"""
+        with self._lock:
+            self.cell_deg = cell_deg
+            self.max_age = max_age
+            self._loaded_at = None
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg))
+
+    # -- maintenance ------------------------------------------------------
+
+    def _add(self, entry):
+        """Index an entry; caller holds the lock"""
+        self._areas[entry.id] = entry
+        self._cells.setdefault(entry.cell, set()).add(entry.id)
+        row, col = entry.cell
+        if self._bounds is None:
+            self._bounds = (row, row, col, col)
+        else:
+            r0, r1, c0, c1 = self._bounds
+            self._bounds = (min(r0, row), max(r1, row), min(c0, col), max(c1, col))
+
+    def _remove(self, area_id):
+        """Drop an area if indexed; caller holds the lock"""
+        entry = self._areas.pop(area_id, None)
+        if entry is None:
+            return
+        cell = self._cells.get(entry.cell)
+        if cell is not None:
+            cell.discard(area_id)
+            if not cell:
+                del self._cells[entry.cell]
+
+    def _load(self, area_ids=None):
+        """Read areas with coordinates and their status rows as entries"""
+        areas = ParkingArea.__table__
+        statuses = ParkingStatus.__table__
+        located = areas.c.latitude.isnot(None) & areas.c.longitude.isnot(None)
+        if area_ids is not None:
+            located = located & areas.c.id.in_(list(area_ids))
+
+        entries = {}
+        area_rows = db.session.execute(
+            select(areas.c.id, areas.c.name, areas.c.location, areas.c.latitude, areas.c.longitude)
+            .where(located)
+        )
+        for row in area_rows:
+            entries[row.id] = _Entry(row, self._cell(row.latitude, row.longitude))
+
+        status_rows = db.session.execute(
+            select(statuses.c.id, statuses.c.area_id, statuses.c.vehicle_type,
+                   statuses.c.capacity, statuses.c.occupied)
+            .join(areas, areas.c.id == statuses.c.area_id)
+            .where(located)
+        )
+        for row in status_rows:
+            entry = entries.get(row.area_id)
+            if entry is not None:
+                entry.set_status(row.id, row.vehicle_type, max(0, row.capacity - (row.occupied or 0)))
+        for entry in entries.values():
+            entry.recount()
+        return entries
+
+    def rebuild(self):
+        """Reload every area from the database"""
+        with self._lock:
+            self._loading = True
+            self._dirty.clear()
+        try:
+            entries = self._load()
+        finally:
+            with self._lock:
+                self._loading = False
+        with self._lock:
+            self._areas, self._cells, self._bounds = {}, {}, None
+            for entry in entries.values():
+                self._add(entry)
+            self._loaded_at = time.monotonic()
+
+    def _refresh_dirty(self):
+        """Re-read areas whose row changed since the last lookup"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            if not dirty:
+                return
+            self._loading = True
+        try:
+            entries = self._load(dirty)
+        finally:
+            with self._lock:
+                self._loading = False
+        with self._lock:
+            for area_id in dirty:
+                self._remove(area_id)
+                if area_id in entries:
+                    self._add(entries[area_id])
+
+    def ensure_fresh(self):
+        """Load the index if it is missing or too old, then apply pending reloads"""
+        with self._load_lock:
+            loaded_at = self._loaded_at
+            if loaded_at is None or time.monotonic() - loaded_at > self.max_age:
+                self.rebuild()
+            elif self._dirty:
+                self._refresh_dirty()
+
+    def apply_change(self, area_id, structural=False, statuses=()):
+        """Fold a committed change into the index"""
+        with self._lock:
+            if structural or self._loading:
+                # Also re-read changes that race a load, which may not see them
+                self._dirty.add(area_id)
+                if structural:
+                    return
+            entry = self._areas.get(area_id)
+            if entry is None:
+                return
+            for values in statuses:
+                if values.get("removed"):
+                    entry.remove_status(values["id"])
+                else:
+                    entry.set_status(values["id"], values["vehicle_type"], values["available"])
+            entry.recount()
+
+    # -- queries ----------------------------------------------------------
+
+    def _ring(self, row, col, radius, bounds):
+        """Occupied-range cells at Chebyshev distance ``radius`` from (row, col)"""
+        r0, r1, c0, c1 = bounds
+        if radius == 0:
+            yield (row, col)
+            return
+        cols = range(max(col - radius, c0), min(col + radius, c1) + 1)
+        for r in (row - radius, row + radius):
+            if r0 <= r <= r1:
+                for c in cols:
+                    yield (r, c)
+        rows = range(max(row - radius + 1, r0), min(row + radius - 1, r1) + 1)
+        for c in (col - radius, col + radius):
+            if c0 <= c <= c1:
+                for r in rows:
+                    yield (r, c)
+
+    def _outside_distance(self, latitude, longitude, row, col, radius):
+        """Lower bound on the distance to any cell beyond ``radius`` rings"""
+        size = self.cell_deg
+        dlat = min(latitude - (row - radius) * size, (row + radius + 1) * size - latitude)
+        dlon = min(longitude - (col - radius) * size, (col + radius + 1) * size - longitude)
+        # Meridians converge, so measure longitude at the most poleward edge
+        edge_lat = min(90.0, abs(latitude) + (radius + 1) * size)
+        lat_m = math.radians(dlat) * EARTH_RADIUS_M
+        lon_m = math.radians(dlon) * EARTH_RADIUS_M * math.cos(math.radians(edge_lat))
+        return min(lat_m, lon_m)
+
+    def _scan(self, latitude, longitude, k, vehicle_type):
+        """The ``k`` closest free areas from every occupied cell; caller holds the lock"""
+        matches = []
+        for ids in self._cells.values():
+            for area_id in ids:
+                entry = self._areas[area_id]
+                if entry.available_for(vehicle_type) > 0:
+                    distance = distance_m(latitude, longitude, entry.latitude, entry.longitude)
+                    matches.append((distance, area_id, entry))
+        return [(distance, entry) for distance, _, entry in heapq.nsmallest(k, matches)]
+
+    def nearest(self, latitude, longitude, k=5, vehicle_type=None):
+        """``[(distance_m, entry)]`` for the ``k`` closest areas with spots free.
+
+        ``vehicle_type`` limits the availability check to that type; None
+        accepts any free spot.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            if self._bounds is None or k <= 0:
+                return []
+            row, col = self._cell(latitude, longitude)
+            r0, r1, c0, c1 = self._bounds
+            min_radius = max(0, r0 - row, row - r1, c0 - col, col - c1)
+            max_radius = max(abs(row - r0), abs(row - r1), abs(col - c0), abs(col - c1))
+
+            best = []  # max-heap of (-distance, area id, entry)
+            visited, budget = 0, len(self._cells)
+            for radius in range(min_radius, max_radius + 1):
+                if visited > budget:
+                    return self._scan(latitude, longitude, k, vehicle_type)
+                for cell in self._ring(row, col, radius, self._bounds):
+                    visited += 1
+                    for area_id in self._cells.get(cell, ()):
+                        entry = self._areas[area_id]
+                        if entry.available_for(vehicle_type) <= 0:
+                            continue
+                        distance = distance_m(latitude, longitude, entry.latitude, entry.longitude)
+                        if len(best) < k:
+                            heapq.heappush(best, (-distance, area_id, entry))
+                        elif distance < -best[0][0]:
+                            heapq.heapreplace(best, (-distance, area_id, entry))
+                if len(best) == k and -best[0][0] <= self._outside_distance(latitude, longitude, row, col, radius):
+                    break
+            return sorted(((-d, entry) for d, _, entry in best), key=lambda match: match[0])
+
+
+geo_index = GridIndex()
+
+
+def init_app(app):
+    """Size the grid from the app config"""
+    geo_index.configure(app.config.get("GEO_GRID_CELL_DEG", 0.005), app.config.get("GEO_INDEX_MAX_AGE", 300))
+
+
+@area_changed.connect
+def _index_area_change(area_id, structural=False, statuses=(), **extra):
+    geo_index.apply_change(area_id, structural=structural, statuses=statuses)
@@ -0,0 +1,12 @@
+# gunicorn.conf.py
+"""Gunicorn server hooks (gunicorn reads this file from the working directory)"""
+import os
+
+
+def on_starting(server):
+    """Have /metrics count this run from zero: drop numbers a previous run
+    saved in METRICS_DIR before any worker starts"""
+    directory = os.environ.get("METRICS_DIR")
+    if directory and os.path.isdir(directory):
+        import metrics
+        metrics.reset_dir(directory)
@@ -0,0 +1,282 @@
+# history.py
+"""Occupancy history: raw samples, rollups and retention.
+
+Every commit that changes a status row appends one OccupancySample per
+changed row (its final value in that transaction). rollup() downsamples
+raw samples into 1-minute buckets, 1-minute buckets into 15-minute ones
+and 15-minute buckets into hourly ones; it is meant to run every minute
+or so from cron (``flask rollup-history``) and leaves each bucket until
+``ROLLUP_DELAY`` seconds after it ends. Averages are sample-weighted.
+"""
+import calendar
+import time
+from datetime import datetime
+from sqlalchemy import event, func, insert, select, delete, literal
+from sqlalchemy.orm import Session
+from models import db, OccupancySample, OccupancyRollup
+from changes import pending_changes
+
+MINUTE, QUARTER_HOUR, HOUR, DAY = 60, 900, 3600, 86400
+
+# Stored resolutions, finest first; each rolls up from the previous one
+ROLLUP_RESOLUTIONS = (MINUTE, QUARTER_HOUR, HOUR)
+
+RESOLUTION_NAMES = {"raw": 0, "1m": MINUTE, "15m": QUARTER_HOUR, "1h": HOUR, "1d": DAY}
+
+# Default retention in days per stored resolution (0 = raw samples); None keeps forever
+DEFAULT_RETENTION_DAYS = {0: 7, MINUTE: 30, QUARTER_HOUR: 400, HOUR: None}
+
+# Aim for at most this many points per series when resolution=auto
+AUTO_MAX_POINTS = 500
+
+# Seconds a bucket must have been over before it is rolled up. Samples are
+# stamped in before_commit, so a transaction still committing can add one
+# to a bucket that has already ended; rolling that bucket up first would
+# leave the sample behind the watermark, where retention deletes it unseen
+ROLLUP_DELAY = 60
+
+
+@event.listens_for(Session, "before_commit")
+def _record_samples(session):
+    """Append a sample for every status row this transaction changed"""
+    session.flush()  # make sure the final ORM changes have been collected
+    now = int(time.time())
+    rows = [
+        {
+            "area_id": area_id,
+            "status_id": values["id"],
+            "vehicle_type": values["vehicle_type"],
+            "occupied": values["occupied"],
+            "capacity": values["capacity"],
+            "ts": now,
+        }
+        for area_id, change in pending_changes(session).items()
+        for values in change.statuses.values()
+        if not values.get("removed")
+    ]
+    if rows:
+        session.execute(insert(OccupancySample.__table__), rows)
+
+
+def _watermark(resolution, area_id=None):
+    """End of the last bucket already rolled up at ``resolution``, or None.
+
+    With ``area_id`` this is the end of that area's last bucket, which is
+    a cheap primary-key lookup; anything after it has not been rolled up
+    for the area and can be read from raw samples.
+    """
+    rollups = OccupancyRollup.__table__
+    query = select(func.max(rollups.c.bucket)).where(rollups.c.resolution == resolution)
+    if area_id is not None:
+        query = query.where(rollups.c.area_id == area_id)
+    last = db.session.execute(query).scalar()
+    return None if last is None else last + resolution
+
+
+def _source_start(finer):
+    """Earliest timestamp available in the source for a rollup"""
+    if finer == 0:
+        samples = OccupancySample.__table__
+        return db.session.execute(select(func.min(samples.c.ts))).scalar()
+    rollups = OccupancyRollup.__table__
+    return db.session.execute(
+        select(func.min(rollups.c.bucket)).where(rollups.c.resolution == finer)
+    ).scalar()
+
+
+def _bucketed(resolution, finer, start, end, area_id=None):
+    """SELECT aggregating the ``finer`` source into ``resolution`` buckets over [start, end)"""
+    if finer == 0:
+        src = OccupancySample.__table__
+        bucket = (src.c.ts - src.c.ts % resolution).label("bucket")
+        columns = [
+            func.count().label("samples"),
+            func.sum(src.c.occupied).label("occupied_sum"),
+            func.min(src.c.occupied).label("occupied_min"),
+            func.max(src.c.occupied).label("occupied_max"),
+        ]
+        where = [src.c.ts >= start, src.c.ts < end]
+    else:
+        src = OccupancyRollup.__table__
+        bucket = (src.c.bucket - src.c.bucket % resolution).label("bucket")
+        columns = [
+            func.sum(src.c.samples).label("samples"),
+            func.sum(src.c.occupied_sum).label("occupied_sum"),
+            func.min(src.c.occupied_min).label("occupied_min"),
+            func.max(src.c.occupied_max).label("occupied_max"),
+        ]
+        where = [src.c.resolution == finer, src.c.bucket >= start, src.c.bucket < end]
+
+    if area_id is not None:
+        where.append(src.c.area_id == area_id)
+
+    return (
+        select(src.c.area_id, src.c.vehicle_type, bucket, *columns,
+               func.max(src.c.capacity).label("capacity"))
+        .where(*where)
+        .group_by(src.c.area_id, src.c.vehicle_type, bucket)
+    )
+
+
+def rollup(now=None, delay=ROLLUP_DELAY):
+    """Roll buckets that ended ``delay`` seconds before ``now`` into every stored resolution.
+
+    Returns ``{resolution: rows written}``.
+    """
+    now = int(now if now is not None else time.time())
+    settled = now - delay
+    rollups = OccupancyRollup.__table__
+    written = {}
+    finer = 0
+    for resolution in ROLLUP_RESOLUTIONS:
+        end = settled - settled % resolution
+        start = _watermark(resolution)
+        if start is None:
+            first = _source_start(finer)
+            start = None if first is None else first - first % resolution
+        if start is not None and start < end:
+            query = _bucketed(resolution, finer, start, end)
+            stmt = insert(rollups).from_select(
+                ["area_id", "vehicle_type", "bucket", "samples", "occupied_sum",
+                 "occupied_min", "occupied_max", "capacity", "resolution"],
+                query.add_columns(literal(resolution)),
+            )
+            written[resolution] = db.session.execute(stmt).rowcount
+        else:
+            written[resolution] = 0
+        finer = resolution
+    db.session.commit()
+    return written
+
+
+def apply_retention(retention_days=None, now=None):
+    """Delete samples and rollups older than their retention period.
+
+    Raw samples are only deleted once they have been rolled up.
+    Returns ``{resolution: rows deleted}`` (0 = raw samples).
+    """
+    retention_days = retention_days or DEFAULT_RETENTION_DAYS
+    now = int(now if now is not None else time.time())
+    samples = OccupancySample.__table__
+    rollups = OccupancyRollup.__table__
+    deleted = {}
+
+    for resolution, days in retention_days.items():
+        if days is None:
+            continue
+        cutoff = now - days * DAY
+        if resolution == 0:
+            rolled_to = _watermark(MINUTE)
+            if rolled_to is None:
+                continue
+            stmt = delete(samples).where(samples.c.ts < min(cutoff, rolled_to))
+        else:
+            stmt = delete(rollups).where(rollups.c.resolution == resolution, rollups.c.bucket < cutoff)
+        deleted[resolution] = db.session.execute(stmt).rowcount
+    db.session.commit()
+    return deleted
+
+
+def parse_timestamp(value, default):
+    """Parse Unix seconds or an ISO 8601 datetime (naive means UTC)"""
+    if value is None or value == "":
+        return default
+    if value.lstrip("-").isdigit():
+        return int(value)
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return calendar.timegm(dt.utctimetuple())
+
+
+def pick_resolution(start, end, requested="auto"):
+    """Resolve a requested resolution name/seconds to a bucket width in seconds"""
+    if requested in RESOLUTION_NAMES:
+        return RESOLUTION_NAMES[requested]
+    if requested == "auto":
+        target = (end - start) / AUTO_MAX_POINTS
+        for resolution in (MINUTE, QUARTER_HOUR, HOUR, DAY):
+            if resolution >= target:
+                return resolution
+        return DAY
+    resolution = int(requested)
+    if resolution < 0:
+        raise ValueError("resolution must be positive")
+    return resolution
+
+
+def _source_for(resolution):
+    """Coarsest stored resolution whose buckets fit evenly into ``resolution``"""
+    source = 0
+    for stored in ROLLUP_RESOLUTIONS:
+        if stored <= resolution and resolution % stored == 0:
+            source = stored
+    return source
+
+
+class TooManyPoints(ValueError):
+    """A raw history query matched more samples than allowed"""
+
+
+def query_history(area_id, start, end, resolution, max_raw_points=None):
+    """Occupancy series for one area over [start, end) at ``resolution`` seconds.
+
+    Reads from the coarsest rollup that can produce the requested buckets
+    and fills the not-yet-rolled-up tail from raw samples. A resolution of
+    0 returns raw samples, raising TooManyPoints if there are more than
+    ``max_raw_points``. Returns ``{vehicle_type: [point, ...]}``.
+    """
+    series = {}
+
+    if resolution == 0:
+        samples = OccupancySample.__table__
+        query = (
+            select(samples.c.vehicle_type, samples.c.ts, samples.c.occupied, samples.c.capacity)
+            .where(samples.c.area_id == area_id, samples.c.ts >= start, samples.c.ts < end)
+            .order_by(samples.c.ts)
+        )
+        if max_raw_points is not None:
+            query = query.limit(max_raw_points + 1)
+        rows = db.session.execute(query).all()
+        if max_raw_points is not None and len(rows) > max_raw_points:
+            raise TooManyPoints(f"more than {max_raw_points} raw samples; use a shorter range or a resolution")
+        for row in rows:
+            series.setdefault(row.vehicle_type, []).append(
+                {"t": row.ts, "occupied": row.occupied, "capacity": row.capacity}
+            )
+        return series
+
+    source = _source_for(resolution)
+    ranges = []
+    if source:
+        rolled_to = _watermark(source, area_id) or start
+        rolled_to = max(start, min(end, rolled_to))
+        if rolled_to > start:
+            ranges.append((source, start, rolled_to))
+        if rolled_to < end:
+            ranges.append((0, rolled_to, end))
+    else:
+        ranges.append((0, start, end))
+
+    merged = {}
+    for finer, range_start, range_end in ranges:
+        rows = db.session.execute(_bucketed(resolution, finer, range_start, range_end, area_id))
+        for row in rows:
+            key = (row.vehicle_type, row.bucket)
+            point = merged.get(key)
+            if point is None:
+                merged[key] = [row.samples, row.occupied_sum, row.occupied_min, row.occupied_max, row.capacity]
+            else:  # a bucket straddling the rolled-up boundary
+                point[0] += row.samples
+                point[1] += row.occupied_sum
+                point[2] = min(point[2], row.occupied_min)
+                point[3] = max(point[3], row.occupied_max)
+                point[4] = max(point[4], row.capacity)
+
+    for (vehicle_type, bucket), (count, total, low, high, capacity) in sorted(merged.items()):
+        series.setdefault(vehicle_type, []).append({
+            "t": bucket,
+            "avg": round(total / count, 2),
+            "min": low,
+            "max": high,
+            "capacity": capacity,
+        })
+    return series
@@ -0,0 +1,80 @@
+# identity.py
+"""Cached identities for Flask-Login's user loader.
+
+Flask-Login reloads the logged-in user on every request. Instead of an
+ORM ``User`` query each time, ``load_user`` returns a small
+``CachedUser`` (id, email, is_admin) from a per-worker cache. A user
+that no longer exists is cached as ``None``, so a stale session cookie
+costs one query per TTL as well.
+
+ORM updates and deletes of a user drop its entry once the transaction
+commits, so demoting or deleting someone takes effect immediately in
+the worker that made the change. Other workers, and changes made with
+plain SQL, are picked up when the entry expires after
+``USER_CACHE_TTL`` seconds.
+"""
+from flask_login import UserMixin
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from cache import SnapshotCache, replica_lag
+from models import db, User
+
+_PENDING_KEY = "changed_users"
+
+
+class CachedUser(UserMixin):
+    """The parts of a User that requests need, detached from any session"""
+
+    def __init__(self, id, email, is_admin):
+        self.id = id
+        self.email = email
+        self.is_admin = bool(is_admin)
+
+    def __repr__(self):
+        return f"<CachedUser {self.email}>"
+
+
+user_cache = SnapshotCache(max_entries=10000, ttl=10.0)
+
+
+def _load(user_id):
+    row = db.session.execute(
+        select(User.id, User.email, User.is_admin).where(User.id == user_id)
+    ).first()
+    return CachedUser(*row) if row is not None else None
+
+
+def load_user(user_id: str):
+    """Flask-Login user_loader: the user for a session id, or None"""
+    try:
+        user_id = int(user_id)
+    except (ValueError, TypeError):
+        return None
+    return user_cache.get_or_load(("user", user_id), lambda: _load(user_id))
+
+
+def init_app(app):
+    """Size the identity cache from the app config"""
+    user_cache.max_entries = app.config.get("USER_CACHE_MAX_ENTRIES", user_cache.max_entries)
+    user_cache.ttl = app.config.get("USER_CACHE_TTL", user_cache.ttl)
+    user_cache.settle = replica_lag(app)
+    user_cache.clear()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = [obj.id for obj in session.dirty if isinstance(obj, User) and session.is_modified(obj)]
+    changed += [obj.id for obj in session.deleted if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate(("user", user_id))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,91 @@
+# ingest_routes.py
+import hmac
+from functools import wraps
+from flask import Blueprint, current_app, request, jsonify
+from occupancy import apply_occupancy_batch
+
+ingest_bp = Blueprint("ingest", __name__)
+
+_EVENT_DELTAS = {"enter": 1, "exit": -1}
+
+
+def token_required(func):
+    """Decorator to require a configured ingestion API token"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        tokens = current_app.config.get("INGEST_API_TOKENS") or []
+        auth = request.headers.get("Authorization", "")
+        scheme, _, token = auth.partition(" ")
+        if scheme.lower() != "bearer" or not any(
+            hmac.compare_digest(token.encode(), allowed.encode()) for allowed in tokens
+        ):
+            return jsonify({"error": "Invalid or missing API token"}), 401
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def _parse_item(raw):
+    """Normalize one incoming event to {"status_id", "occupied"|"delta"}"""
+    if not isinstance(raw, dict):
+        raise ValueError("Event must be an object")
+
+    status_id = raw.get("status_id")
+    if not isinstance(status_id, int) or isinstance(status_id, bool):
+        raise ValueError("status_id must be an integer")
+
+    if "occupied" in raw:
+        occupied = raw["occupied"]
+        if not isinstance(occupied, int) or isinstance(occupied, bool):
+            raise ValueError("occupied must be an integer")
+        return {"status_id": status_id, "occupied": occupied}
+
+    event = raw.get("event")
+    if event not in _EVENT_DELTAS:
+        raise ValueError("event must be 'enter' or 'exit' (or send 'occupied')")
+    count = raw.get("count", 1)
+    if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+        raise ValueError("count must be a positive integer")
+    return {"status_id": status_id, "delta": _EVENT_DELTAS[event] * count}
+
+
+@ingest_bp.route("/events", methods=["POST"])
+@token_required
+def ingest_events():
+    """Apply a batch of sensor occupancy events in one transaction.
+
+    Body: ``{"events": [...]}`` where each event is either
+    ``{"status_id": 1, "event": "enter"|"exit", "count": 1}`` or an absolute
+    ``{"status_id": 1, "occupied": 12}``. Responds with one result per event.
+    """
+    payload = request.get_json(silent=True)
+    events = payload.get("events") if isinstance(payload, dict) else None
+    if not isinstance(events, list) or not events:
+        return jsonify({"error": "Body must be a JSON object with a non-empty 'events' list"}), 400
+
+    max_batch = current_app.config["INGEST_MAX_BATCH"]
+    if len(events) > max_batch:
+        return jsonify({"error": f"Batch exceeds {max_batch} events"}), 413
+
+    results = [None] * len(events)
+    items, positions = [], []
+    for index, raw in enumerate(events):
+        try:
+            items.append(_parse_item(raw))
+            positions.append(index)
+        except ValueError as e:
+            results[index] = {"index": index, "ok": False, "error": str(e)}
+
+    try:
+        if items:
+            for position, result in zip(positions, apply_occupancy_batch(items)):
+                result["index"] = position
+                results[position] = result
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    accepted = sum(1 for r in results if r["ok"])
+    return jsonify({
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "results": results,
+    })
@@ -0,0 +1,363 @@
+# metrics.py
+"""Per-endpoint request metrics in Prometheus text format at /metrics.
+
+For every Flask request this records the latency, the number of SQL
+statements it sent, the time spent in those statements and the time
+spent rendering templates (which includes any queries made while
+rendering), labelled by endpoint, e.g. ``public.get_status``. A request
+that sends more than ``METRICS_QUERY_BUDGET`` statements is counted and
+logged with its most repeated statement, which is usually an N+1 loop.
+
+Nothing is hooked up unless ``METRICS_ENABLED`` is set, so disabled
+metrics cost nothing. Each worker keeps its own numbers; with
+``METRICS_DIR`` set, workers also save them there (one file per process
+lifetime) and /metrics serves the sum over all workers. A scrape folds
+the files of workers that have exited into one retired total, so the
+sums never go down and the directory does not fill up with dead
+workers; the gunicorn master empties the directory when it starts (see
+gunicorn.conf.py), so each run counts from zero.
+"""
+import atexit
+import bisect
+import glob
+import hmac
+import json
+import os
+import threading
+import time
+from collections import Counter
+try:
+    import fcntl
+except ImportError:  # Windows: no multi-worker servers, so nothing to retire
+    fcntl = None
+from flask import Response, before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from cache import area_cache
+from identity import user_cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SAVE_INTERVAL = 5.0  # seconds between snapshots written to METRICS_DIR
+RETIRED_FILE = "retired.json"  # summed numbers of workers that have exited
+
+_HELP = {
+    "parking_http_requests_total": ("counter", "Requests handled, by endpoint, method and status"),
+    "parking_http_request_duration_seconds": ("histogram", "Request latency"),
+    "parking_http_request_sql_statements": ("histogram", "SQL statements sent per request"),
+    "parking_http_request_db_seconds_total": ("counter", "Time spent in SQL statements"),
+    "parking_http_request_render_seconds_total": ("counter", "Time spent rendering templates"),
+    "parking_http_query_budget_exceeded_total": ("counter", "Requests over METRICS_QUERY_BUDGET statements"),
+    "parking_cache_hits_total": ("counter", "Snapshot cache hits"),
+    "parking_cache_misses_total": ("counter", "Snapshot cache misses"),
+    "parking_user_cache_hits_total": ("counter", "Logged-in user lookups served from the identity cache"),
+    "parking_user_cache_misses_total": ("counter", "Logged-in user lookups that queried the database"),
+}
+
+
+class Registry:
+    """Thread-safe counters and histograms keyed by (name, labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}  # key -> [bucket counts..., +Inf count, sum]
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        with self._lock:
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            entry[bisect.bisect_left(buckets, value)] += 1
+            entry[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """A JSON-serializable copy of the current values"""
+        with self._lock:
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, list(labels), list(entry)] for (name, labels), entry in self.histograms.items()],
+            }
+
+
+registry = Registry()
+
+
+def _merge(snapshots):
+    counters, histograms = {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, entry in snap["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], entry)]
+            else:
+                histograms[key] = list(entry)
+    return counters, histograms
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _bucket_bounds(name):
+    return STATEMENT_BUCKETS if name == "parking_http_request_sql_statements" else LATENCY_BUCKETS
+
+
+def render(counters, histograms):
+    """Prometheus text exposition of merged counters and histograms"""
+    lines = []
+    names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+    for name in names:
+        kind, text = _HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            bounds = _bucket_bounds(name)
+            for (metric, labels), entry in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(bounds + (float("inf"),), entry[:-1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f"{name}_bucket{_labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {entry[-1]}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        else:
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _snapshot_of(counters, histograms):
+    """The snapshot shape of merged counters and histograms"""
+    return {
+        "counters": [[name, [list(pair) for pair in labels], value] for (name, labels), value in counters.items()],
+        "histograms": [[name, [list(pair) for pair in labels], entry] for (name, labels), entry in histograms.items()],
+    }
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # gone, being replaced or truncated; next scrape gets it
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by someone else
+    return True
+
+
+def reset_dir(directory):
+    """Delete the saved numbers in ``directory`` (call before workers start)"""
+    for path in glob.glob(os.path.join(directory, "worker-*.json")) + [os.path.join(directory, RETIRED_FILE)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class _Saver:
+    """Writes this worker's snapshot to METRICS_DIR now and then"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._saved_at = 0.0
+        self._pid = None
+        self._path = None
+
+    @property
+    def path(self):
+        # Named per process lifetime, so a later process reusing the pid
+        # (after a fork or a worker restart) writes a file of its own
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f"worker-{self._pid}-{time.time_ns():x}.json")
+            self._saved_at = 0.0
+        return self._path
+
+    def save(self, force=False):
+        path = self.path
+        now = time.monotonic()
+        if not force and now - self._saved_at < SAVE_INTERVAL:
+            return
+        self._saved_at = now
+        self._write(path, _worker_snapshot())
+
+    @staticmethod
+    def _write(path, snapshot):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp, path)
+
+    def _worker_files(self):
+        return glob.glob(os.path.join(self.directory, "worker-*.json"))
+
+    def retire_exited(self):
+        """Fold the files of workers that are no longer running into the
+        retired total and delete them"""
+        if fcntl is None:
+            return
+        exited = [path for path in self._worker_files()
+                  if not _running(int(os.path.basename(path).split("-")[1]))]
+        if not exited:
+            return
+        retired = os.path.join(self.directory, RETIRED_FILE)
+        with open(os.path.join(self.directory, ".retire.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # one scrape at a time, or a file could be counted twice
+            try:
+                snapshots = [snap for snap in [_read(retired)] if snap is not None]
+                done = []
+                for path in exited:
+                    snapshot = _read(path)  # None if another scrape retired it first
+                    if snapshot is not None:
+                        snapshots.append(snapshot)
+                        done.append(path)
+                if done:
+                    self._write(retired, _snapshot_of(*_merge(snapshots)))
+                    for path in done:
+                        os.remove(path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load_all(self):
+        self.retire_exited()
+        paths = self._worker_files() + [os.path.join(self.directory, RETIRED_FILE)]
+        return [snap for snap in map(_read, paths) if snap is not None]
+
+
+def _worker_snapshot():
+    snap = registry.snapshot()
+    snap["counters"] += [
+        ["parking_cache_hits_total", [], area_cache.hits],
+        ["parking_cache_misses_total", [], area_cache.misses],
+        ["parking_user_cache_hits_total", [], user_cache.hits],
+        ["parking_user_cache_misses_total", [], user_cache.misses],
+    ]
+    return snap
+
+
+# -- request hooks (only installed when enabled) ----------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "metrics_started" in g:
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+        g.metrics_statements[statement] += 1
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if starts and has_request_context() and "metrics_started" in g:
+        g.metrics_db_time += time.perf_counter() - starts.pop()
+
+
+def _before_render(sender, template, context, **extra):
+    if "metrics_started" in g:
+        g.metrics_render_started = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    started = g.pop("metrics_render_started", None)
+    if started is not None:
+        g.metrics_render_time += time.perf_counter() - started
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_statements = Counter()
+    g.metrics_db_time = 0.0
+    g.metrics_render_time = 0.0
+
+
+def _finish_request(response):
+    started = g.pop("metrics_started", None)
+    if started is None or request.endpoint == "metrics":
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = (("endpoint", request.endpoint or "unmatched"),)
+    statements = sum(g.metrics_statements.values())
+
+    registry.inc("parking_http_requests_total",
+                 endpoint + (("method", request.method), ("status", str(response.status_code))))
+    registry.observe("parking_http_request_duration_seconds", endpoint, elapsed, LATENCY_BUCKETS)
+    registry.observe("parking_http_request_sql_statements", endpoint, statements, STATEMENT_BUCKETS)
+    registry.inc("parking_http_request_db_seconds_total", endpoint, g.metrics_db_time)
+    registry.inc("parking_http_request_render_seconds_total", endpoint, g.metrics_render_time)
+
+    budget = current_app.config["METRICS_QUERY_BUDGET"]
+    if budget and statements > budget:
+        registry.inc("parking_http_query_budget_exceeded_total", endpoint)
+        statement, repeats = g.metrics_statements.most_common(1)[0]
+        current_app.logger.warning(
+            "%s %s sent %d SQL statements (budget %d); most repeated (%dx): %s",
+            request.method, request.endpoint, statements, budget, repeats, " ".join(statement.split())[:200]
+        )
+
+    saver = current_app.extensions.get("metrics_saver")
+    if saver is not None:
+        saver.save()
+    return response
+
+
+def _metrics_view():
+    token = current_app.config.get("METRICS_TOKEN")
+    if token:
+        scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(given.encode(), token.encode()):
+            return Response("Invalid or missing metrics token\n", status=401, mimetype="text/plain")
+
+    saver = current_app.extensions.get("metrics_saver")
+    if saver is not None:
+        saver.save(force=True)
+        counters, histograms = _merge(saver.load_all())
+    else:
+        counters, histograms = _merge([_worker_snapshot()])
+    return Response(render(counters, histograms), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app):
+    """Install the request hooks and /metrics when METRICS_ENABLED is set"""
+    if not app.config.get("METRICS_ENABLED"):
+        return
+    if app.config.get("METRICS_DIR"):
+        os.makedirs(app.config["METRICS_DIR"], exist_ok=True)
+        saver = app.extensions["metrics_saver"] = _Saver(app.config["METRICS_DIR"])
+        atexit.register(saver.save, force=True)  # keep the last few seconds of an exiting worker
+
+    # Engine-class listeners also see the replica and ASGI engines; the
+    # request context check keeps work outside Flask requests uncounted
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule("/metrics", "metrics", _metrics_view)
@@ -4,9 +4,12 @@ from typing import TYPE_CHECKING
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event, select, update, func, case
+from sqlalchemy.orm import Session, object_session
+from passwords import hasher
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 if TYPE_CHECKING:
     from sqlalchemy.orm import Mapped
@@ -25,13 +28,17 @@ class User(UserMixin, db.Model):
 
     def set_password(self, password: str):
         """Hash and set user password"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password: str) -> bool:
         """Verify user password"""
         if not password:
             return False
-        return check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self, password: str = None) -> bool:
+        """True if the stored hash predates the current hashing settings"""
+        return hasher.needs_rehash(self.password_hash, password)
 
     def __repr__(self):
         return f"<User {self.email}>"
@@ -44,9 +51,21 @@ class ParkingArea(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True, index=True)
     location = db.Column(db.String(150), nullable=False)
+    latitude = db.Column(db.Float, nullable=True)   # WGS84 degrees, for /api/nearest
+    longitude = db.Column(db.Float, nullable=True)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Denormalized totals across all vehicle types, kept in sync with
+    # parking_status by refresh_area_totals() (see the flush hook below)
+    total_capacity = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    total_occupied = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    total_available = db.Column(db.Integer, nullable=False, default=0, server_default="0", index=True)
+
+    # Bumped in SQL whenever the area row or its totals change; public
+    # endpoints derive their ETags from it
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
     # Relationship with cascade delete
     statuses = db.relationship(
         "ParkingStatus",
@@ -62,29 +81,13 @@ class ParkingArea(db.Model):
 
     @property
     def available_spots(self) -> int:
-        """Calculate total available spots across all vehicle types"""
-        if not self.statuses:
-            return 0
-        return sum(s.available_spots() for s in self.statuses)
-
-    @property
-    def total_capacity(self) -> int:
-        """Calculate total capacity across all vehicle types"""
-        if not self.statuses:
-            return 0
-        return sum(s.capacity for s in self.statuses)
-
-    @property
-    def total_occupied(self) -> int:
-        """Calculate total occupied spots across all vehicle types"""
-        if not self.statuses:
-            return 0
-        return sum(s.occupied for s in self.statuses)
+        """Total available spots across all vehicle types"""
+        return self.total_available or 0
 
     @property
     def occupancy_rate(self) -> float:
         """Calculate occupancy rate as percentage"""
-        if self.total_capacity == 0:
+        if not self.total_capacity:
             return 0.0
         return (self.total_occupied / self.total_capacity) * 100
 
@@ -100,7 +103,7 @@ class ParkingStatus(db.Model):
     vehicle_type = db.Column(db.String(50), nullable=False)
     capacity = db.Column(db.Integer, nullable=False)
     occupied = db.Column(db.Integer, default=0)
-    area_id = db.Column(db.Integer, db.ForeignKey("parking_areas.id"), nullable=False)
+    area_id = db.Column(db.Integer, db.ForeignKey("parking_areas.id"), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def available_spots(self) -> int:
@@ -119,4 +122,128 @@ class ParkingStatus(db.Model):
         return (self.occupied / self.capacity) * 100
 
     def __repr__(self):
-        return f"<ParkingStatus {self.vehicle_type} {self.occupied}/{self.capacity}>"
\ No newline at end of file
+        return f"<ParkingStatus {self.vehicle_type} {self.occupied}/{self.capacity}>"
+
+
+class OccupancySample(db.Model):
+    """Append-only record of a status row's counts after each committed change"""
+    __tablename__ = "occupancy_samples"
+    __table_args__ = (db.Index("ix_occupancy_samples_area_ts", "area_id", "ts"),)
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, "sqlite"), primary_key=True)
+    area_id = db.Column(db.Integer, nullable=False)
+    status_id = db.Column(db.Integer, nullable=False)
+    vehicle_type = db.Column(db.String(50), nullable=False)
+    occupied = db.Column(db.Integer, nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    ts = db.Column(db.Integer, nullable=False, index=True)  # Unix seconds, UTC
+
+    def __repr__(self):
+        return f"<OccupancySample {self.area_id}/{self.vehicle_type} {self.occupied}@{self.ts}>"
+
+
+class OccupancyRollup(db.Model):
+    """Downsampled occupancy per area, vehicle type and time bucket"""
+    __tablename__ = "occupancy_rollups"
+    __table_args__ = (db.Index("ix_occupancy_rollups_resolution_bucket", "resolution", "bucket"),)
+
+    resolution = db.Column(db.Integer, primary_key=True)  # bucket width in seconds
+    area_id = db.Column(db.Integer, primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)      # bucket start, Unix seconds
+    vehicle_type = db.Column(db.String(50), primary_key=True)
+    samples = db.Column(db.Integer, nullable=False)
+    occupied_sum = db.Column(db.BigInteger, nullable=False)
+    occupied_min = db.Column(db.Integer, nullable=False)
+    occupied_max = db.Column(db.Integer, nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<OccupancyRollup {self.resolution}s {self.area_id}/{self.vehicle_type}@{self.bucket}>"
+
+
+class ForecastProfile(db.Model):
+    """Fitted occupancy model of one area and vehicle type (see forecast.py)"""
+    __tablename__ = "forecast_profiles"
+
+    area_id = db.Column(db.Integer, primary_key=True)
+    vehicle_type = db.Column(db.String(50), primary_key=True)
+    epoch = db.Column(db.Integer, nullable=False)             # time the weights below are relative to
+    slot_sums = db.Column(db.LargeBinary, nullable=False)     # float64[192]: weighted occupancy ratios
+    slot_weights = db.Column(db.LargeBinary, nullable=False)  # float64[192]
+    resid_sq = db.Column(db.Float, nullable=False)            # weighted sum of squared residuals
+    resid_weight = db.Column(db.Float, nullable=False)
+    ar_num = db.Column(db.Float, nullable=False)              # weighted sum of r[t] * r[t-1]
+    ar_den = db.Column(db.Float, nullable=False)              # weighted sum of r[t-1] ** 2
+    ar_pairs = db.Column(db.Integer, nullable=False)
+    last_bucket = db.Column(db.Integer)                       # newest bucket folded in, and its residual
+    last_resid = db.Column(db.Float)
+    fitted_to = db.Column(db.Integer, nullable=False, index=True)  # rollups before this are included
+
+    def __repr__(self):
+        return f"<ForecastProfile {self.area_id}/{self.vehicle_type}>"
+
+
+def refresh_area_totals(connection, area_ids=None):
+    """Recompute the denormalized totals on parking_areas from parking_status.
+
+    Runs as one UPDATE with correlated subqueries, for ``area_ids`` or for
+    every area when ``area_ids`` is None. Writers that change
+    parking_status with bulk statements must call this themselves; ORM
+    changes are handled by the flush hook below.
+    """
+    areas = ParkingArea.__table__
+    statuses = ParkingStatus.__table__
+
+    def total(expr):
+        return (
+            select(func.coalesce(func.sum(expr), 0))
+            .where(statuses.c.area_id == areas.c.id)
+            .scalar_subquery()
+        )
+
+    occupied = func.coalesce(statuses.c.occupied, 0)
+    stmt = update(areas).values(
+        total_capacity=total(statuses.c.capacity),
+        total_occupied=total(occupied),
+        total_available=total(case((statuses.c.capacity > occupied, statuses.c.capacity - occupied), else_=0)),
+        last_updated=areas.c.last_updated,  # don't trip the onupdate default
+        version=areas.c.version + 1,
+    )
+    if area_ids is not None:
+        if not area_ids:
+            return
+        stmt = stmt.where(areas.c.id.in_(list(area_ids)))
+    connection.execute(stmt)
+
+
+_TOTALS_PENDING_KEY = "areas_needing_totals"
+_TOTAL_FIELDS = ["total_capacity", "total_occupied", "total_available", "version"]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_status_areas(session, flush_context):
+    """Remember which areas had status rows written in this flush"""
+    pending = session.info.setdefault(_TOTALS_PENDING_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, ParkingStatus) and obj.area_id is not None:
+            pending.add(obj.area_id)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _refresh_status_areas(session, flush_context):
+    """Bring the totals of those areas up to date inside the same transaction"""
+    area_ids = session.info.pop(_TOTALS_PENDING_KEY, None)
+    if not area_ids:
+        return
+    refresh_area_totals(session.connection(), area_ids)
+    for area_id in area_ids:
+        area = session.identity_map.get(session.identity_key(ParkingArea, area_id))
+        if area is not None:
+            session.expire(area, _TOTAL_FIELDS)
+
+
+@event.listens_for(ParkingArea, "before_update")
+def _bump_area_version(mapper, connection, target):
+    """Count edits to the area row itself (name, location, ...)"""
+    if object_session(target).is_modified(target, include_collections=False):
+        target.version = ParkingArea.version + 1
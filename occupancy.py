@@ -0,0 +1,196 @@
+# occupancy.py
+"""Set-based occupancy writes for high-volume producers (sensors, gates, ANPR)"""
+from datetime import datetime
+from sqlalchemy import select, update, case, func, literal
+from models import db, ParkingArea, ParkingStatus, refresh_area_totals
+from changes import track_area, status_values
+
+
+def apply_occupancy_batch(items):
+    """Apply a batch of occupancy changes in one transaction.
+
+    ``items`` is a list of dicts, each with a ``status_id`` and either an
+    absolute ``occupied`` count or a signed ``delta``. Items are applied in
+    order; one that would take a row below zero or above capacity is
+    rejected without affecting the others. All accepted changes are written
+    with a single UPDATE and committed together.
+
+    Returns one result dict per item, in the same order.
+    """
+    statuses = ParkingStatus.__table__
+    ids = {item["status_id"] for item in items}
+    rows = db.session.execute(
+        select(statuses.c.id, statuses.c.area_id, statuses.c.vehicle_type,
+               statuses.c.capacity, statuses.c.occupied)
+        .where(statuses.c.id.in_(ids))
+        .with_for_update()
+    ).all()
+    current = {row.id: row for row in rows}
+    occupied = {row.id: row.occupied or 0 for row in rows}
+
+    results = []
+    for index, item in enumerate(items):
+        status_id = item["status_id"]
+        row = current.get(status_id)
+        if row is None:
+            results.append({"index": index, "status_id": status_id, "ok": False,
+                            "error": "Unknown status"})
+            continue
+
+        if "occupied" in item:
+            new_value = item["occupied"]
+        else:
+            new_value = occupied[status_id] + item["delta"]
+
+        if new_value < 0:
+            error = "Occupied cannot be negative"
+        elif new_value > row.capacity:
+            error = "Occupied exceeds capacity"
+        else:
+            error = None
+
+        if error:
+            results.append({"index": index, "status_id": status_id, "ok": False,
+                            "error": error, "occupied": occupied[status_id]})
+            continue
+
+        occupied[status_id] = new_value
+        results.append({"index": index, "status_id": status_id, "ok": True,
+                        "occupied": new_value, "available": row.capacity - new_value})
+
+    changed = {sid: value for sid, value in occupied.items() if value != (current[sid].occupied or 0)}
+    if not changed:
+        db.session.rollback()  # release the row locks
+        return results
+
+    try:
+        db.session.execute(
+            update(statuses)
+            .where(statuses.c.id.in_(changed))
+            .values(occupied=case(changed, value=statuses.c.id))
+        )
+        area_ids = {current[sid].area_id for sid in changed}
+        db.session.execute(
+            update(ParkingArea.__table__)
+            .where(ParkingArea.__table__.c.id.in_(area_ids))
+            .values(last_updated=datetime.utcnow())
+        )
+        refresh_area_totals(db.session.connection(), area_ids)
+
+        for sid, value in changed.items():
+            row = current[sid]
+            track_area(db.session, row.area_id,
+                       statuses=[status_values(sid, row.vehicle_type, row.capacity, value)])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return results
+
+
+class OccupancyRejected(Exception):
+    """A counter change was refused; ``reason`` is "unknown", "full" or "empty"."""
+
+    MESSAGES = {
+        "unknown": "Unknown status",
+        "full": "Occupied exceeds capacity",
+        "empty": "Occupied cannot be negative",
+    }
+
+    def __init__(self, reason, occupied=None, capacity=None):
+        super().__init__(self.MESSAGES[reason])
+        self.reason = reason
+        self.occupied = occupied
+        self.capacity = capacity
+
+
+def _guarded_update(status_id, new_value, requested):
+    """UPDATE one status to ``new_value`` (a SQL expression) if it stays
+    within 0..capacity; returns the new row, or raises OccupancyRejected.
+    ``requested(old_occupied)`` is the same value in Python, used only to
+    explain a rejection.
+
+    The bounds are checked by the UPDATE itself, so concurrent writers
+    can't interleave between a read and a write. Only a rejected change
+    reads the row, to say why.
+    """
+    statuses = ParkingStatus.__table__
+    stmt = (
+        update(statuses)
+        .where(statuses.c.id == status_id, new_value >= 0, new_value <= statuses.c.capacity)
+        .values(occupied=new_value)
+    )
+    columns = (statuses.c.id, statuses.c.area_id, statuses.c.vehicle_type, statuses.c.capacity, statuses.c.occupied)
+    if db.engine.dialect.update_returning:
+        row = db.session.execute(stmt.returning(*columns)).first()
+    else:
+        # No UPDATE ... RETURNING (MySQL): the row is locked by our UPDATE, so reading it back is safe
+        row = db.session.execute(select(*columns).where(statuses.c.id == status_id)).first() \
+            if db.session.execute(stmt).rowcount else None
+    if row is not None:
+        return row
+
+    current = db.session.execute(select(*columns).where(statuses.c.id == status_id)).first()
+    db.session.rollback()  # nothing was written
+    if current is None:
+        raise OccupancyRejected("unknown")
+    occupied = current.occupied or 0
+    raise OccupancyRejected("empty" if requested(occupied) < 0 else "full", occupied, current.capacity)
+
+
+def _commit_change(row, now):
+    track_area(db.session, row.area_id,
+               statuses=[status_values(row.id, row.vehicle_type, row.capacity, row.occupied)])
+    try:
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {"status_id": row.id, "ok": True, "occupied": row.occupied,
+            "available": max(0, row.capacity - row.occupied)}
+
+
+def adjust_occupancy(status_id, delta):
+    """Atomically add ``delta`` (e.g. +1 for an entry, -1 for an exit) to
+    a status's occupied count and commit.
+
+    Two statements and no prior read: a conditional UPDATE of the status
+    and an incremental UPDATE of the area totals, so parallel gates can
+    never lose or double-count a car. Raises OccupancyRejected when the
+    lot is full (or already empty).
+    """
+    statuses = ParkingStatus.__table__
+    now = datetime.utcnow()
+    row = _guarded_update(status_id, func.coalesce(statuses.c.occupied, 0) + literal(delta),
+                          lambda old: old + delta)
+
+    # Adjust the totals by the same amount instead of recomputing them, so
+    # concurrent changes to sibling statuses can't overwrite each other.
+    # Available spots were clamped at zero if the old count was over capacity.
+    old = row.occupied - delta
+    available_delta = (row.capacity - row.occupied) - max(0, row.capacity - old)
+    areas = ParkingArea.__table__
+    db.session.execute(
+        update(areas).where(areas.c.id == row.area_id).values(
+            total_occupied=areas.c.total_occupied + delta,
+            total_available=areas.c.total_available + available_delta,
+            version=areas.c.version + 1,
+            last_updated=now,
+        )
+    )
+    return _commit_change(row, now)
+
+
+def set_occupancy(status_id, occupied):
+    """Set a status's occupied count with one conditional UPDATE and commit.
+
+    Raises OccupancyRejected if ``occupied`` is outside 0..capacity or the
+    status doesn't exist.
+    """
+    now = datetime.utcnow()
+    row = _guarded_update(status_id, literal(occupied), lambda old: occupied)
+    areas = ParkingArea.__table__
+    db.session.execute(update(areas).where(areas.c.id == row.area_id).values(last_updated=now))
+    refresh_area_totals(db.session.connection(), [row.area_id])
+    return _commit_change(row, now)
@@ -0,0 +1,50 @@
+# pagination.py
+"""Opaque keyset cursors for paginated listings.
+
+A cursor carries the sort it was issued for and the sort-key values of
+the last row on its page; the next page starts strictly after that row,
+so pages stay stable while rows are added or removed elsewhere.
+"""
+import base64
+import json
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(sort, values):
+    """Cursor token for the row with sort-key ``values`` under ``sort``"""
+    raw = json.dumps([sort, *values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token, sort, size):
+    """Sort-key values from ``token``; ValueError if it isn't a ``sort`` cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, list) or len(payload) != size + 1 or payload[0] != sort:
+        raise ValueError("Invalid cursor")
+    return payload[1:]
+
+
+def _after(keys, values):
+    (column, descending), rest = keys[0], keys[1:]
+    value = values[0]
+    beyond = column < value if descending else column > value
+    if not rest:
+        return beyond
+    return or_(beyond, and_(column == value, _after(rest, values[1:])))
+
+
+def keyset_after(keys, values):
+    """WHERE clause selecting rows after ``values`` in the order ``keys``.
+
+    ``keys`` is a list of ``(column, descending)`` pairs, most significant
+    first, ending in a unique column.
+    """
+    column, descending = keys[0]
+    # The redundant bound on the leading column lets the database seek
+    # its index instead of scanning from the first row
+    seek = column <= values[0] if descending else column >= values[0]
+    return and_(seek, _after(keys, values))
@@ -0,0 +1,126 @@
+# passwords.py
+"""Password hashing with a configurable backend and a bounded worker pool.
+
+``PASSWORD_HASH_METHOD`` is ``"bcrypt"`` (cost ``PASSWORD_BCRYPT_ROUNDS``)
+or any Werkzeug method string such as ``"scrypt"`` or
+``"pbkdf2:sha256:600000"``. Hashes made with other methods or costs
+still verify, and ``needs_rehash()`` tells the login view to store a
+new hash once the password is known to be right. bcrypt only reads the
+first 72 bytes of a password, so a longer one (accepted by an older
+Werkzeug hash) keeps its old hash rather than being cut short.
+
+bcrypt and hashlib both release the GIL, so a burst of logins on a
+threaded worker would otherwise keep every core busy hashing and
+starve the read endpoints served by the same process. All hashing runs
+on ``PASSWORD_HASH_WORKERS`` threads; at most ``PASSWORD_HASH_QUEUE``
+more callers wait for one, and anyone beyond that gets ``HasherBusy``
+after ``PASSWORD_HASH_TIMEOUT`` seconds instead of piling up.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from werkzeug.security import generate_password_hash, check_password_hash
+
+_BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+BCRYPT_MAX_BYTES = 72
+
+
+class HasherBusy(Exception):
+    """Every hashing slot is taken; the caller should ask the client to retry"""
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a small per-process thread pool"""
+
+    def __init__(self):
+        self.method = "bcrypt"
+        self.bcrypt_rounds = 12
+        self.workers = 1
+        self.timeout = 5.0
+        self._slots = threading.BoundedSemaphore(1)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._method_params = None
+
+    def init_app(self, app):
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.bcrypt_rounds = app.config.get("PASSWORD_BCRYPT_ROUNDS", self.bcrypt_rounds)
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", self.timeout)
+        self._slots = threading.BoundedSemaphore(max(1, self.workers + app.config.get("PASSWORD_HASH_QUEUE", 0)))
+        self._method_params = None
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                # Created lazily so each forked worker gets its own threads
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+                self._pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HasherBusy("Too many password checks in progress")
+        try:
+            return self._executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _hash(self, password):
+        if self.method == "bcrypt":
+            if len(password.encode()) > BCRYPT_MAX_BYTES:
+                raise ValueError(f"bcrypt only uses the first {BCRYPT_MAX_BYTES} bytes of a password")
+            return bcrypt.hashpw(password.encode(), bcrypt.gensalt(self.bcrypt_rounds)).decode()
+        return generate_password_hash(password, method=self.method)
+
+    @staticmethod
+    def _verify(password_hash, password):
+        if password_hash.startswith(_BCRYPT_PREFIXES):
+            return bcrypt.checkpw(password.encode(), password_hash.encode())
+        return check_password_hash(password_hash, password)
+
+    def hash(self, password: str) -> str:
+        """Hash ``password`` with the configured method"""
+        return self._run(self._hash, password)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """Check ``password`` against a hash made with any supported method"""
+        if not password_hash or not password:
+            return False
+        return self._run(self._verify, password_hash, password)
+
+    def _werkzeug_params(self):
+        """The full method string Werkzeug stores for ``self.method``, defaults filled in"""
+        if self._method_params is None:
+            # e.g. "pbkdf2:sha256" is stored as "pbkdf2:sha256:600000"
+            self._method_params = self._run(self._hash, "").split("$", 1)[0]
+        return self._method_params
+
+    def needs_rehash(self, password_hash: str, password: str = None) -> bool:
+        """True if ``password_hash`` was made with another method or cost.
+
+        Given the ``password`` itself, it is False when the configured
+        method could not hash it in full (bcrypt past 72 bytes).
+        """
+        if self.method == "bcrypt":
+            if password is not None and len(password.encode()) > BCRYPT_MAX_BYTES:
+                return False
+            return not password_hash.startswith(_BCRYPT_PREFIXES) or \
+                int(password_hash[4:6]) != self.bcrypt_rounds
+        return password_hash.split("$", 1)[0] != self._werkzeug_params()
+
+
+hasher = PasswordHasher()
+
+
+def init_app(app):
+    """Configure the shared hasher from the app config"""
+    hasher.init_app(app)
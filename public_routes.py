@@ -1,16 +1,120 @@
 # public_routes.py
-from flask import Blueprint, render_template, request, jsonify
-from models import ParkingArea
+from flask import Blueprint, Response, current_app, render_template, request, jsonify, url_for
+from markupsafe import Markup
+from werkzeug.http import is_resource_modified
+from models import db
+from cache import area_cache
+from events import hub
+from fragments import fragment_cache, card_macro
+from geo import geo_index
+import history
+import replicas
+import search
+import serializers
+import snapshots
+import time
 
 public_bp = Blueprint("public", __name__, template_folder="templates")
 
 
+@public_bp.before_request
+def _read_from_replica():
+    """Public pages and APIs only read, so they can use a replica"""
+    if request.method in ("GET", "HEAD"):
+        replicas.route_reads(db.session)
+
+
+def _load_snapshots(keys):
+    """Cache loader: build snapshots for ("area", id) keys in one query"""
+    ids = [area_id for _, area_id in keys]
+    return snapshots.from_rows(db.session.execute(snapshots.rows_query(ids)))
+
+
+def _area_snapshots(ids):
+    """Cached status snapshots for ``ids``, in order, skipping unknown areas"""
+    keys = [("area", area_id) for area_id in ids]
+    found = area_cache.get_many(keys, _load_snapshots)
+    return [found[key] for key in keys if key in found]
+
+
+def _index_cards(areas):
+    """Home page cards for ``areas`` (snapshots), reusing cached HTML"""
+    by_id = {area["areaId"]: area for area in areas}
+
+    def render(missing):
+        macro = card_macro("index_card")
+        return {area_id: (by_id[area_id]["version"], str(macro(by_id[area_id]))) for area_id in missing}
+
+    return fragment_cache.render_cards("index_card", [(a["areaId"], a["version"]) for a in areas], render)
+
+
+def _render(payload):
+    """Encode ``payload`` as JSON or, if the client asks for it, MessagePack"""
+    mimetype = serializers.negotiate(request.accept_mimetypes)
+    response = current_app.response_class(serializers.encode(payload, mimetype), mimetype=mimetype)
+    response.vary.add("Accept")
+    return response
+
+
+def _conditional(etag, last_modified, build):
+    """Answer 304 if the client's validators still match, else ``build()``.
+
+    The validators are computed without building the body, so an
+    unchanged poll skips encoding entirely. Listings pass no
+    ``last_modified``: removing an area, or one dropping out of a
+    filter, would not move it forward, so they rely on the ETag alone.
+    """
+    etag = serializers.variant_etag(etag, serializers.negotiate(request.accept_mimetypes))
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = build()
+    else:
+        response = current_app.response_class(status=304)
+        response.vary.add("Accept")
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = current_app.config["PUBLIC_CACHE_CONTROL"]
+    return response
+
+
+def _conditional_body(response):
+    """ETag a built response by its body and answer 304 if it matches"""
+    response.vary.add("Accept")
+    response.set_etag(snapshots.body_etag(response.get_data()))
+    response.headers["Cache-Control"] = current_app.config["PUBLIC_CACHE_CONTROL"]
+    return response.make_conditional(request)
+
+
+def _area_page(q="", min_available=0, sort=None, vehicle_type=None, limit=50, cursor=None):
+    """Cached ``(ids, next_cursor)`` for one page of a listing"""
+    return area_cache.get_or_load(
+        snapshots.page_key(q, min_available, sort, vehicle_type, limit, cursor),
+        lambda: search.search_page(q, min_available, sort, vehicle_type, limit, cursor)
+    )
+
+
+def _page_size():
+    """``limit`` from the query string, clamped to the configured range"""
+    default = current_app.config["SEARCH_PAGE_SIZE"]
+    return max(1, min(request.args.get("limit", default, type=int), current_app.config["SEARCH_MAX_PAGE_SIZE"]))
+
+
 @public_bp.route("/")
 def index():
-    """Home page showing all parking areas"""
+    """Home page showing one page of parking areas, ordered by name"""
+    cursor = request.args.get("cursor") or None
     try:
-        areas = ParkingArea.query.order_by(ParkingArea.name).all()
-        return render_template("index.html", areas=areas)
+        try:
+            ids, next_cursor = _area_page(limit=current_app.config["INDEX_PAGE_SIZE"], cursor=cursor)
+        except ValueError:
+            # Stale or mangled link: start over
+            cursor = None
+            ids, next_cursor = _area_page(limit=current_app.config["INDEX_PAGE_SIZE"])
+        areas = _area_snapshots(ids)
+        return render_template("index.html", areas=areas, cards=Markup(_index_cards(areas)),
+                               cursor=cursor, next_cursor=next_cursor,
+                               live_updates=current_app.config["LIVE_UPDATES_ENABLED"],
+                               resync_interval=current_app.config["SSE_RESYNC_INTERVAL"] * 1000)
     except Exception as e:
         return render_template("index.html", areas=[], error=str(e))
 
@@ -19,50 +123,237 @@ def index():
 def get_status(area_id):
     """API endpoint to get parking status for a specific area"""
     try:
-        area = ParkingArea.query.get_or_404(area_id)
-        statuses = [
+        found = _area_snapshots([area_id])
+        if not found:
+            return jsonify({"error": "Parking area not found"}), 404
+        snapshot = found[0]
+        return _conditional(
+            snapshots.area_etag(snapshot),
+            snapshots.last_modified([snapshot]),
+            lambda: _render(snapshot),
+        )
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@public_bp.route("/api/status")
+def get_statuses():
+    """API endpoint to get parking status for many areas in one request.
+
+    ``?ids=1,2,3`` limits the response to those areas; without it areas
+    are listed by name one page at a time (``limit``, ``cursor``),
+    optionally filtered by ``vehicle_type`` and ``min_available``, and
+    ``next`` holds the cursor for the following page. Areas missing from
+    the cache are loaded together, so this is at most a single SQL round
+    trip for the snapshots.
+    """
+    try:
+        ids_param = request.args.get("ids", "").strip()
+        if ids_param:
+            try:
+                ids = list(dict.fromkeys(int(i) for i in ids_param.split(",") if i.strip()))
+            except ValueError:
+                return jsonify({"error": "ids must be a comma-separated list of integers"}), 400
+            found = _area_snapshots(ids)
+            return _conditional(snapshots.listing_etag(found), None,
+                                lambda: _render({"areas": found}))
+
+        try:
+            ids, next_cursor = _area_page(
+                min_available=request.args.get("min_available", 0, type=int),
+                sort="name",
+                vehicle_type=request.args.get("vehicle_type") or None,
+                limit=_page_size(),
+                cursor=request.args.get("cursor") or None,
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        found = _area_snapshots(ids)
+        return _conditional(snapshots.listing_etag(found, next_cursor), None,
+                            lambda: _render({"areas": found, "next": next_cursor}))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@public_bp.route("/api/stream")
+def stream():
+    """Server-Sent Events stream of committed occupancy changes.
+
+    Each ``area`` event carries the changed status rows for one area.
+    Reconnecting clients send ``Last-Event-ID`` (browsers do this
+    automatically) to receive the events they missed.
+    """
+    if not current_app.config["LIVE_UPDATES_ENABLED"]:
+        return jsonify({"error": "Live updates are disabled"}), 404
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    subscription = hub.subscribe(last_event_id)
+    heartbeat = current_app.config["SSE_HEARTBEAT"]
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            yield from subscription.messages(heartbeat)
+        finally:
+            hub.unsubscribe(subscription)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # keep nginx from buffering the stream
+    })
+
+
+@public_bp.route("/api/history/<int:area_id>")
+def get_history(area_id):
+    """API endpoint for an area's occupancy history.
+
+    ``from``/``to`` take Unix seconds or ISO datetimes (default: the last
+    24 hours); ``resolution`` is raw, 1m, 15m, 1h, 1d, a number of seconds
+    or auto (default).
+    """
+    try:
+        end = history.parse_timestamp(request.args.get("to"), int(time.time()) + 1)
+        start = history.parse_timestamp(request.args.get("from"), end - history.DAY)
+        resolution = history.pick_resolution(start, end, request.args.get("resolution", "auto"))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+
+    if start >= end:
+        return jsonify({"error": "'from' must be before 'to'"}), 400
+    max_points = current_app.config["HISTORY_MAX_POINTS"]
+    if resolution and (end - start) // resolution > max_points:
+        return jsonify({"error": f"Too many points; use a coarser resolution (max {max_points})"}), 400
+
+    try:
+        return _conditional_body(_render({
+            "areaId": area_id,
+            "from": start,
+            "to": end,
+            "resolution": resolution,
+            "series": history.query_history(area_id, start, end, resolution, max_points),
+        }))
+    except history.TooManyPoints as e:
+        return jsonify({"error": f"Too many points: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@public_bp.route("/api/forecast/<int:area_id>")
+def get_forecast(area_id):
+    """API endpoint for an area's expected occupancy ``horizon`` minutes
+    from now (default 30), per vehicle type, with the chance that a space
+    will be free. Made from the fitted models in forecast.py.
+    """
+    max_horizon = current_app.config["FORECAST_MAX_HORIZON"]
+    try:
+        horizon = int(request.args.get("horizon", 30))
+    except ValueError:
+        horizon = 0
+    if not 0 < horizon <= max_horizon:
+        return jsonify({"error": f"'horizon' must be 1-{max_horizon} minutes"}), 400
+
+    try:
+        found = _area_snapshots([area_id])
+        if not found:
+            return jsonify({"error": "Parking area not found"}), 404
+        snapshot = found[0]
+        import forecast  # numpy is only loaded by workers that serve forecasts
+        forecaster = forecast.forecaster()
+        forecaster.sync()
+        # Forecasts are made per minute, like the horizon, so the body
+        # only changes with the minute, the area and the fitted models
+        now = int(time.time()) // 60 * 60
+        etag = f"f{area_id}-{snapshot['version']}-{forecaster.fitted_to or 0}-{horizon}-{now // 60}"
+        return _conditional(etag, None, lambda: _render({
+            "areaId": area_id,
+            "areaName": snapshot["areaName"],
+            "horizon": horizon,
+            "at": now + horizon * 60,
+            "fittedTo": forecaster.fitted_to,
+            "forecasts": forecaster.forecast(area_id, snapshot["statuses"], horizon, now),
+        }))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@public_bp.route("/api/nearest")
+def nearest():
+    """API endpoint for the closest areas with free spots.
+
+    ``lat`` and ``lon`` are required; ``vehicle_type`` (e.g. car) limits
+    the availability check to that type and ``k`` caps the number of
+    areas returned. Answered from the in-memory grid index in geo.py.
+    """
+    try:
+        lat = request.args.get("lat", type=float)
+        lon = request.args.get("lon", type=float)
+        if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return jsonify({"error": "lat and lon must be valid coordinates"}), 400
+        vehicle_type = request.args.get("vehicle_type") or None
+        k = max(1, min(request.args.get("k", 5, type=int), current_app.config["NEAREST_MAX_K"]))
+
+        result = [
             {
-                "vehicle_type": s.vehicle_type,
-                "capacity": s.capacity,
-                "occupied": s.occupied,
-                "available": s.available_spots()
+                "id": entry.id,
+                "name": entry.name,
+                "location": entry.location,
+                "latitude": entry.latitude,
+                "longitude": entry.longitude,
+                "distance_m": round(distance, 1),
+                "available_spots": entry.available_for(vehicle_type),
             }
-            for s in area.statuses
+            for distance, entry in geo_index.nearest(lat, lon, k, vehicle_type)
         ]
-        return jsonify({
-            "areaId": area.id,
-            "areaName": area.name,
-            "location": area.location,
-            "statuses": statuses,
-            "available_spots": area.available_spots,
-            "last_updated": area.last_updated.isoformat() if area.last_updated else None
-        })
+        return _conditional_body(_render(result))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @public_bp.route("/api/search")
 def search_area():
-    """API endpoint to search parking areas"""
+    """API endpoint to search parking areas.
+
+    Results are ranked by relevance when ``q`` is given (``sort`` may also
+    be name or available) and paginated with ``limit``/``cursor``; a
+    ``Link: <...>; rel="next"`` header points at the next page.
+    ``vehicle_type`` keeps areas with that vehicle type and
+    ``min_available`` requires that many free spots (of that type, if
+    given). ``mode=autocomplete`` returns just ids and names of areas
+    whose name starts with ``q``.
+    """
     try:
         q = request.args.get("q", "").strip()
-        if not q:
-            areas = ParkingArea.query.order_by(ParkingArea.name).all()
-        else:
-            areas = ParkingArea.query.filter(
-                ParkingArea.name.ilike(f"%{q}%") | ParkingArea.location.ilike(f"%{q}%")
-            ).order_by(ParkingArea.name).all()
+        limit = _page_size()
 
-        result = [
-            {
-                "id": a.id,
-                "name": a.name,
-                "location": a.location,
-                "status_count": len(a.statuses),
-                "available_spots": a.available_spots,
-            }
-            for a in areas
-        ]
-        return jsonify(result)
+        if request.args.get("mode") == "autocomplete":
+            suggestions = area_cache.get_or_load(
+                ("search", "autocomplete", q.lower(), limit),
+                lambda: search.autocomplete(q, limit)
+            )
+            return _conditional_body(_render([{"id": area_id, "name": name} for area_id, name in suggestions]))
+
+        try:
+            ids, next_cursor = _area_page(
+                q,
+                min_available=request.args.get("min_available", 0, type=int),
+                sort=request.args.get("sort") or None,
+                vehicle_type=request.args.get("vehicle_type") or None,
+                limit=limit,
+                cursor=request.args.get("cursor") or None,
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        found = _area_snapshots(ids)
+
+        def build():
+            response = _render([snapshots.search_result(s) for s in found])
+            if next_cursor:
+                args = request.args.to_dict()
+                args.update(cursor=next_cursor, limit=limit)
+                response.headers["Link"] = f'<{url_for("public.search_area", **args)}>; rel="next"'
+            return response
+
+        return _conditional(snapshots.listing_etag(found, next_cursor), None, build)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,227 @@
+# replicas.py
+"""Route read-only public queries to database replicas.
+
+``SQLALCHEMY_REPLICAS`` lists replica URLs, each with its own engine
+(pool) options. GET and HEAD requests to the public blueprint mark the
+request's session with a replica picked round-robin from the healthy
+ones, and RoutingSession.get_bind() sends its reads there; flushes and
+DML statements always go to the primary, as does everything outside the
+public blueprint.
+
+Read-your-writes: a request that commits a write sets a short-lived
+cookie that keeps that client on the primary for ``REPLICA_STICKY_SECONDS``.
+Other clients keep reading from replicas however much the worker
+writes; the caches guard against refilling an invalidated entry from a
+replica that has yet to catch up instead (see cache.py).
+
+A background thread (one per worker, started on first use) runs
+``SELECT 1`` against every replica each ``REPLICA_HEALTH_INTERVAL``
+seconds. A replica that fails a check, or whose connection drops during
+a query, leaves the rotation until a later check succeeds. With no
+healthy replica, reads fall back to the primary.
+"""
+import itertools
+import os
+import threading
+import time
+from flask import request
+from flask_sqlalchemy.session import Session as _FlaskSession
+from sqlalchemy import create_engine, event, text
+
+STICKY_COOKIE = "read_primary_until"
+_REPLICA_KEY = "replica"
+_WROTE_KEY = "wrote_primary"
+_COMMITTED_KEY = "committed_write_at"
+
+
+class Replica:
+    """One replica engine and its health"""
+
+    def __init__(self, name, url, engine_options):
+        self.name = name
+        self.url = url
+        self.engine_options = engine_options
+        self.engine = create_engine(url, **engine_options)
+        self.healthy = True
+        self.failures = 0
+        self.last_error = None
+        self.checked_at = None
+        event.listen(self.engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        # Dropped connections and failed connects take the node out of
+        # rotation right away rather than at the next health check
+        if context.is_disconnect or context.connection is None:
+            router.mark_down(self, context.original_exception)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+        }
+
+
+class ReplicaRouter:
+    """Round-robin choice among healthy replicas, with health checks"""
+
+    def __init__(self):
+        self.replicas = []
+        self.sticky_seconds = 5.0
+        self.check_interval = 10.0
+        self._cycle = itertools.count()
+        self._lock = threading.Lock()
+        self._monitor_pid = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def configure(self, replicas, engine_options, sticky_seconds=5.0, check_interval=10.0):
+        """Create an engine per replica.
+
+        ``replicas`` holds dicts with a ``url`` and optional
+        ``engine_options`` merged over the shared ``engine_options``.
+        """
+        self.dispose()
+        self.replicas = [
+            Replica(spec.get("name") or f"replica-{i}", spec["url"],
+                    {**engine_options, **spec.get("engine_options", {})})
+            for i, spec in enumerate(replicas, 1)
+        ]
+        self.sticky_seconds = sticky_seconds
+        self.check_interval = check_interval
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+        self.replicas = []
+
+    def choose(self):
+        """A healthy replica for the next read, or None for the primary"""
+        if not self.replicas:
+            return None
+        self._ensure_monitor()
+        healthy = [r for r in self.replicas if r.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._cycle) % len(healthy)]
+
+    def mark_down(self, replica, error):
+        with self._lock:
+            replica.healthy = False
+            replica.failures += 1
+            replica.last_error = str(error)
+
+    def check(self):
+        """Probe every replica once and update its health"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except Exception as e:
+                self.mark_down(replica, e)
+            else:
+                with self._lock:
+                    replica.healthy = True
+                    replica.last_error = None
+            replica.checked_at = time.time()
+
+    def _ensure_monitor(self):
+        # Checked per process: threads do not survive a fork
+        if self._monitor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._monitor_pid == os.getpid():
+                return
+            self._monitor_pid = os.getpid()
+        threading.Thread(target=self._monitor, name="replica-health", daemon=True).start()
+
+    def _monitor(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.check()
+
+    def stats(self):
+        return {
+            "sticky_seconds": self.sticky_seconds,
+            "check_interval": self.check_interval,
+            "replicas": [r.stats() for r in self.replicas],
+        }
+
+
+router = ReplicaRouter()
+
+
+class RoutingSession(_FlaskSession):
+    """Flask-SQLAlchemy session that can send its reads to a replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get(_REPLICA_KEY)
+        if bind is None and replica is not None:
+            if not self._flushing and not getattr(clause, "is_dml", False):
+                return replica.engine
+        if self._flushing or getattr(clause, "is_dml", False):
+            self.info[_WROTE_KEY] = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _note_commit(session):
+    if session.info.pop(_WROTE_KEY, False):
+        session.info[_COMMITTED_KEY] = time.time()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(session):
+    session.info.pop(_WROTE_KEY, None)
+
+
+def sticky_until(cookies):
+    """When the client's read-your-writes window ends (0 if it has none)"""
+    try:
+        until = float(cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+        return 0.0
+    # Ignore forged values that would pin a client to the primary
+    if until > time.time() + router.sticky_seconds:
+        return 0.0
+    return until
+
+
+def choose_for(cookies):
+    """The replica to read from for a client, or None for the primary"""
+    if not router.enabled or sticky_until(cookies) > time.time():
+        return None
+    return router.choose()
+
+
+def route_reads(session):
+    """Send this request's reads to a replica when it is safe to"""
+    replica = choose_for(request.cookies)
+    if replica is not None:
+        session.info[_REPLICA_KEY] = replica
+    return replica
+
+
+def init_app(app, db):
+    """Build the replica engines and set the read-your-writes cookie"""
+    router.configure(
+        app.config.get("SQLALCHEMY_REPLICAS", []),
+        app.config.get("REPLICA_ENGINE_OPTIONS", {}),
+        sticky_seconds=app.config.get("REPLICA_STICKY_SECONDS", 5),
+        check_interval=app.config.get("REPLICA_HEALTH_INTERVAL", 10),
+    )
+
+    @app.after_request
+    def _stick_to_primary(response):
+        if not router.enabled or not db.session.registry.has():
+            return response
+        committed_at = db.session.info.pop(_COMMITTED_KEY, None)
+        if committed_at is not None:
+            response.set_cookie(STICKY_COOKIE, f"{committed_at + router.sticky_seconds:.3f}",
+                                max_age=max(1, int(router.sticky_seconds + 0.999)),
+                                httponly=True, samesite="Lax")
+        return response
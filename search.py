@@ -0,0 +1,253 @@
+# search.py
+"""Indexed, ranked search over parking area names and locations.
+
+SQLite uses an FTS5 table kept in sync with parking_areas by triggers;
+PostgreSQL uses pg_trgm GIN indexes, which also serve the ILIKE
+substring match. Other databases (or SQLite builds without FTS5) fall
+back to an unranked ILIKE scan. init_search_index() creates whatever the
+current database supports and is safe to run repeatedly; it runs from
+`flask init-db`. Workers only look up which index exists, on first use.
+"""
+import re
+from sqlalchemy import select, exists, text, table, column, func, or_
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, ParkingArea, ParkingStatus
+from pagination import encode_cursor, decode_cursor, keyset_after
+
+_backend = None
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_TABLE = """CREATE VIRTUAL TABLE IF NOT EXISTS parking_areas_fts USING fts5(
+    name, location,
+    content='parking_areas', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+)"""
+
+_SQLITE_TRIGGERS = {
+    "parking_areas_fts_ai": """CREATE TRIGGER parking_areas_fts_ai AFTER INSERT ON parking_areas BEGIN
+        INSERT INTO parking_areas_fts(rowid, name, location) VALUES (new.id, new.name, new.location);
+    END""",
+    "parking_areas_fts_ad": """CREATE TRIGGER parking_areas_fts_ad AFTER DELETE ON parking_areas BEGIN
+        INSERT INTO parking_areas_fts(parking_areas_fts, rowid, name, location)
+        VALUES ('delete', old.id, old.name, old.location);
+    END""",
+    "parking_areas_fts_au": """CREATE TRIGGER parking_areas_fts_au AFTER UPDATE OF name, location ON parking_areas BEGIN
+        INSERT INTO parking_areas_fts(parking_areas_fts, rowid, name, location)
+        VALUES ('delete', old.id, old.name, old.location);
+        INSERT INTO parking_areas_fts(rowid, name, location) VALUES (new.id, new.name, new.location);
+    END""",
+}
+
+_POSTGRES_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_parking_areas_name_trgm ON parking_areas USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_parking_areas_location_trgm ON parking_areas USING gin (location gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_parking_areas_name_prefix ON parking_areas (lower(name) text_pattern_ops)",
+)
+
+
+def _init_sqlite(conn):
+    conn.execute(text(_SQLITE_TABLE))
+    existing = {row.name for row in conn.execute(text(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'parking_areas_fts_%'"
+    ))}
+    missing = [name for name in _SQLITE_TRIGGERS if name not in existing]
+    for name in missing:
+        conn.execute(text(_SQLITE_TRIGGERS[name]))
+    if missing:
+        # New index, or parking_areas was recreated and dropped its triggers
+        conn.execute(text("INSERT INTO parking_areas_fts(parking_areas_fts) VALUES ('rebuild')"))
+
+
+def init_search_index(engine):
+    """Create the search index for this database if needed; returns the backend name"""
+    global _backend
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                _init_sqlite(conn)
+                _backend = "fts5"
+            elif dialect == "postgresql":
+                for statement in _POSTGRES_DDL:
+                    conn.execute(text(statement))
+                _backend = "trigram"
+            else:
+                _backend = "like"
+    except SQLAlchemyError as e:
+        print(f"⚠️ Search index unavailable, falling back to LIKE: {e}")
+        _backend = "like"
+    return _backend
+
+
+def detect_backend(conn):
+    """Pick the backend from the index that already exists, creating nothing.
+
+    Takes a sync connection, so the ASGI handlers can call it through
+    ``AsyncConnection.run_sync``.
+    """
+    global _backend
+    dialect = conn.dialect.name
+    try:
+        if dialect == "sqlite":
+            found = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'parking_areas_fts'"
+            )).first()
+            _backend = "fts5" if found else "like"
+        elif dialect == "postgresql":
+            found = conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+            _backend = "trigram" if found else "like"
+        else:
+            _backend = "like"
+    except SQLAlchemyError:
+        _backend = "like"
+    return _backend
+
+
+def backend_detected():
+    """True once the backend is known, so backend() won't touch the database"""
+    return _backend is not None
+
+
+def backend():
+    """The active search backend: fts5, trigram or like"""
+    if _backend is None:
+        with db.engine.connect() as conn:
+            detect_backend(conn)
+    return _backend
+
+
+def _fts_query(q, column_filter=None):
+    """Turn user input into an FTS5 query matching every word as a prefix"""
+    terms = " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(q))
+    if column_filter and terms:
+        return f"{column_filter} : ({terms})"
+    return terms
+
+
+def _ordering(sort, areas):
+    """Keyset sort keys as ``(column, descending)`` pairs"""
+    if sort == "available":
+        return [(areas.c.total_available, True), (areas.c.name, False), (areas.c.id, False)]
+    return [(areas.c.name, False), (areas.c.id, False)]
+
+
+def page_query(q="", min_available=0, sort=None, vehicle_type=None, limit=50, cursor=None):
+    """The statement for one search_page() and a function turning its rows into the result.
+
+    Returns ``(statement, finish)``; ``statement`` is None when nothing can
+    match. Lets the async read path (asgi.py) run the same SQL.
+    """
+    areas = ParkingArea.__table__
+    statuses = ParkingStatus.__table__
+    sort = sort or ("relevance" if q else "name")
+    query = select(areas.c.id)
+    rank = None
+
+    if q:
+        kind = backend()
+        if kind == "fts5":
+            match = _fts_query(q)
+            if not match:
+                return None, lambda rows: ([], None)
+            fts = table("parking_areas_fts", column("rowid"))
+            query = (
+                query.join(fts, fts.c.rowid == areas.c.id)
+                .where(text("parking_areas_fts MATCH :match").bindparams(match=match))
+            )
+            rank = text("bm25(parking_areas_fts, 10.0, 1.0)")
+        else:
+            pattern = f"%{q}%"
+            query = query.where(or_(areas.c.name.ilike(pattern), areas.c.location.ilike(pattern)))
+            if kind == "trigram":
+                rank = func.greatest(
+                    func.similarity(areas.c.name, q), func.similarity(areas.c.location, q) * 0.5
+                ).desc()
+
+    if vehicle_type:
+        has_type = (statuses.c.area_id == areas.c.id) & (statuses.c.vehicle_type == vehicle_type)
+        if min_available:
+            has_type &= statuses.c.capacity - func.coalesce(statuses.c.occupied, 0) >= min_available
+        query = query.where(exists().where(has_type))
+    elif min_available:
+        query = query.where(areas.c.total_available >= min_available)
+
+    if sort == "relevance" and rank is not None:
+        offset = decode_cursor(cursor, sort, 1)[0] if cursor else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("Invalid cursor")
+
+        def finish_ranked(rows):
+            ids = [row.id for row in rows]
+            more = len(ids) > limit
+            return ids[:limit], encode_cursor(sort, [offset + limit]) if more else None
+
+        return query.order_by(rank, areas.c.name, areas.c.id).limit(limit + 1).offset(offset), finish_ranked
+
+    if sort == "relevance":
+        sort = "name"  # nothing to rank by
+    keys = _ordering(sort, areas)
+    query = query.add_columns(*[col for col, _ in keys[:-1]])
+    if cursor:
+        query = query.where(keyset_after(keys, decode_cursor(cursor, sort, len(keys))))
+    query = query.order_by(*[col.desc() if descending else col for col, descending in keys]).limit(limit + 1)
+
+    def finish_keyset(rows):
+        if len(rows) <= limit:
+            return [row.id for row in rows], None
+        last = rows[limit - 1]
+        return [row.id for row in rows[:limit]], encode_cursor(sort, [*last[1:], last.id])
+
+    return query, finish_keyset
+
+
+def search_page(q="", min_available=0, sort=None, vehicle_type=None, limit=50, cursor=None):
+    """One page of matching area ids, best match first, and the next cursor.
+
+    ``sort`` is relevance (the default when ``q`` is given), name or
+    available. ``vehicle_type`` keeps areas with a status row of that
+    type; ``min_available`` then applies to that type, otherwise to the
+    stored area totals. Name and available orders page by keyset on the
+    sort columns; relevance pages by offset. ``cursor`` is the token
+    returned with the previous page (ValueError if it doesn't fit
+    ``sort``); the returned cursor is None on the last page.
+    """
+    query, finish = page_query(q, min_available, sort, vehicle_type, limit, cursor)
+    return finish([] if query is None else db.session.execute(query).all())
+
+
+def autocomplete_query(prefix, limit=10):
+    """The statement behind autocomplete(), or None for an empty prefix"""
+    areas = ParkingArea.__table__
+    prefix = prefix.strip()
+    if not prefix:
+        return None
+
+    if backend() == "fts5":
+        match = _fts_query(prefix, column_filter="name")
+        if not match:
+            return None
+        fts = table("parking_areas_fts", column("rowid"))
+        query = (
+            select(areas.c.id, areas.c.name)
+            .join(fts, fts.c.rowid == areas.c.id)
+            .where(text("parking_areas_fts MATCH :match").bindparams(match=match))
+            .order_by(text("bm25(parking_areas_fts, 10.0, 1.0)"), areas.c.name)
+        )
+    else:
+        escaped = prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = (
+            select(areas.c.id, areas.c.name)
+            .where(func.lower(areas.c.name).like(escaped + "%", escape="\\"))
+            .order_by(areas.c.name)
+        )
+    return query.limit(limit)
+
+
+def autocomplete(prefix, limit=10):
+    """``[(id, name)]`` of areas whose name starts with (a word starting with) ``prefix``"""
+    query = autocomplete_query(prefix, limit)
+    if query is None:
+        return []
+    return [tuple(row) for row in db.session.execute(query)]
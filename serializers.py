@@ -0,0 +1,59 @@
+# serializers.py
+"""Response encoding for the public read APIs.
+
+Payloads are plain dicts and lists (see snapshots.py). JSON is encoded
+with orjson when it is installed and with the standard library otherwise;
+both give compact output with sorted keys, like jsonify. Clients that
+send ``Accept: application/msgpack`` get MessagePack instead, if msgpack
+is installed.
+"""
+import json
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional format
+    msgpack = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+_MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+
+
+def dumps(payload) -> bytes:
+    """Compact JSON with sorted keys"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+
+
+def encode(payload, mimetype=JSON) -> bytes:
+    """``payload`` in the given format (one returned by negotiate())"""
+    if mimetype == MSGPACK:
+        return msgpack.packb(payload)
+    return dumps(payload)
+
+
+def negotiate(accept):
+    """The response format for an Accept header (string or MIMEAccept).
+
+    JSON unless the client prefers MessagePack and it is available.
+    """
+    if msgpack is None or not accept:
+        return JSON
+    if isinstance(accept, str):
+        accept = parse_accept_header(accept, MIMEAccept)
+    best = accept.best_match((JSON,) + _MSGPACK_ALIASES, default=JSON)
+    return MSGPACK if best in _MSGPACK_ALIASES else JSON
+
+
+def variant_etag(etag, mimetype):
+    """Tell apart the JSON and MessagePack representations of a resource"""
+    return etag if mimetype == JSON else f"{etag}-mp"
@@ -0,0 +1,135 @@
+# snapshots.py
+"""Public area snapshots and the validators derived from them.
+
+Shared by the WSGI public blueprint and the async read path (asgi.py) so
+both serve identical payloads, cache keys and ETags.
+"""
+import hashlib
+from datetime import datetime, timezone
+from sqlalchemy import select
+from models import ParkingArea, ParkingStatus
+
+
+def area_status(area):
+    """Build the per-vehicle status payload for one area"""
+    statuses = [
+        {
+            "id": s.id,
+            "vehicle_type": s.vehicle_type,
+            "capacity": s.capacity,
+            "occupied": s.occupied,
+            "available": s.available_spots()
+        }
+        for s in area.statuses
+    ]
+    return {
+        "areaId": area.id,
+        "areaName": area.name,
+        "location": area.location,
+        "latitude": area.latitude,
+        "longitude": area.longitude,
+        "statuses": statuses,
+        "available_spots": area.available_spots,
+        "last_updated": area.last_updated.isoformat() if area.last_updated else None,
+        "version": area.version,
+    }
+
+
+def rows_query(ids):
+    """Columns for the snapshots of ``ids``: one row per status row, or
+    one row of NULL status columns for an area without any"""
+    areas, statuses = ParkingArea.__table__, ParkingStatus.__table__
+    return (
+        select(
+            areas.c.id, areas.c.name, areas.c.location, areas.c.latitude, areas.c.longitude,
+            areas.c.last_updated, areas.c.total_available, areas.c.version,
+            statuses.c.id, statuses.c.vehicle_type, statuses.c.capacity, statuses.c.occupied,
+        )
+        .select_from(areas.outerjoin(statuses, statuses.c.area_id == areas.c.id))
+        .where(areas.c.id.in_(ids))
+        .order_by(areas.c.id, statuses.c.vehicle_type, statuses.c.id)
+    )
+
+
+def from_rows(rows):
+    """``{("area", id): snapshot}`` from rows_query() results.
+
+    Same payload as area_status(), without loading ORM objects.
+    """
+    found = {}
+    current = None
+    for (area_id, name, location, latitude, longitude, last_updated, total_available, version,
+         status_id, vehicle_type, capacity, occupied) in rows:
+        if current is None or current["areaId"] != area_id:
+            current = found[("area", area_id)] = {
+                "areaId": area_id,
+                "areaName": name,
+                "location": location,
+                "latitude": latitude,
+                "longitude": longitude,
+                "statuses": [],
+                "available_spots": total_available or 0,
+                "last_updated": last_updated.isoformat() if last_updated else None,
+                "version": version,
+            }
+        if status_id is not None:
+            current["statuses"].append({
+                "id": status_id,
+                "vehicle_type": vehicle_type,
+                "capacity": capacity,
+                "occupied": occupied,
+                "available": max(0, capacity - (occupied or 0)),
+            })
+    return found
+
+
+def search_result(snapshot):
+    """The /api/search entry for one snapshot"""
+    return {
+        "id": snapshot["areaId"],
+        "name": snapshot["areaName"],
+        "location": snapshot["location"],
+        "status_count": len(snapshot["statuses"]),
+        "available_spots": snapshot["available_spots"],
+    }
+
+
+def page_key(q, min_available, sort, vehicle_type, limit, cursor):
+    """Cache key for one page of a listing"""
+    if min_available or vehicle_type or sort == "available":
+        kind = "availability"  # dropped on every status change
+    else:
+        kind = "search" if q else "index"
+    return (kind, q.lower(), min_available, sort, vehicle_type, limit, cursor)
+
+
+def last_modified(snapshots):
+    """Latest ``last_updated`` among ``snapshots`` as an aware datetime, or None"""
+    stamps = [s["last_updated"] for s in snapshots if s["last_updated"]]
+    if not stamps:
+        return None
+    return datetime.fromisoformat(max(stamps)).replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def area_etag(snapshot):
+    """Strong ETag for a single area"""
+    return f"a{snapshot['areaId']}-{snapshot['version']}"
+
+
+def listing_etag(snapshots, *extra):
+    """Strong ETag for a response built from ``snapshots``.
+
+    Hashes each area's id and version (plus ``extra``, e.g. the next
+    cursor) rather than the encoded body, so it is cheap to compute.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    for s in snapshots:
+        digest.update(f"{s['areaId']}:{s['version']},".encode())
+    for value in extra:
+        digest.update(f"|{value}".encode())
+    return digest.hexdigest()
+
+
+def body_etag(body):
+    """Strong ETag for an already encoded response body"""
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
@@ -13,62 +13,123 @@ function formatDateTime(isoString) {
     });
 }
 
-// Fetch and update parking area statuses
-function fetchStatuses() {
-    const cards = document.querySelectorAll("[id^='status-']");
-    cards.forEach(card => {
-        const areaId = card.id.split("-")[1];
-        fetch(`/api/status/${areaId}`)
-            .then(res => {
-                if (!res.ok) throw new Error('Network response was not ok');
-                return res.json();
-            })
-            .then(data => {
-                if (data.error) {
-                    card.innerHTML = `<span class="text-danger">❌ Error loading</span>`;
+// Render one area's status payload into its card
+function renderStatusCard(card, data) {
+    // Build status HTML
+    let statusHTML = '<div class="mb-2">';
+    
+    data.statuses.forEach(s => {
+        const icon = s.vehicle_type === 'car' ? '🚗' : s.vehicle_type === 'bike' ? '🏍️' : '🚌';
+        const badgeClass = s.available > 0 ? 'success' : 'danger';
+        
+        statusHTML += `
+            <div class="d-flex justify-content-between align-items-center mb-1">
+                <span>${icon} ${s.vehicle_type.charAt(0).toUpperCase() + s.vehicle_type.slice(1)}:</span>
+                <span class="badge bg-${badgeClass}">
+                    ${s.available}/${s.capacity} available
+                </span>
+            </div>
+        `;
+    });
+    
+    statusHTML += '</div>';
+    
+    // Overall status badge
+    const totalAvailable = data.available_spots;
+    const overallBadge = totalAvailable > 0 ? 'success' : 'danger';
+    
+    statusHTML += `
+        <div class="mt-2">
+            <span class="badge bg-${overallBadge} w-100">
+                Total: ${totalAvailable} spots available
+            </span>
+        </div>
+        <small class="text-muted d-block mt-2">
+            🕒 Updated: ${formatDateTime(data.last_updated)}
+        </small>
+    `;
+    
+    card.innerHTML = statusHTML;
+}
+
+// Last payload rendered for each area, so live deltas can be applied
+const areaState = new Map();
+
+// Fetch and update parking area statuses with a single request
+// (all cards on the page, or just the given area ids)
+function fetchStatuses(onlyIds) {
+    const cards = onlyIds
+        ? onlyIds.map(id => document.getElementById(`status-${id}`)).filter(Boolean)
+        : Array.from(document.querySelectorAll("[id^='status-']"));
+    if (cards.length === 0) return;
+
+    const ids = cards.map(card => card.id.split("-")[1]);
+    fetch(`/api/status?ids=${ids.join(",")}`)
+        .then(res => {
+            if (!res.ok) throw new Error('Network response was not ok');
+            return res.json();
+        })
+        .then(data => {
+            if (data.error) throw new Error(data.error);
+
+            const byId = new Map(data.areas.map(area => [String(area.areaId), area]));
+            cards.forEach(card => {
+                const areaId = card.id.split("-")[1];
+                const area = byId.get(areaId);
+                if (area) {
+                    areaState.set(areaId, area);
+                    renderStatusCard(card, area);
                 } else {
-                    // Build status HTML
-                    let statusHTML = '<div class="mb-2">';
-                    
-                    data.statuses.forEach(s => {
-                        const icon = s.vehicle_type === 'car' ? '🚗' : s.vehicle_type === 'bike' ? '🏍️' : '🚌';
-                        const badgeClass = s.available > 0 ? 'success' : 'danger';
-                        
-                        statusHTML += `
-                            <div class="d-flex justify-content-between align-items-center mb-1">
-                                <span>${icon} ${s.vehicle_type.charAt(0).toUpperCase() + s.vehicle_type.slice(1)}:</span>
-                                <span class="badge bg-${badgeClass}">
-                                    ${s.available}/${s.capacity} available
-                                </span>
-                            </div>
-                        `;
-                    });
-                    
-                    statusHTML += '</div>';
-                    
-                    // Overall status badge
-                    const totalAvailable = data.available_spots;
-                    const overallBadge = totalAvailable > 0 ? 'success' : 'danger';
-                    
-                    statusHTML += `
-                        <div class="mt-2">
-                            <span class="badge bg-${overallBadge} w-100">
-                                Total: ${totalAvailable} spots available
-                            </span>
-                        </div>
-                        <small class="text-muted d-block mt-2">
-                            🕒 Updated: ${formatDateTime(data.last_updated)}
-                        </small>
-                    `;
-                    
-                    card.innerHTML = statusHTML;
+                    card.innerHTML = `<span class="text-danger">❌ Error loading</span>`;
                 }
-            })
-            .catch(err => {
-                console.error('Fetch error:', err);
+            });
+        })
+        .catch(err => {
+            console.error('Fetch error:', err);
+            cards.forEach(card => {
                 card.innerHTML = `<span class="text-danger">⚠️ Unable to fetch status</span>`;
             });
-    });
+        });
+}
+
+// Apply one "area" event from /api/stream to the matching card
+function applyAreaDelta(delta) {
+    const areaId = String(delta.areaId);
+    const card = document.getElementById(`status-${areaId}`);
+    const area = areaState.get(areaId);
+    if (!card) return;
+    if (!area || delta.structural) {
+        fetchStatuses([areaId]);
+        return;
+    }
+
+    const statuses = new Map(area.statuses.map(s => [s.id, s]));
+    delta.removed.forEach(id => statuses.delete(id));
+    delta.statuses.forEach(s => statuses.set(s.id, s));
+    area.statuses = Array.from(statuses.values())
+        .sort((a, b) => a.vehicle_type.localeCompare(b.vehicle_type));
+    area.available_spots = area.statuses.reduce((sum, s) => sum + s.available, 0);
+    area.last_updated = new Date(delta.ts * 1000).toISOString();
+    renderStatusCard(card, area);
+}
+
+// Keep cards current: push over SSE when enabled, otherwise poll.
+// The stream only carries changes committed by the worker serving it, so
+// while it is open the cards are still revalidated every resyncInterval
+// (a 304 when nothing changed) to pick up other workers' commits.
+function startLiveUpdates(useStream, pollInterval, resyncInterval) {
+    fetchStatuses();
+
+    if (!useStream || !window.EventSource) {
+        setInterval(fetchStatuses, pollInterval);
+        return;
+    }
+
+    setInterval(() => fetchStatuses(), resyncInterval);
+    const source = new EventSource('/api/stream');
+    source.addEventListener('area', e => applyAreaDelta(JSON.parse(e.data)));
+    // Sent when missed events can't be replayed after a reconnect
+    source.addEventListener('reset', () => fetchStatuses());
 }
 
 // ====== Search Functionality ======
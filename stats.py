@@ -0,0 +1,74 @@
+# stats.py
+"""Occupancy statistics for the admin dashboard, aggregated in SQL.
+
+Each helper runs one GROUP BY query over parking_status and returns
+plain numbers, so no area or status objects are loaded to compute them.
+"""
+from sqlalchemy import select, func, case
+from models import db, ParkingArea, ParkingStatus
+
+
+def _aggregates():
+    statuses = ParkingStatus.__table__
+    occupied = func.coalesce(statuses.c.occupied, 0)
+    return statuses, (
+        func.count().label("statuses"),
+        func.coalesce(func.sum(statuses.c.capacity), 0).label("capacity"),
+        func.coalesce(func.sum(occupied), 0).label("occupied"),
+        func.coalesce(func.sum(
+            case((statuses.c.capacity > occupied, statuses.c.capacity - occupied), else_=0)
+        ), 0).label("available"),
+    )
+
+
+def _summary(row):
+    return {
+        "statuses": row.statuses,
+        "capacity": int(row.capacity),
+        "occupied": int(row.occupied),
+        "available": int(row.available),
+    }
+
+
+def vehicle_type_totals():
+    """``{vehicle_type: summary}`` across every area, plus an ``areas`` count"""
+    statuses, aggregates = _aggregates()
+    query = (
+        select(statuses.c.vehicle_type, func.count(func.distinct(statuses.c.area_id)).label("areas"), *aggregates)
+        .group_by(statuses.c.vehicle_type)
+        .order_by(statuses.c.vehicle_type)
+    )
+    return {
+        row.vehicle_type: dict(_summary(row), areas=row.areas)
+        for row in db.session.execute(query)
+    }
+
+
+def area_summaries(area_ids):
+    """``{area_id: summary}`` for ``area_ids``; areas without statuses are left out"""
+    if not area_ids:
+        return {}
+    statuses, aggregates = _aggregates()
+    query = (
+        select(statuses.c.area_id, *aggregates)
+        .where(statuses.c.area_id.in_(list(area_ids)))
+        .group_by(statuses.c.area_id)
+    )
+    return {row.area_id: _summary(row) for row in db.session.execute(query)}
+
+
+def dashboard_totals(by_vehicle_type=None):
+    """Estate-wide totals, summed from the per-vehicle-type rows"""
+    if by_vehicle_type is None:
+        by_vehicle_type = vehicle_type_totals()
+    totals = {
+        "total_areas": db.session.execute(select(func.count()).select_from(ParkingArea.__table__)).scalar(),
+        "total_capacity": 0,
+        "total_occupied": 0,
+        "total_available": 0,
+    }
+    for summary in by_vehicle_type.values():
+        totals["total_capacity"] += summary["capacity"]
+        totals["total_occupied"] += summary["occupied"]
+        totals["total_available"] += summary["available"]
+    return totals
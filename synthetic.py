@@ -0,0 +1,159 @@
+# synthetic.py
+"""Deterministic synthetic estates for load and scale testing.
+
+``generate_estate(n)`` creates areas 1..n named "<place> <kind> #0000001"
+and so on, each with one status row per vehicle type it offers. Areas
+cluster around a handful of city centres; capacities are log-normal
+(most lots are small, a few are huge); occupancy follows a beta
+distribution whose mean depends on the city, so some districts run
+full. Each block of 1000 areas is drawn from its own RNG seeded with
+``(seed, block)``, so a seed always produces the same rows whatever the
+batch size, and a run can be repeated or extended: areas whose names already exist
+are left untouched and only the missing ones are inserted.
+
+Rows go in with COPY on PostgreSQL (psycopg) and executemany elsewhere,
+one transaction per batch. Totals are computed while generating rather
+than by refresh_area_totals(), and no change events are sent: this is
+for standing up test databases, not for live estates.
+"""
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select
+from forms import VEHICLE_TYPES
+from models import db, ParkingArea, ParkingStatus
+
+DEFAULT_SEED = 42
+BATCH_SIZE = 5000
+RNG_BLOCK = 1000  # batches are rounded to whole blocks
+
+_PLACES = ("Riverside", "Station", "Market", "Harbour", "College", "Hospital", "Stadium", "Park",
+           "Cathedral", "Airport", "Museum", "Library", "Mall", "Civic", "Tech", "Garden")
+_KINDS = ("Lot", "Garage", "Deck", "Yard", "Plaza", "Square", "Court", "Depot")
+_STREETS = ("High St", "King Rd", "Mill Lane", "Church St", "Bridge Rd", "Park Ave", "Queen St",
+            "Station Rd", "North Rd", "London Rd", "Victoria St", "Green Lane")
+
+# Share of areas offering each type, log-normal capacity median and
+# spread, and how much busier than the city average the type runs
+_TYPE_PROFILES = {
+    "car": (0.95, 60, 0.8, 0.0),
+    "bike": (0.65, 40, 0.7, -0.1),
+    "bus": (0.12, 8, 0.5, -0.2),
+}
+
+_AREA_COLUMNS = ("name", "location", "latitude", "longitude", "last_updated", "created_at",
+                 "total_capacity", "total_occupied", "total_available", "version")
+_STATUS_COLUMNS = ("area_id", "vehicle_type", "capacity", "occupied", "created_at")
+
+
+def area_name(index):
+    """Name of synthetic area ``index``; independent of the seed so reruns match existing rows"""
+    return f"{_PLACES[index % len(_PLACES)]} {_KINDS[index // len(_PLACES) % len(_KINDS)]} #{index:07d}"
+
+
+def _cities(seed, count=12):
+    """City centres as (latitude, longitude, spread in degrees, mean occupancy)"""
+    rng = random.Random(f"{seed}:cities")
+    return [
+        (rng.uniform(-40, 60), rng.uniform(-120, 140), rng.uniform(0.02, 0.15), rng.uniform(0.35, 0.85))
+        for _ in range(count)
+    ]
+
+
+def _occupied(rng, capacity, mean):
+    if rng.random() < 0.08:
+        return capacity  # full lots are common enough to show up in every listing
+    mean = min(max(mean, 0.02), 0.98)
+    return min(capacity, round(capacity * rng.betavariate(mean * 6, (1 - mean) * 6)))
+
+
+def generate_batch(seed, first, last, vehicle_types, cities, now):
+    """Areas ``first..last`` as ``[(area_row, [status_row, ...])]``; ``area_id`` is filled in later.
+
+    ``first - 1`` must be a multiple of RNG_BLOCK.
+    """
+    rows = []
+    for index in range(first, last + 1):
+        if (index - 1) % RNG_BLOCK == 0:
+            rng = random.Random(f"{seed}:{(index - 1) // RNG_BLOCK}")
+        # A few big cities hold most of the areas
+        latitude, longitude, spread, busy = cities[min(int(rng.paretovariate(1.2)) - 1, len(cities) - 1)]
+        offered = [t for t in vehicle_types if rng.random() < _TYPE_PROFILES.get(t, (0.5,))[0]]
+        statuses = []
+        for vehicle_type in offered or [vehicle_types[0]]:
+            _, median, sigma, bias = _TYPE_PROFILES.get(vehicle_type, (0.5, 30, 0.7, 0.0))
+            capacity = max(1, min(5000, round(rng.lognormvariate(math.log(median), sigma))))
+            statuses.append({"vehicle_type": vehicle_type, "capacity": capacity,
+                             "occupied": _occupied(rng, capacity, busy + bias), "created_at": now})
+        capacity = sum(s["capacity"] for s in statuses)
+        occupied = sum(s["occupied"] for s in statuses)
+        area = {
+            "name": area_name(index),
+            "location": f"{rng.randint(1, 400)} {rng.choice(_STREETS)}, District {rng.randint(1, 40)}",
+            "latitude": round(latitude + rng.gauss(0, spread), 6),
+            "longitude": round(longitude + rng.gauss(0, spread), 6),
+            "last_updated": now - timedelta(seconds=rng.randint(0, 3600)),
+            "created_at": now,
+            # Same values refresh_area_totals() would compute; occupied never exceeds capacity here
+            "total_capacity": capacity,
+            "total_occupied": occupied,
+            "total_available": capacity - occupied,
+            "version": 1,
+        }
+        rows.append((area, statuses))
+    return rows
+
+
+def _copy(connection, table, columns, rows):
+    """COPY rows into ``table`` through the psycopg connection under ``connection``"""
+    raw = connection.connection.driver_connection
+    with raw.cursor() as cursor:
+        with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row([row[c] for c in columns])
+
+
+def _insert(connection, model, columns, rows):
+    if connection.dialect.name == "postgresql" and connection.dialect.driver == "psycopg":
+        _copy(connection, model.__tablename__, columns, rows)
+    else:
+        connection.execute(insert(model.__table__), rows)
+
+
+def generate_estate(n_areas, vehicle_types=None, seed=DEFAULT_SEED, batch_size=BATCH_SIZE, progress=None):
+    """Insert synthetic areas 1..n_areas that don't exist yet.
+
+    Returns ``{"areas": inserted, "statuses": inserted, "skipped": existing,
+    "seconds": elapsed}``. ``progress(report)`` is called after each batch.
+    """
+    vehicle_types = list(vehicle_types or [value for value, _ in VEHICLE_TYPES])
+    cities = _cities(seed)
+    now = datetime.utcnow()
+    areas = ParkingArea.__table__
+    batch_size = max(1, round(batch_size / RNG_BLOCK)) * RNG_BLOCK
+    report = {"areas": 0, "statuses": 0, "skipped": 0, "seconds": 0.0}
+    started = time.perf_counter()
+
+    for first in range(1, n_areas + 1, batch_size):
+        last = min(first + batch_size - 1, n_areas)
+        rows = generate_batch(seed, first, last, vehicle_types, cities, now)
+        with db.engine.begin() as connection:
+            names = [area["name"] for area, _ in rows]
+            existing = set(connection.execute(select(areas.c.name).where(areas.c.name.in_(names))).scalars())
+            rows = [(area, statuses) for area, statuses in rows if area["name"] not in existing]
+            report["skipped"] += len(existing)
+            if rows:
+                _insert(connection, ParkingArea, _AREA_COLUMNS, [area for area, _ in rows])
+                ids = dict(connection.execute(
+                    select(areas.c.name, areas.c.id).where(areas.c.name.in_([area["name"] for area, _ in rows]))
+                ).all())
+                statuses = [dict(status, area_id=ids[area["name"]]) for area, batch_statuses in rows
+                            for status in batch_statuses]
+                _insert(connection, ParkingStatus, _STATUS_COLUMNS, statuses)
+                report["areas"] += len(rows)
+                report["statuses"] += len(statuses)
+        report["seconds"] = time.perf_counter() - started
+        if progress is not None:
+            progress(report)
+    return report
@@ -1,115 +1,131 @@
 # utils.py
-from models import db, User, ParkingArea, ParkingStatus
+from models import db, User, ParkingArea, ParkingStatus, refresh_area_totals
 from datetime import datetime
+from sqlalchemy import func, inspect, select, text
+import search
 
 
-def seed_data():
+DEMO_USERS = [
+    {"email": "admin@cu.edu", "password": "adminpass", "is_admin": True},
+    {"email": "user@cu.edu", "password": "userpass", "is_admin": False},
+]
+
+DEMO_AREAS = [
+    {
+        "name": "North Block",
+        "location": "Near Main Gate - Building A",
+        "latitude": 30.7712, "longitude": 76.5762,
+        "statuses": [
+            {"vehicle_type": "car", "capacity": 50, "occupied": 35},
+            {"vehicle_type": "bike", "capacity": 100, "occupied": 75},
+        ]
+    },
+    {
+        "name": "South Wing",
+        "location": "Behind Library - Block C",
+        "latitude": 30.7671, "longitude": 76.5758,
+        "statuses": [
+            {"vehicle_type": "car", "capacity": 40, "occupied": 20},
+            {"vehicle_type": "bike", "capacity": 80, "occupied": 45},
+            {"vehicle_type": "bus", "capacity": 10, "occupied": 3},
+        ]
+    },
+    {
+        "name": "East Plaza",
+        "location": "Near Cafeteria - Block E",
+        "latitude": 30.7694, "longitude": 76.5801,
+        "statuses": [
+            {"vehicle_type": "car", "capacity": 60, "occupied": 55},
+            {"vehicle_type": "bike", "capacity": 120, "occupied": 90},
+        ]
+    },
+    {
+        "name": "West Ground",
+        "location": "Sports Complex - Block W",
+        "latitude": 30.769, "longitude": 76.5717,
+        "statuses": [
+            {"vehicle_type": "car", "capacity": 30, "occupied": 10},
+            {"vehicle_type": "bike", "capacity": 60, "occupied": 25},
+            {"vehicle_type": "bus", "capacity": 5, "occupied": 0},
+        ]
+    }
+]
+
+
+def seed_data(areas=0, vehicle_types=None, seed=None, batch_size=None):
     """
-    Seed database with sample data for testing.
+    Seed database with the demo users and areas, plus ``areas`` synthetic
+    areas (see synthetic.py) when asked for.
     This function is idempotent - safe to run multiple times.
     """
+    import synthetic
+
     print("🌱 Starting database seeding...")
     
     try:
-        # Create admin user
-        admin_email = "admin@cu.edu"
-        admin = User.query.filter_by(email=admin_email).first()
-        
-        if not admin:
-            admin = User()
-            admin.email = admin_email
-            admin.is_admin = True
-            admin.set_password("adminpass")
-            db.session.add(admin)
-            print(f"✅ Created admin user: {admin_email}")
-        else:
-            print(f"ℹ️  Admin user already exists: {admin_email}")
-
-        # Create regular test user
-        user_email = "user@cu.edu"
-        user = User.query.filter_by(email=user_email).first()
-        
-        if not user:
-            user = User()
-            user.email = user_email
-            user.is_admin = False
-            user.set_password("userpass")
+        # One query per table for what already exists
+        emails = [u["email"] for u in DEMO_USERS]
+        existing_users = set(db.session.execute(select(User.email).where(User.email.in_(emails))).scalars())
+        for data in DEMO_USERS:
+            if data["email"] in existing_users:
+                print(f"ℹ️  User already exists: {data['email']}")
+                continue
+            user = User(email=data["email"], is_admin=data["is_admin"])
+            user.set_password(data["password"])
             db.session.add(user)
-            print(f"✅ Created test user: {user_email}")
-        else:
-            print(f"ℹ️  Test user already exists: {user_email}")
+            print(f"✅ Created {'admin' if data['is_admin'] else 'test'} user: {data['email']}")
+
+        names = [a["name"] for a in DEMO_AREAS]
+        existing_areas = set(db.session.execute(
+            select(ParkingArea.name).where(ParkingArea.name.in_(names))
+        ).scalars())
+        for area_data in DEMO_AREAS:
+            if area_data["name"] in existing_areas:
+                print(f"ℹ️  Parking area already exists: {area_data['name']}")
+                continue
+            # Statuses ride along on the relationship; the flush hook fills in the totals
+            db.session.add(ParkingArea(
+                name=area_data["name"],
+                location=area_data["location"],
+                latitude=area_data["latitude"],
+                longitude=area_data["longitude"],
+                last_updated=datetime.utcnow(),
+                statuses=[ParkingStatus(**status_data) for status_data in area_data["statuses"]],
+            ))
+            print(f"✅ Created parking area: {area_data['name']} with {len(area_data['statuses'])} vehicle types")
 
         db.session.commit()
 
-        # Create parking areas with statuses
-        areas_data = [
-            {
-                "name": "North Block",
-                "location": "Near Main Gate - Building A",
-                "statuses": [
-                    {"vehicle_type": "car", "capacity": 50, "occupied": 35},
-                    {"vehicle_type": "bike", "capacity": 100, "occupied": 75},
-                ]
-            },
-            {
-                "name": "South Wing",
-                "location": "Behind Library - Block C",
-                "statuses": [
-                    {"vehicle_type": "car", "capacity": 40, "occupied": 20},
-                    {"vehicle_type": "bike", "capacity": 80, "occupied": 45},
-                    {"vehicle_type": "bus", "capacity": 10, "occupied": 3},
-                ]
-            },
-            {
-                "name": "East Plaza",
-                "location": "Near Cafeteria - Block E",
-                "statuses": [
-                    {"vehicle_type": "car", "capacity": 60, "occupied": 55},
-                    {"vehicle_type": "bike", "capacity": 120, "occupied": 90},
-                ]
-            },
-            {
-                "name": "West Ground",
-                "location": "Sports Complex - Block W",
-                "statuses": [
-                    {"vehicle_type": "car", "capacity": 30, "occupied": 10},
-                    {"vehicle_type": "bike", "capacity": 60, "occupied": 25},
-                    {"vehicle_type": "bus", "capacity": 5, "occupied": 0},
-                ]
-            }
-        ]
+        if areas:
+            print(f"\n🏗️  Generating {areas:,} synthetic areas (seed {seed if seed is not None else synthetic.DEFAULT_SEED})...")
 
-        for area_data in areas_data:
-            area = ParkingArea.query.filter_by(name=area_data["name"]).first()
-            
-            if not area:
-                area = ParkingArea()
-                area.name = area_data["name"]
-                area.location = area_data["location"]
-                area.last_updated = datetime.utcnow()
-                db.session.add(area)
-                db.session.flush()  # Get the ID without committing
-                
-                # Add vehicle statuses
-                for status_data in area_data["statuses"]:
-                    status = ParkingStatus()
-                    status.vehicle_type = status_data["vehicle_type"]
-                    status.capacity = status_data["capacity"]
-                    status.occupied = status_data["occupied"]
-                    status.area_id = area.id
-                    db.session.add(status)
-                
-                print(f"✅ Created parking area: {area.name} with {len(area_data['statuses'])} vehicle types")
-            else:
-                print(f"ℹ️  Parking area already exists: {area.name}")
+            def progress(report):
+                done = report["areas"] + report["skipped"]
+                rate = (report["areas"] + report["statuses"]) / report["seconds"] if report["seconds"] else 0
+                print(f"   {done:,}/{areas:,} areas ({rate:,.0f} rows/s)", end="\r", flush=True)
 
-        db.session.commit()
+            report = synthetic.generate_estate(
+                areas, vehicle_types,
+                seed=synthetic.DEFAULT_SEED if seed is None else seed,
+                batch_size=batch_size or synthetic.BATCH_SIZE,
+                progress=progress,
+            )
+            rows = report["areas"] + report["statuses"]
+            print(f"\n✅ Inserted {report['areas']:,} areas and {report['statuses']:,} statuses "
+                  f"in {report['seconds']:.1f}s ({rows / report['seconds'] if report['seconds'] else 0:,.0f} rows/s)")
+            if report["skipped"]:
+                print(f"ℹ️  {report['skipped']:,} synthetic areas already existed")
         
+        counts = db.session.execute(select(
+            select(func.count()).select_from(User).scalar_subquery(),
+            select(func.count()).select_from(ParkingArea).scalar_subquery(),
+            select(func.count()).select_from(ParkingStatus).scalar_subquery(),
+        )).one()
         print("\n✅ Database seeding completed successfully!")
         print(f"\n📊 Summary:")
-        print(f"   - Users: {User.query.count()}")
-        print(f"   - Parking Areas: {ParkingArea.query.count()}")
-        print(f"   - Vehicle Statuses: {ParkingStatus.query.count()}")
+        print(f"   - Users: {counts[0]}")
+        print(f"   - Parking Areas: {counts[1]}")
+        print(f"   - Vehicle Statuses: {counts[2]}")
         print(f"\n🔑 Login Credentials:")
         print(f"   Admin: admin@cu.edu / adminpass")
         print(f"   User:  user@cu.edu / userpass")
@@ -120,6 +136,23 @@ def seed_data():
         raise
 
 
+def init_database():
+    """
+    Create any missing tables, add the columns later versions added to
+    existing ones (backfilling the area totals when they are new) and the
+    search index. Safe to run repeatedly; run it once per deploy
+    (flask init-db) rather than in every worker.
+    """
+    db.create_all()
+    added = upgrade_schema()
+    if set(added) & set(_TOTAL_COLUMNS):
+        refresh_area_totals(db.session.connection())
+        db.session.commit()
+        print("✅ Area totals backfilled")
+    backend = search.init_search_index(db.engine)
+    print(f"✅ Database tables created/verified (search: {backend})")
+
+
 def reset_database():
     """
     Drop all tables and recreate them.
@@ -130,8 +163,72 @@ def reset_database():
     
     if confirm == "YES":
         db.drop_all()
-        db.create_all()
+        init_database()
         print("✅ Database reset complete!")
         seed_data()
     else:
-        print("❌ Database reset cancelled.")
\ No newline at end of file
+        print("❌ Database reset cancelled.")
+
+
+# Columns added to existing tables after their first release, with their DDL
+_ADDED_COLUMNS = {
+    "total_capacity": "INTEGER NOT NULL DEFAULT 0",
+    "total_occupied": "INTEGER NOT NULL DEFAULT 0",
+    "total_available": "INTEGER NOT NULL DEFAULT 0",
+    "version": "INTEGER NOT NULL DEFAULT 0",
+    "latitude": "FLOAT",
+    "longitude": "FLOAT",
+}
+_TOTAL_COLUMNS = ("total_capacity", "total_occupied", "total_available")
+
+
+def upgrade_schema(names=tuple(_ADDED_COLUMNS)):
+    """
+    Add any of ``names`` that an older parking_areas table lacks, plus the
+    indexes the totals rely on. Returns the columns added; safe to run
+    repeatedly.
+    """
+    table = ParkingArea.__table__
+    existing = {c["name"] for c in inspect(db.engine).get_columns(table.name)}
+    added = [name for name in names if name not in existing]
+    with db.engine.begin() as conn:
+        for name in added:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} {_ADDED_COLUMNS[name]}"))
+            print(f"✅ Added column {table.name}.{name}")
+        # Indexes the totals refresh and sorting rely on
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{table.name}_total_available "
+            f"ON {table.name} (total_available)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_parking_status_area_id "
+            "ON parking_status (area_id)"
+        ))
+    return added
+
+
+def backfill_area_totals():
+    """
+    Add the denormalized total_* and version columns to parking_areas if
+    an older database lacks them, then recompute the totals for every area.
+    Safe to run multiple times.
+    """
+    print("🔢 Backfilling parking area totals...")
+
+    try:
+        upgrade_schema(_TOTAL_COLUMNS + ("version",))
+        refresh_area_totals(db.session.connection())
+        db.session.commit()
+        print(f"✅ Totals refreshed for {ParkingArea.query.count()} parking areas")
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error during backfill: {str(e)}")
+        raise
+
+def add_area_coordinates():
+    """
+    Add the latitude/longitude columns to parking_areas if an older
+    database lacks them. Safe to run multiple times.
+    """
+    if not upgrade_schema(("latitude", "longitude")):
+        print("ℹ️  parking_areas already has coordinate columns")